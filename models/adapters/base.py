@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Sequence
 
 
 @dataclass
@@ -9,10 +11,109 @@ class GenResult:
     text: str
     usage: Dict[str, Any]
     latency_ms: Optional[int] = None
+    # Solo en generación con streaming: ttft_ms, itl_p50/p90/p99_ms, output_tokens_per_s, chunks
+    timing: Optional[Dict[str, Any]] = None
+    # Solo con varias muestras por caso (`--samples`): las n respuestas, `text` es la primera
+    texts: Optional[List[str]] = None
+    # "cache" o "batch" si la respuesta no salió de un request interactivo de este run: su
+    # latencia no es la del caso y la fila queda fuera de las estadísticas de latencia
+    source: Optional[str] = None
+    # Solo si la generación falló (ver `tools.run_suite.generate_case`): "<Tipo>: <mensaje>"
+    error: Optional[str] = None
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Percentil con interpolación lineal (como numpy.percentile) sobre valores ya ordenados."""
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+class StreamTimer:
+    """Mide una respuesta en streaming: tiempo al primer token, latencia entre chunks y tokens/s.
+
+    Uso: crear justo antes del request, `mark()` por cada chunk con texto y `summary()` al final.
+    """
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.arrivals: List[float] = []
+
+    def mark(self) -> None:
+        self.arrivals.append(time.perf_counter())
+
+    def elapsed_s(self) -> float:
+        return time.perf_counter() - self.t0
+
+    def summary(self, output_tokens: Optional[int] = None) -> Dict[str, Any]:
+        arr = self.arrivals
+        out: Dict[str, Any] = {
+            "ttft_ms": None,
+            "itl_p50_ms": None,
+            "itl_p90_ms": None,
+            "itl_p99_ms": None,
+            "output_tokens_per_s": None,
+            "chunks": len(arr),
+        }
+        if not arr:
+            return out
+        out["ttft_ms"] = round((arr[0] - self.t0) * 1000, 2)
+        gaps = sorted((b - a) * 1000 for a, b in zip(arr, arr[1:]))
+        if gaps:
+            for q in (50, 90, 99):
+                out[f"itl_p{q}_ms"] = round(_percentile(gaps, q), 3)
+        # Velocidad de emisión: tokens después del primero sobre el tiempo desde el primer chunk
+        n_tokens = output_tokens or len(arr)
+        decode_s = arr[-1] - arr[0]
+        if n_tokens > 1 and decode_s > 0:
+            out["output_tokens_per_s"] = round((n_tokens - 1) / decode_s, 2)
+        return out
 
 
 class BaseAdapter:
     """Interfaz mínima para adapters."""
 
+    # Los adapters con batch API (p.ej. OpenAI) lo activan e implementan los métodos `*_batch`
+    supports_batch = False
+    # Los adapters que aceptan `params.n` (n respuestas en un solo request) lo activan
+    supports_n = False
+
     def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
         raise NotImplementedError
+
+    async def agenerate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        """Versión async de `generate`.
+
+        Por defecto delega en un thread; los adapters con cliente async nativo la sobrescriben
+        para poder sostener miles de requests concurrentes desde un solo event loop.
+        """
+        return await asyncio.to_thread(self.generate, system=system, user=user, params=params)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas propias del adapter (conexiones, tiempos de setup); vacío por defecto."""
+        return {}
+
+    def close(self) -> None:
+        """Libera clientes/conexiones del adapter."""
+
+    async def aclose(self) -> None:
+        """Libera los clientes async (atados al event loop en curso)."""
+
+    # --- Batch API (opcional) ---
+
+    def batch_request(self, custom_id: str, *, system: str, user: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Línea del archivo de entrada del batch para un caso."""
+        raise NotImplementedError("Este adapter no soporta batch")
+
+    def submit_batch(self, input_path: str, params: Dict[str, Any]) -> str:
+        """Sube el archivo de entrada y crea el batch; devuelve su id."""
+        raise NotImplementedError("Este adapter no soporta batch")
+
+    def poll_batch(self, batch_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Estado del batch: `status`, `output_file_id`, `request_counts`."""
+        raise NotImplementedError("Este adapter no soporta batch")
+
+    def fetch_batch(self, info: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, GenResult]:
+        """Resultados exitosos del batch, por `custom_id`."""
+        raise NotImplementedError("Este adapter no soporta batch")
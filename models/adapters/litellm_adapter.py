@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import time
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from .base import BaseAdapter, GenResult
+from .base import BaseAdapter, GenResult, StreamTimer
 
 
 class LiteLLMAdapter(BaseAdapter):
@@ -11,8 +11,12 @@ class LiteLLMAdapter(BaseAdapter):
 
     Requiere: pip install litellm
     Configura credenciales según el provider que uses.
+    Con `params.stream` genera en streaming y agrega `timing` (TTFT, latencia entre tokens, tokens/s).
+    Con `params.n` pide n respuestas en un solo request (`--samples`).
     """
 
+    supports_n = True
+
     def __init__(self) -> None:
         try:
             import litellm  # type: ignore
@@ -21,35 +25,91 @@ class LiteLLMAdapter(BaseAdapter):
 
         self._litellm = litellm
 
-    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+    def _request_kwargs(self, system: str, user: str, params: Dict[str, Any]) -> Dict[str, Any]:
         model = params.get("model")
         if not model:
             raise ValueError("params.model es requerido para LiteLLMAdapter")
 
-        temperature = float(params.get("temperature", 0.0))
-        top_p = float(params.get("top_p", 1.0))
-        max_tokens = int(params.get("max_tokens", 1200))
-
-        t0 = time.time()
-        resp = self._litellm.completion(
-            model=model,
-            temperature=temperature,
-            top_p=top_p,
-            max_tokens=max_tokens,
-            messages=[
+        request: Dict[str, Any] = {
+            "model": model,
+            "temperature": float(params.get("temperature", 0.0)),
+            "top_p": float(params.get("top_p", 1.0)),
+            "max_tokens": int(params.get("max_tokens", 1200)),
+            "messages": [
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
-        )
-        latency = int((time.time() - t0) * 1000)
+        }
+        if int(params.get("n") or 1) > 1:
+            request["n"] = int(params["n"])
+        return request
 
-        choice0 = resp["choices"][0]
-        text = choice0["message"]["content"] or ""
-        usage = resp.get("usage", {})
+    def _usage(self, usage: Any) -> Dict[str, Any]:
+        usage = usage or {}
         # Normaliza algunos campos comunes
-        usage_norm = {
+        return {
             "input_tokens": usage.get("prompt_tokens"),
             "output_tokens": usage.get("completion_tokens"),
             "usd_estimate": usage.get("total_cost"),
         }
-        return GenResult(text=text, usage=usage_norm, latency_ms=latency)
+
+    def _to_result(self, resp: Any, latency: int) -> GenResult:
+        texts = [c["message"]["content"] or "" for c in resp["choices"]]
+        return GenResult(
+            text=texts[0],
+            usage=self._usage(resp.get("usage", {})),
+            latency_ms=latency,
+            texts=texts if len(texts) > 1 else None,
+        )
+
+    @staticmethod
+    def _consume_chunk(chunk: Any, timer: StreamTimer, parts: List[str]) -> Any:
+        choices = chunk.get("choices") or []
+        if choices:
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                timer.mark()
+                parts.append(delta)
+        return chunk.get("usage")
+
+    def _stream_result(self, parts: List[str], usage: Any, timer: StreamTimer) -> GenResult:
+        usage_norm = self._usage(usage)
+        return GenResult(
+            text="".join(parts),
+            usage=usage_norm,
+            latency_ms=int(timer.elapsed_s() * 1000),
+            timing=timer.summary(usage_norm["output_tokens"]),
+        )
+
+    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        request = self._request_kwargs(system, user, params)
+        if params.get("stream"):
+            timer = StreamTimer()
+            parts: List[str] = []
+            usage = None
+            for chunk in self._litellm.completion(**request, stream=True, stream_options={"include_usage": True}):
+                usage = self._consume_chunk(chunk, timer, parts) or usage
+            return self._stream_result(parts, usage, timer)
+
+        t0 = time.time()
+        resp = self._litellm.completion(**request)
+        latency = int((time.time() - t0) * 1000)
+
+        return self._to_result(resp, latency)
+
+    async def agenerate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        request = self._request_kwargs(system, user, params)
+        if params.get("stream"):
+            timer = StreamTimer()
+            parts: List[str] = []
+            usage = None
+            stream = await self._litellm.acompletion(**request, stream=True, stream_options={"include_usage": True})
+            async for chunk in stream:
+                usage = self._consume_chunk(chunk, timer, parts) or usage
+            return self._stream_result(parts, usage, timer)
+
+        t0 = time.time()
+        resp = await self._litellm.acompletion(**request)
+        latency = int((time.time() - t0) * 1000)
+
+        return self._to_result(resp, latency)
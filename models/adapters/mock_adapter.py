@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import time
 from typing import Any, Dict
 
@@ -10,10 +11,27 @@ class MockAdapter(BaseAdapter):
     """Adapter determinista para CI y demos.
 
     Genera respuestas correctas para las tareas de ejemplo incluidas en este repo.
+    `delay_ms` (o `params.mock_delay_ms`) simula la latencia de un provider remoto,
+    útil para medir concurrencia sin red.
     """
 
+    def __init__(self, delay_ms: int = 0) -> None:
+        self.delay_ms = delay_ms
+
     def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
         t0 = time.time()
+        delay_ms = int(params.get("mock_delay_ms", self.delay_ms) or 0)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+        text = self._route(user)
+        latency = int((time.time() - t0) * 1000)
+        return GenResult(text=text, usage={"input_tokens": None, "output_tokens": None, "usd_estimate": None}, latency_ms=latency)
+
+    async def agenerate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        t0 = time.time()
+        delay_ms = int(params.get("mock_delay_ms", self.delay_ms) or 0)
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000.0)
         text = self._route(user)
         latency = int((time.time() - t0) * 1000)
         return GenResult(text=text, usage={"input_tokens": None, "output_tokens": None, "usd_estimate": None}, latency_ms=latency)
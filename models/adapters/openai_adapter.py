@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import os
+import threading
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from .base import BaseAdapter, GenResult
+from .base import BaseAdapter, GenResult, StreamTimer
 
 
 def _get_env(name: str) -> Optional[str]:
@@ -19,25 +22,118 @@ class OpenAIAdapter(BaseAdapter):
     - OpenAI: define OPENAI_API_KEY (y opcionalmente OPENAI_BASE_URL).
     - DeepSeek u otro compatible: define DEEPSEEK_API_KEY + DEEPSEEK_BASE_URL y registra
       un modelo en `models/registry.yml` indicando `api_key_env` y `base_url_env`.
+    - `stream: true` (o `--stream` en el runner) usa streaming y agrega `timing` al resultado.
+    - `sdk_max_retries` ajusta los reintentos propios del SDK (por defecto 2); bajo el scheduler de
+      `tools/throttle.py` (`RateLimitedAdapter`) siempre es 0 y los 429 los reintenta el scheduler.
+    - `n` (lo pone `--samples`) pide n respuestas en un request: el prompt se cobra una sola vez.
+
+    Clientes:
+    - Se reutiliza un cliente (con su pool de conexiones keep-alive) por
+      (`api_key_env`, `base_url`, `pool_size`); `pool_size` en el registry limita las conexiones.
+    - `stats()` reporta clientes creados/reutilizados, conexiones TCP abiertas y el tiempo
+      de setup vs. generación, para verificar que el overhead por caso desaparece.
 
     Nota:
     - Este repo no fija dependencias de terceros por defecto. Si usas este adapter:
       `pip install openai`.
     """
 
+    # Batch API (`*_batch` más abajo) y `params.n` (n respuestas por request)
+    supports_batch = True
+    supports_n = True
+
     def __init__(self) -> None:
         try:
-            from openai import OpenAI  # type: ignore
+            import httpx  # type: ignore
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI  # type: ignore
         except Exception as e:
             raise RuntimeError("Instala el paquete 'openai' para usar OpenAIAdapter") from e
 
+        self._httpx = httpx
         self._OpenAI = OpenAI
+        self._AsyncOpenAI = AsyncOpenAI
+        self._DefaultHttpxClient = DefaultHttpxClient
+        self._DefaultAsyncHttpxClient = DefaultAsyncHttpxClient
 
-    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
-        model = params.get("model")
-        if not model:
-            raise ValueError("params.model es requerido para OpenAIAdapter")
+        self._clients: Dict[Tuple[Any, ...], Any] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "clients_created": 0,
+            "client_reuses": 0,
+            "connections_opened": 0,
+            "requests": 0,
+            "setup_ms": 0.0,
+            "generate_ms": 0.0,
+        }
+
+    def _bump(self, field: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[field] += amount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+        out["setup_ms"] = round(out["setup_ms"], 2)
+        out["generate_ms"] = round(out["generate_ms"], 2)
+        out["connection_reuse_ratio"] = (
+            round(1.0 - out["connections_opened"] / out["requests"], 4) if out["requests"] else None
+        )
+        return out
+
+    # --- Instrumentación de conexiones (trace de httpcore) ---
+
+    def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self._bump("connections_opened")
+
+    async def _atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._trace(event_name, info)
+
+    def _on_request(self, request: Any) -> None:
+        request.extensions["trace"] = self._trace
 
+    async def _aon_request(self, request: Any) -> None:
+        request.extensions["trace"] = self._atrace
+
+    def _limits(self, params: Dict[str, Any]) -> Optional[Any]:
+        pool_size = params.get("pool_size")
+        if not pool_size:
+            return None
+        n = int(pool_size)
+        return self._httpx.Limits(max_connections=n, max_keepalive_connections=n)
+
+    def _get_client(self, params: Dict[str, Any], *, is_async: bool) -> Any:
+        """Devuelve el cliente cacheado para estas credenciales, creándolo si hace falta."""
+        t0 = time.perf_counter()
+        kwargs = self._client_kwargs(params)
+        key: Tuple[Any, ...] = (
+            "async" if is_async else "sync",
+            # Los clientes async quedan atados a su event loop
+            id(asyncio.get_running_loop()) if is_async else None,
+            params.get("api_key_env") or "OPENAI_API_KEY",
+            kwargs.get("base_url"),
+            params.get("pool_size"),
+            kwargs.get("max_retries"),
+        )
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                limits = self._limits(params)
+                http_kwargs: Dict[str, Any] = {"limits": limits} if limits is not None else {}
+                if is_async:
+                    http_client = self._DefaultAsyncHttpxClient(event_hooks={"request": [self._aon_request]}, **http_kwargs)
+                    client = self._AsyncOpenAI(http_client=http_client, **kwargs)
+                else:
+                    http_client = self._DefaultHttpxClient(event_hooks={"request": [self._on_request]}, **http_kwargs)
+                    client = self._OpenAI(http_client=http_client, **kwargs)
+                self._clients[key] = client
+                self._stats["clients_created"] += 1
+            else:
+                self._stats["client_reuses"] += 1
+            self._stats["setup_ms"] += (time.perf_counter() - t0) * 1000
+        return client
+
+    def _client_kwargs(self, params: Dict[str, Any]) -> Dict[str, Any]:
         # Permite configurar credenciales por modelo (ideal para comparar proveedores)
         api_key_env = str(params.get("api_key_env") or "OPENAI_API_KEY")
         base_url_env = str(params.get("base_url_env") or "OPENAI_BASE_URL")
@@ -49,29 +145,182 @@ class OpenAIAdapter(BaseAdapter):
         # base_url es opcional (solo necesario para endpoints compatibles)
         base_url = params.get("base_url") or _get_env(base_url_env)
 
-        temperature = float(params.get("temperature", 0.0))
-        top_p = float(params.get("top_p", 1.0))
-        max_tokens = int(params.get("max_tokens", 1200))
+        kwargs: Dict[str, Any] = {"api_key": api_key}
+        if base_url:
+            kwargs["base_url"] = base_url
+        # Reintentos internos del SDK; RateLimitedAdapter pasa 0 para que los 429 lleguen al scheduler
+        if params.get("sdk_max_retries") is not None:
+            kwargs["max_retries"] = int(params["sdk_max_retries"])
+        return kwargs
 
-        client = self._OpenAI(api_key=api_key, base_url=base_url) if base_url else self._OpenAI(api_key=api_key)
+    def _request_kwargs(self, system: str, user: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        model = params.get("model")
+        if not model:
+            raise ValueError("params.model es requerido para OpenAIAdapter")
 
-        t0 = time.time()
-        resp = client.chat.completions.create(
-            model=model,
-            temperature=temperature,
-            top_p=top_p,
-            max_tokens=max_tokens,
-            messages=[
+        request: Dict[str, Any] = {
+            "model": model,
+            "temperature": float(params.get("temperature", 0.0)),
+            "top_p": float(params.get("top_p", 1.0)),
+            "max_tokens": int(params.get("max_tokens", 1200)),
+            "messages": [
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
-        )
-        latency = int((time.time() - t0) * 1000)
+        }
+        if int(params.get("n") or 1) > 1:
+            request["n"] = int(params["n"])
+        return request
 
-        text = resp.choices[0].message.content or ""
-        usage = {
-            "input_tokens": getattr(resp.usage, "prompt_tokens", None),
-            "output_tokens": getattr(resp.usage, "completion_tokens", None),
+    def _usage(self, usage: Any) -> Dict[str, Any]:
+        return {
+            "input_tokens": getattr(usage, "prompt_tokens", None),
+            "output_tokens": getattr(usage, "completion_tokens", None),
             "usd_estimate": None,
         }
-        return GenResult(text=text, usage=usage, latency_ms=latency)
+
+    def _to_result(self, resp: Any, latency: int) -> GenResult:
+        choices = sorted(resp.choices, key=lambda c: c.index)
+        texts = [c.message.content or "" for c in choices]
+        return GenResult(
+            text=texts[0],
+            usage=self._usage(resp.usage),
+            latency_ms=latency,
+            texts=texts if len(texts) > 1 else None,
+        )
+
+    # --- Streaming (params.stream): mide TTFT, latencia entre tokens y tokens/s ---
+
+    @staticmethod
+    def _stream_request(request: Dict[str, Any]) -> Dict[str, Any]:
+        # include_usage: el último chunk trae el conteo real de tokens
+        return {**request, "stream": True, "stream_options": {"include_usage": True}}
+
+    @staticmethod
+    def _consume_chunk(chunk: Any, timer: StreamTimer, parts: List[str]) -> Any:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                timer.mark()
+                parts.append(delta)
+        return chunk.usage
+
+    def _stream_result(self, parts: List[str], usage: Any, timer: StreamTimer) -> GenResult:
+        latency = self._record(timer.elapsed_s())
+        usage_norm = self._usage(usage)
+        return GenResult(
+            text="".join(parts),
+            usage=usage_norm,
+            latency_ms=latency,
+            timing=timer.summary(usage_norm["output_tokens"]),
+        )
+
+    def _generate_stream(self, client: Any, request: Dict[str, Any]) -> GenResult:
+        timer = StreamTimer()
+        parts: List[str] = []
+        usage = None
+        for chunk in client.chat.completions.create(**self._stream_request(request)):
+            usage = self._consume_chunk(chunk, timer, parts) or usage
+        return self._stream_result(parts, usage, timer)
+
+    async def _agenerate_stream(self, client: Any, request: Dict[str, Any]) -> GenResult:
+        timer = StreamTimer()
+        parts: List[str] = []
+        usage = None
+        async for chunk in await client.chat.completions.create(**self._stream_request(request)):
+            usage = self._consume_chunk(chunk, timer, parts) or usage
+        return self._stream_result(parts, usage, timer)
+
+    def _record(self, elapsed_s: float) -> int:
+        self._bump("requests")
+        self._bump("generate_ms", elapsed_s * 1000)
+        return int(elapsed_s * 1000)
+
+    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        request = self._request_kwargs(system, user, params)
+        client = self._get_client(params, is_async=False)
+        if params.get("stream"):
+            return self._generate_stream(client, request)
+
+        t0 = time.time()
+        resp = client.chat.completions.create(**request)
+        latency = self._record(time.time() - t0)
+
+        return self._to_result(resp, latency)
+
+    async def agenerate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        request = self._request_kwargs(system, user, params)
+        client = self._get_client(params, is_async=True)
+        if params.get("stream"):
+            return await self._agenerate_stream(client, request)
+
+        t0 = time.time()
+        resp = await client.chat.completions.create(**request)
+        latency = self._record(time.time() - t0)
+
+        return self._to_result(resp, latency)
+
+    # --- Batch API: archivo JSONL de requests -> batch -> archivo de salida ---
+
+    def batch_request(self, custom_id: str, *, system: str, user: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": self._request_kwargs(system, user, params),
+        }
+
+    def submit_batch(self, input_path: str, params: Dict[str, Any]) -> str:
+        client = self._get_client(params, is_async=False)
+        with open(input_path, "rb") as f:
+            file = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def poll_batch(self, batch_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        client = self._get_client(params, is_async=False)
+        b = client.batches.retrieve(batch_id)
+        counts = b.request_counts
+        return {
+            "id": b.id,
+            "status": b.status,
+            "output_file_id": b.output_file_id,
+            "error_file_id": b.error_file_id,
+            "request_counts": counts.model_dump() if counts is not None else None,
+        }
+
+    def fetch_batch(self, info: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, GenResult]:
+        from openai.types.chat import ChatCompletion  # type: ignore
+
+        if not info.get("output_file_id"):
+            return {}
+        client = self._get_client(params, is_async=False)
+        content = client.files.content(info["output_file_id"]).text
+        out: Dict[str, GenResult] = {}
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            resp = item.get("response") or {}
+            if resp.get("status_code") != 200:
+                continue
+            # Sin latencia interactiva: el batch se procesa offline
+            out[item["custom_id"]] = self._to_result(ChatCompletion.model_validate(resp["body"]), 0)
+        return out
+
+    def _pop_clients(self, *, is_async: bool) -> List[Any]:
+        with self._lock:
+            keys = [k for k in self._clients if (k[0] == "async") == is_async]
+            return [self._clients.pop(k) for k in keys]
+
+    def close(self) -> None:
+        for c in self._pop_clients(is_async=False):
+            c.close()
+
+    async def aclose(self) -> None:
+        for c in self._pop_clients(is_async=True):
+            await c.close()
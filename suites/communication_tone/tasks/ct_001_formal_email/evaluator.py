@@ -1,43 +1,109 @@
 from __future__ import annotations
 
+import bisect
 import re
-from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
+
+import numpy as np
+
+from tools.artifacts import save_artifact
+
+
+# Solo guarda output.txt: no necesita un directorio real por caso
+NEEDS_WORKDIR = False
+
+# Patrones compilados una vez; se aplican sobre el lote entero unido con SEP
+SALUDO_RE = re.compile(r"cordial saludo|estimad")
+CIERRE_RE = re.compile(r"atentamente|cordialmente")
+# Ni palabra ni parte de ningún patrón: ningún match cruza de una salida a la siguiente
+SEP = "\n\x00\n"
+
+# Caracteres de palabra del plano básico según `\w` de `re` (isalnum() o "_"); los de fuera
+# del plano (emojis, ideogramas raros) se consultan aparte
+_WORD_BMP = np.array([c.isalnum() or c == "_" for c in map(chr, range(0x10000))], dtype=bool)
+
+
+def _bounds(texts: List[str]) -> np.ndarray:
+    """Offset de inicio de cada texto en `SEP.join(texts)` (y uno más, el final)."""
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    bounds = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(lengths + len(SEP), out=bounds[1:])
+    return bounds
+
+
+def word_counts(texts: List[str]) -> np.ndarray:
+    """Palabras de cada texto, igual que `len(re.findall(r"\\b\\w+\\b", texto))` pero sobre el lote entero.
+
+    Una palabra es una racha de caracteres `\\w`: se cuentan los inicios de racha sobre los code
+    points del lote unido y se reparten por texto con sumas acumuladas.
+    """
+    # surrogatepass: una salida con surrogates sueltos se cuenta igual que con la regex (no son \w)
+    cp = np.frombuffer(SEP.join(texts).encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32)
+    word = _WORD_BMP[np.minimum(cp, 0xFFFF)]
+    high = cp > 0xFFFF
+    if high.any():
+        uniq, inverse = np.unique(cp[high], return_inverse=True)
+        word[high] = np.array([chr(c).isalnum() for c in uniq.tolist()], dtype=bool)[inverse]
+    starts = word.copy()
+    starts[1:] &= ~word[:-1]
+    acc = np.zeros(len(cp) + 1, dtype=np.int64)
+    np.cumsum(starts, out=acc[1:])
+    bounds = _bounds(texts)
+    ends = bounds[1:] - len(SEP)
+    return acc[ends] - acc[bounds[:-1]]
 
 
 def word_count(text: str) -> int:
-    return len(re.findall(r"\b\w+\b", text, flags=re.UNICODE))
+    return int(word_counts([text])[0])
 
 
-def evaluate(case: Dict[str, Any], model_output: str, workdir: str) -> Dict[str, Any]:
-    wd = Path(workdir)
-    wd.mkdir(parents=True, exist_ok=True)
-    wd.joinpath("output.txt").write_text(model_output, encoding="utf-8")
+def _has_match(pattern: re.Pattern, joined: str, bounds: List[int]) -> np.ndarray:
+    """Si `pattern` aparece en cada texto del lote unido `joined` (ver `_bounds`), en una sola pasada.
+
+    Tras el primer match de un texto la búsqueda salta al inicio del siguiente.
+    """
+    found = np.zeros(len(bounds) - 1, dtype=bool)
+    m = pattern.search(joined)
+    while m is not None:
+        i = bisect.bisect_right(bounds, m.start()) - 1
+        found[i] = True
+        m = pattern.search(joined, bounds[i + 1])
+    return found
+
+
+def evaluate_batch(cases: List[Dict[str, Any]], outputs: List[str], workdirs: List[str]) -> List[Dict[str, Any]]:
+    for workdir, output in zip(workdirs, outputs):
+        save_artifact(workdir, "output.txt", output)
 
-    text = model_output.strip()
+    texts = [o.strip() for o in outputs]
+    # Minúsculas por texto: lower() puede cambiar el largo y los offsets deben ser los de cada texto
+    lowered = [t.lower() for t in texts]
+    joined = SEP.join(lowered)
+    bounds = _bounds(lowered).tolist()
 
     # Heurísticas simples
-    has_saludo = "cordial saludo" in text.lower() or "estimad" in text.lower()
-    has_cierre = "atentamente" in text.lower() or "cordialmente" in text.lower()
-    has_date = case.get("new_date") in text
-    wc = word_count(text)
-    length_ok = 120 <= wc <= 220
-
-    score = 0
-    score += 1 if has_saludo else 0
-    score += 1 if has_cierre else 0
-    score += 1 if has_date else 0
-    score += 1 if length_ok else 0
+    has_saludo = _has_match(SALUDO_RE, joined, bounds)
+    has_cierre = _has_match(CIERRE_RE, joined, bounds)
+    has_date = np.array([case.get("new_date") in text for case, text in zip(cases, texts)], dtype=bool)
+    wc = word_counts(texts)
+    length_ok = (wc >= 120) & (wc <= 220)
 
+    score = has_saludo.astype(np.int64) + has_cierre + has_date + length_ok
     # Normaliza a 0-2 para score_total
-    score_total = 2 if score >= 3 else (1 if score == 2 else 0)
-
-    return {
-        "pass_fail": score_total >= 1,
-        "scores": {
-            "tone_formality": 1 if has_saludo and has_cierre else 0,
-            "requirements": score_total,
-            "score_total": score_total,
-        },
-        "notes": f"wc={wc}, saludo={has_saludo}, cierre={has_cierre}, fecha={has_date}",
-    }
+    score_total = np.where(score >= 3, 2, np.where(score == 2, 1, 0))
+    tone = (has_saludo & has_cierre).astype(np.int64)
+
+    return [
+        {
+            "pass_fail": st >= 1,
+            "scores": {"tone_formality": t, "requirements": st, "score_total": st},
+            "notes": f"wc={w}, saludo={s}, cierre={c}, fecha={d}",
+        }
+        for w, s, c, d, st, t in zip(
+            wc.tolist(), has_saludo.tolist(), has_cierre.tolist(), has_date.tolist(), score_total.tolist(), tone.tolist()
+        )
+    ]
+
+
+def evaluate(case: Dict[str, Any], model_output: str, workdir: str) -> Dict[str, Any]:
+    return evaluate_batch([case], [model_output], [workdir])[0]
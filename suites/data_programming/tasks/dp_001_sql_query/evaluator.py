@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-import sqlite3
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
-from tools.utils import extract_sql, read_text
+from tools.artifacts import save_artifact
+from tools.sql_fixtures import get_fixture, run_query
+from tools.utils import extract_sql
 
 
+# Los artifacts (model.sql, got.json) van directo al store: no necesita un directorio real por caso
+NEEDS_WORKDIR = False
+
 EXPECTED = [
     ("corporativo", 25.0),
     ("premium", 100.0),
@@ -15,17 +19,13 @@ EXPECTED = [
 
 
 def evaluate(case: Dict[str, Any], model_output: str, workdir: str) -> Dict[str, Any]:
-    wd = Path(workdir)
     sql = extract_sql(model_output)
-    (wd / "model.sql").write_text(sql, encoding="utf-8")
+    save_artifact(workdir, "model.sql", sql)
 
-    conn = sqlite3.connect(":memory:")
+    # Copia aislada de la base semilla (construida una vez por proceso)
+    conn = get_fixture(str(Path(__file__).parent / "schema.sql")).connect()
     try:
-        schema = read_text(str(Path(__file__).parent / "schema.sql"))
-        conn.executescript(schema)
-
-        cur = conn.execute(sql)
-        rows = cur.fetchall()
+        rows = run_query(conn, sql, timeout_s=5.0)
 
         # Normaliza floats
         def norm(rs: List[Tuple[Any, Any]]):
@@ -38,7 +38,7 @@ def evaluate(case: Dict[str, Any], model_output: str, workdir: str) -> Dict[str,
         exp = norm(EXPECTED)
 
         passed = got == exp
-        (wd / "got.json").write_text(str(got), encoding="utf-8")
+        save_artifact(workdir, "got.json", str(got))
 
         score = 2 if passed else 0
         return {
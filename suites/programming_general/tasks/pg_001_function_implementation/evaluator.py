@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-import subprocess
-import sys
 from pathlib import Path
 from typing import Any, Dict
 
+from tools.sandbox import run_pytest
 from tools.utils import extract_code
 
 
@@ -35,17 +34,11 @@ def evaluate(case: Dict[str, Any], model_output: str, workdir: str) -> Dict[str,
     (wd / "solution.py").write_text(code, encoding="utf-8")
     (wd / "test_solution.py").write_text(TESTS, encoding="utf-8")
 
-    # Ejecuta pytest
+    # Ejecuta pytest en un worker pre-calentado del sandbox (fork aislado por caso)
     try:
-        proc = subprocess.run(
-            [sys.executable, "-m", "pytest", "-q"],
-            cwd=str(wd),
-            capture_output=True,
-            text=True,
-            timeout=20,
-        )
-        passed = proc.returncode == 0
-        out = (proc.stdout or "") + "\n" + (proc.stderr or "")
+        res = run_pytest(str(wd), timeout_s=20)
+        passed = res.passed
+        out = res.output
     except Exception as e:
         passed = False
         out = f"Evaluator error: {e}"
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+
+# Los tests importan `tools.*` y `models.*` desde la raíz del repo, igual que `python -m tools.<x>`
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+import pytest  # noqa: E402
+
+from tools.bench import make_bench_suites  # noqa: E402
+from tools.catalog import TaskCatalog  # noqa: E402
+from tools.fake_openai_server import FakeOpenAIServer, FakeOpenAIState  # noqa: E402
+from tools.run_suite import CaseJob  # noqa: E402
+from tools.utils import sha256_text  # noqa: E402
+
+
+SUITE = "communication_tone"
+TASK_ID = "ct_001_formal_email"
+
+
+@pytest.fixture
+def suites_dir(tmp_path: Path) -> Path:
+    """Copia de `communication_tone` con 12 casos sintéticos (los del repo, con case_id nuevos)."""
+    root = tmp_path / "suites"
+    make_bench_suites(root, [SUITE], 12)
+    return root
+
+
+@pytest.fixture
+def catalog(suites_dir: Path) -> TaskCatalog:
+    return TaskCatalog(cache_dir=None, suites_dir=suites_dir)
+
+
+def case_jobs(catalog: TaskCatalog) -> List[CaseJob]:
+    """Un `CaseJob` por caso de `TASK_ID`, con un prompt distinto por caso."""
+    spec = catalog.load_suite(SUITE, [TASK_ID])[0]
+    jobs = []
+    for case in spec.cases:
+        prompt = f"Escribe un correo formal para el caso {case['case_id']}"
+        jobs.append(CaseJob(TASK_ID, case, prompt, sha256_text(prompt), spec.evaluate))
+    return jobs
+
+
+@pytest.fixture
+def fake_server(monkeypatch) -> Iterator[FakeOpenAIServer]:
+    """Fake OpenAI en un puerto libre; cada test ajusta `server.state` (429 por concurrencia o al azar)."""
+    monkeypatch.setenv("FAKE_OPENAI_API_KEY", "x")
+    server = FakeOpenAIServer("127.0.0.1", 0, FakeOpenAIState())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def fake_params(server: FakeOpenAIServer) -> Dict[str, Any]:
+    """Params de `OpenAIAdapter` apuntando a `server`."""
+    return {
+        "model": "fake-model",
+        "api_key_env": "FAKE_OPENAI_API_KEY",
+        "base_url": f"http://127.0.0.1:{server.server_address[1]}/v1",
+    }
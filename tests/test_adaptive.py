@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import math
+from statistics import NormalDist
+from typing import Any, Dict, Optional
+
+import pytest
+
+from tools.adaptive import SUITE_KEY, AdaptiveStopper, stats_by_key
+
+
+def _row(task_id: str = "t1", passed: Optional[bool] = True, score: float = 2.0) -> Dict[str, Any]:
+    return {"task_id": task_id, "pass_fail": passed, "scores": {"score_total": score}}
+
+
+def _wilson_width(pass_n: int, n: int, z: float) -> float:
+    p = pass_n / n
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return 2 * half
+
+
+def test_no_decision_before_min_cases() -> None:
+    stopper = AdaptiveStopper(ci_width=1.0, min_cases=10)
+    for _ in range(9):
+        assert stopper.add(_row()) is None
+    assert not stopper.stopped("t1")
+    assert stopper.add(_row()) == {"reason": "width", "at_case": 10}
+    assert stopper.stopped("t1")
+
+
+def test_stops_on_width_when_the_interval_is_narrow_enough() -> None:
+    stopper = AdaptiveStopper(ci_width=0.1, confidence=0.95, min_cases=5)
+    z = NormalDist().inv_cdf(0.975)
+    # Todos aprueban con el mismo score: el intervalo de score es 0 y decide el de Wilson
+    expected = next(n for n in range(5, 1000) if _wilson_width(n, n, z) <= 0.1)
+    decision = None
+    while decision is None:
+        decision = stopper.add(_row())
+    assert decision == {"reason": "width", "at_case": expected}
+    # Los casos en vuelo al detenerse cuentan pero no cambian la decisión
+    assert stopper.add(_row(passed=False)) is None
+    summary = stopper.summary()["t1"]
+    assert summary["stopped"] and summary["stopped_at_case"] == expected
+    assert summary["cases_used"] == expected + 1
+
+
+def test_uncertain_task_runs_to_exhaustion() -> None:
+    stopper = AdaptiveStopper(ci_width=0.1, min_cases=20)
+    for i in range(100):
+        assert stopper.add(_row(passed=i % 2 == 0, score=2.0 if i % 2 == 0 else 0.0)) is None
+    summary = stopper.summary()["t1"]
+    assert summary["reason"] == "exhausted"
+    assert summary["pass_rate"] == pytest.approx(0.5)
+    assert summary["score_mean"] == pytest.approx(1.0)
+    lo, hi = summary["pass_ci"]
+    assert lo < 0.5 < hi and hi - lo > 0.1
+
+
+@pytest.mark.parametrize("own_pass, ref_pass, reason", [(True, False, "above_reference"), (False, True, "below_reference")])
+def test_stops_when_clearly_different_from_reference(own_pass: bool, ref_pass: bool, reason: str) -> None:
+    reference = stats_by_key([_row(passed=ref_pass, score=2.0 if ref_pass else 0.0) for _ in range(50)], "task")
+    stopper = AdaptiveStopper(ci_width=0.01, min_cases=10, reference=reference)
+    decisions = [stopper.add(_row(passed=own_pass, score=2.0 if own_pass else 0.0)) for _ in range(10)]
+    assert decisions[:9] == [None] * 9
+    assert decisions[9] == {"reason": reason, "at_case": 10}
+    assert stopper.summary()["t1"]["reference"]["cases"] == 50
+
+
+def test_suite_scope_pools_all_tasks() -> None:
+    stopper = AdaptiveStopper(ci_width=1.0, min_cases=4, scope="suite")
+    for task_id in ("t1", "t2", "t1"):
+        assert stopper.add(_row(task_id)) is None
+    assert stopper.add(_row("t2")) == {"reason": "width", "at_case": 4}
+    assert stopper.stopped("t1") and stopper.stopped("t3")
+    assert list(stopper.summary()) == [SUITE_KEY]
+
+
+def test_score_only_tasks_use_the_normalized_score_interval() -> None:
+    # Sin pass/fail: decide el intervalo de score_total dividido por el máximo |score| visto
+    stopper = AdaptiveStopper(ci_width=0.5, min_cases=2)
+    rows = [_row(passed=None, score=s) for s in (2.0, 0.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0)]
+    decisions = [stopper.add(r) for r in rows]
+    first = next(i for i, d in enumerate(decisions) if d is not None)
+    assert decisions[first]["reason"] == "width"
+    summary = stopper.summary()["t1"]
+    assert summary["pass_rate"] is None and summary["pass_ci"] is None
+    lo, hi = summary["score_ci"]
+    assert (hi - lo) / 2.0 <= 0.5
+
+
+def test_invalid_settings_are_rejected() -> None:
+    with pytest.raises(ValueError):
+        AdaptiveStopper(scope="model")
+    with pytest.raises(ValueError):
+        AdaptiveStopper(confidence=1.0)
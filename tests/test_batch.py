@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import random
+from pathlib import Path
+
+import pytest
+from conftest import case_jobs, fake_params
+
+pytest.importorskip("openai")
+
+from models.adapters.openai_adapter import OpenAIAdapter
+from tools.batch import STATE_NAME, BatchResultsAdapter, custom_id, results_by_prompt, run_batch
+from tools.catalog import TaskCatalog
+from tools.fake_openai_server import FakeOpenAIServer
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_run_batch_submits_polls_and_collects(catalog: TaskCatalog, fake_server: FakeOpenAIServer, tmp_path: Path) -> None:
+    fake_server.state.batch_delay_s = 0.2
+    jobs = case_jobs(catalog)
+    adapter = OpenAIAdapter()
+    try:
+        results = run_batch(adapter, jobs, system="s", params=fake_params(fake_server), out_dir=tmp_path, poll_s=0.05, log=lambda _: None)
+    finally:
+        adapter.close()
+
+    assert len(fake_server.state.batches) == 1
+    assert set(results) == {custom_id(j.task_id, j.case["case_id"]) for j in jobs}
+    assert all(g.text and g.latency_ms == 0 for g in results.values())
+    state = json.loads((tmp_path / STATE_NAME).read_text(encoding="utf-8"))
+    assert state["results"] == len(jobs)
+    assert [b["status"] for b in state["batches"]] == ["completed"]
+
+
+def test_run_batch_resumes_without_resubmitting(catalog: TaskCatalog, fake_server: FakeOpenAIServer, tmp_path: Path) -> None:
+    fake_server.state.batch_delay_s = 0.5
+    jobs = case_jobs(catalog)
+    params = fake_params(fake_server)
+
+    def interrupt(msg: str) -> None:
+        # El proceso "muere" en el primer chequeo, con el batch ya enviado
+        if msg.startswith("Batch en curso"):
+            raise Interrupted
+
+    adapter = OpenAIAdapter()
+    try:
+        with pytest.raises(Interrupted):
+            run_batch(adapter, jobs, system="s", params=params, out_dir=tmp_path, poll_s=0.05, log=interrupt)
+        state = json.loads((tmp_path / STATE_NAME).read_text(encoding="utf-8"))
+        assert [b["status"] for b in state["batches"]] != ["completed"]
+        submitted = state["batches"][0]["id"]
+
+        results = run_batch(adapter, jobs, system="s", params=params, out_dir=tmp_path, poll_s=0.05, log=lambda _: None)
+    finally:
+        adapter.close()
+
+    # Siguió consultando el mismo batch en vez de enviar otro
+    assert list(fake_server.state.batches) == [submitted]
+    assert len(results) == len(jobs)
+
+
+def test_cases_missing_from_batch_output_fall_back_to_interactive(
+    catalog: TaskCatalog, fake_server: FakeOpenAIServer, tmp_path: Path
+) -> None:
+    fake_server.state.batch_delay_s = 0.0
+    # Algunas líneas de la salida del batch vuelven con error 500
+    fake_server.state.fail_rate = 0.4
+    random.seed(3)
+    jobs = case_jobs(catalog)
+    params = fake_params(fake_server)
+    adapter = OpenAIAdapter()
+    try:
+        results = run_batch(adapter, jobs, system="s", params=params, out_dir=tmp_path, poll_s=0.05, log=lambda _: None)
+        (batch,) = fake_server.state.batches.values()
+        failed = batch["request_counts"]["failed"]
+        assert 0 < failed < len(jobs)
+        # Los que fallaron simplemente no están en el resultado
+        assert len(results) == len(jobs) - failed
+
+        fake_server.state.fail_rate = 0.0
+        served = BatchResultsAdapter(adapter, results_by_prompt(jobs, results))
+        gens = [served.generate(system="s", user=j.user_prompt, params=params) for j in jobs]
+    finally:
+        adapter.close()
+
+    assert all(g.text for g in gens)
+    # Las del batch no tienen latencia interactiva; las generadas de nuevo sí
+    assert sum(g.source == "batch" for g in gens) == served.served == len(results)
+    assert all(g.latency_ms for g in gens if g.source is None)
+    assert served.fallback == failed
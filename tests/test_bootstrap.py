@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from tools.bootstrap import MAX_DISTINCT, bootstrap_means, mcnemar, mean_ci, paired_bootstrap
+
+
+def _pairs(a_only: int, b_only: int, both: int = 0) -> tuple:
+    a = np.array([True] * a_only + [False] * b_only + [True] * both)
+    b = np.array([False] * a_only + [True] * b_only + [True] * both)
+    return a, b
+
+
+@pytest.mark.parametrize(
+    "a_only, b_only, expected",
+    [
+        (0, 0, 1.0),
+        (3, 3, 1.0),
+        # Binomial exacta bilateral: 2 * P(X <= k), X ~ Bin(n, 1/2)
+        (1, 5, 2 * (1 + 6) / 2**6),
+        (0, 10, 2 / 2**10),
+        (2, 12, 2 * (1 + 14 + 91) / 2**14),
+    ],
+)
+def test_mcnemar_exact_known_values(a_only: int, b_only: int, expected: float) -> None:
+    got = mcnemar(*_pairs(a_only, b_only, both=7))
+    assert (got["a_only"], got["b_only"]) == (a_only, b_only)
+    assert got["p_value"] == pytest.approx(expected, rel=1e-9)
+
+
+def test_mcnemar_chi2_matches_normal_approximation() -> None:
+    a_only, b_only = 530, 471
+    # Chi-cuadrado con 1 g.l. y corrección de continuidad == z bilateral
+    z = (abs(a_only - b_only) - 1) / math.sqrt(a_only + b_only)
+    expected = 2 * (1 - NormalDist().cdf(z))
+    assert mcnemar(*_pairs(a_only, b_only))["p_value"] == pytest.approx(expected, rel=1e-9)
+    assert expected == pytest.approx(0.0668, abs=1e-4)
+
+
+def test_bootstrap_ci_of_a_proportion_matches_normal_interval() -> None:
+    values = np.array([1.0] * 300 + [0.0] * 700)
+    mean, lo, hi = mean_ci(values, n_resamples=20000, confidence=0.95, rng=np.random.default_rng(0))
+    half = 1.959964 * math.sqrt(0.3 * 0.7 / 1000)
+    assert mean == pytest.approx(0.3)
+    assert lo == pytest.approx(0.3 - half, abs=0.003)
+    assert hi == pytest.approx(0.3 + half, abs=0.003)
+
+
+def test_bootstrap_paths_agree_on_continuous_values() -> None:
+    rng = np.random.default_rng(1)
+    values = rng.normal(2.0, 1.0, size=2000)
+    assert len(np.unique(values)) > MAX_DISTINCT
+    boot = bootstrap_means(values, 5000, np.random.default_rng(2))
+    se = values.std() / math.sqrt(len(values))
+    assert boot.mean() == pytest.approx(values.mean(), abs=0.1 * se)
+    assert boot.std() == pytest.approx(se, rel=0.05)
+
+
+def test_paired_bootstrap_known_cases() -> None:
+    rng = np.random.default_rng(0)
+    same = np.array([0.0, 1.0, 2.0, 1.0] * 50)
+    res = paired_bootstrap(same, same, n_resamples=2000, confidence=0.95, rng=rng)
+    assert (res["diff"], res["diff_lo"], res["diff_hi"], res["p_value"]) == (0.0, 0.0, 0.0, 1.0)
+
+    # A gana en todos los casos por 1: diferencia 1 sin variabilidad, p-valor mínimo
+    res = paired_bootstrap(same + 1, same, n_resamples=2000, confidence=0.95, rng=rng)
+    assert (res["diff"], res["diff_lo"], res["diff_hi"]) == (1.0, 1.0, 1.0)
+    assert res["p_value"] == pytest.approx(1 / 2001)
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from conftest import SUITE, TASK_ID
+
+from tools.catalog import TaskCatalog
+from tools.run_suite import RunOptions, SuiteRun
+
+
+def _run(catalog: TaskCatalog, out_dir: Path, **kw) -> dict:
+    opts = RunOptions(model="mock", suite=SUITE, tasks=[TASK_ID], concurrency=2, out_dir=str(out_dir), **kw)
+    return SuiteRun(opts, catalog=catalog).execute()
+
+
+def test_max_cases_does_not_index_the_file(tmp_path: Path, suites_dir: Path) -> None:
+    catalog = TaskCatalog(cache_dir=tmp_path / "catalog", suites_dir=suites_dir)
+    spec = catalog.load_suite(SUITE, [TASK_ID])[0]
+    run = SuiteRun(RunOptions(model="mock", suite=SUITE, tasks=[TASK_ID], max_cases=5, out_dir=str(tmp_path / "runs")), catalog=catalog)
+    meta = run.execute()
+    assert meta["tasks"][0]["cases"] == 5
+    # Ni el run ni el conteo recorrieron el archivo entero
+    for s, _ in run.selected_specs:
+        assert s.cases.known_count() is None
+    assert spec.known_cases is None
+    assert all(e.get("n_cases") is None for e in catalog._read_persisted(SUITE).values())
+
+
+def test_case_count_is_persisted_after_full_run(tmp_path: Path, suites_dir: Path) -> None:
+    catalog = TaskCatalog(cache_dir=tmp_path / "catalog", suites_dir=suites_dir)
+    meta = _run(catalog, tmp_path / "runs")
+    assert meta["tasks"][0]["cases"] == 12
+
+    # Un catálogo nuevo (otro proceso) ya conoce la cantidad sin leer los casos
+    fresh = TaskCatalog(cache_dir=tmp_path / "catalog", suites_dir=suites_dir)
+    assert fresh.load_suite(SUITE, [TASK_ID])[0].known_cases == 12
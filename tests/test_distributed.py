@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+from conftest import REPO_ROOT, SUITE, TASK_ID
+
+from tools import catalog as catalog_mod
+from tools.catalog import TaskCatalog
+from tools.distributed import QUEUE_NAME, WorkQueue, init_run, merge_run, shard_dir
+from tools.run_suite import RunOptions
+
+
+# Un worker real (`tools.distributed.work`) en otro proceso, sobre el catálogo de suites del test
+WORKER = """
+import sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from tools import catalog
+from tools.distributed import work
+catalog._CATALOG = catalog.TaskCatalog(cache_dir=None, suites_dir=Path(sys.argv[3]))
+work(Path(sys.argv[2]), worker=sys.argv[4], lease_s=float(sys.argv[5]))
+"""
+
+
+@pytest.fixture
+def test_catalog(monkeypatch, catalog: TaskCatalog) -> TaskCatalog:
+    monkeypatch.setattr(catalog_mod, "_CATALOG", catalog)
+    return catalog
+
+
+def _worker(run_dir: Path, suites_dir: Path, worker: str, lease_s: float) -> subprocess.Popen:
+    cmd = [sys.executable, "-c", WORKER, str(REPO_ROOT), str(run_dir), str(suites_dir), worker, str(lease_s)]
+    return subprocess.Popen(cmd, cwd=str(REPO_ROOT), stdout=subprocess.DEVNULL)
+
+
+def _case_ids(path: Path) -> List[str]:
+    return [json.loads(line)["case_id"] for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def _expected(catalog: TaskCatalog) -> List[str]:
+    return [c["case_id"] for c in catalog.load_suite(SUITE, [TASK_ID])[0].cases]
+
+
+def test_workers_claim_each_shard_once_and_merge(test_catalog: TaskCatalog, suites_dir: Path, tmp_path: Path) -> None:
+    run_dir = init_run(RunOptions(model="mock", suite=SUITE, tasks=[TASK_ID], out_dir=str(tmp_path / "run")), 4)
+    procs = [_worker(run_dir, suites_dir, f"w{k}", 30.0) for k in range(3)]
+    assert [p.wait(timeout=120) for p in procs] == [0, 0, 0]
+
+    q = WorkQueue(run_dir / QUEUE_NAME)
+    shards = q.shards()
+    q.close()
+    assert [(s["status"], s["attempts"]) for s in shards] == [("done", 1)] * 4
+    # Cada caso quedó en exactamente un shard
+    per_shard = [_case_ids(shard_dir(run_dir, i) / "results.jsonl") for i in range(4)]
+    assert sorted(cid for ids in per_shard for cid in ids) == sorted(_expected(test_catalog))
+    assert [s["cases"] for s in shards] == [len(ids) for ids in per_shard]
+
+    meta = merge_run(run_dir)
+    assert _case_ids(run_dir / "results.jsonl") == _expected(test_catalog)
+    assert meta["status"] == "completed"
+    assert meta["cases_done"] == 12
+    assert meta["tasks"][0]["cases"] == 12
+
+
+def test_expired_lease_is_reclaimed_after_worker_dies(test_catalog: TaskCatalog, suites_dir: Path, tmp_path: Path) -> None:
+    lease_s = 1.0
+    # mock_slow: 200 ms por caso, así el worker muere con el shard a medias
+    run_dir = init_run(RunOptions(model="mock_slow", suite=SUITE, tasks=[TASK_ID], out_dir=str(tmp_path / "run")), 2)
+    first = _worker(run_dir, suites_dir, "doomed", lease_s)
+    partial = shard_dir(run_dir, 0) / "results.jsonl"
+    deadline = time.monotonic() + 60
+    while not (partial.exists() and len(_case_ids(partial)) >= 2):
+        assert time.monotonic() < deadline and first.poll() is None
+        time.sleep(0.05)
+    first.kill()
+    first.wait()
+    written = _case_ids(partial)
+    assert 0 < len(written) < 6
+
+    assert _worker(run_dir, suites_dir, "rescuer", lease_s).wait(timeout=120) == 0
+
+    q = WorkQueue(run_dir / QUEUE_NAME)
+    shards = q.shards()
+    q.close()
+    assert [s["status"] for s in shards] == ["done", "done"]
+    # El shard del worker muerto lo retomó el otro al vencer el lease, reanudando lo ya escrito
+    assert (shards[0]["worker"], shards[0]["attempts"]) == ("rescuer", 2)
+    assert (shards[1]["worker"], shards[1]["attempts"]) == ("rescuer", 1)
+    assert _case_ids(partial)[: len(written)] == written
+
+    merge_run(run_dir)
+    assert _case_ids(run_dir / "results.jsonl") == _expected(test_catalog)
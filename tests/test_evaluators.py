@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from conftest import SUITE, TASK_ID
+
+from tools.artifacts import DirArtifactStore, SqliteArtifactStore
+from tools.catalog import TaskCatalog, batch_evaluator
+
+
+OUTPUTS = [
+    "Estimado cliente:\nLe escribo por la reunión del 2024-05-10.\nAtentamente, Ana",
+    "Cordial saludo, ñandú café à bientôt 日本語 \U0001F600 ¿qué tal? Cordialmente",
+    "texto con surrogate suelto \ud800 en el medio, estimado",
+    "\udfff",
+    "",
+    "ESTIMADA Sra. ÇAĞLAR — İstanbul, ﬁn. ATENTAMENTE",
+]
+
+
+@pytest.fixture(params=["dir", "sqlite"])
+def store(request: pytest.FixtureRequest, tmp_path: Path):
+    s = DirArtifactStore(tmp_path / "artifacts") if request.param == "dir" else SqliteArtifactStore(tmp_path / "a.db", "run")
+    yield s
+    s.close()
+
+
+def test_evaluate_batch_matches_evaluate(catalog: TaskCatalog, store) -> None:
+    spec = catalog.load_suite(SUITE, [TASK_ID])[0]
+    evaluate_batch = batch_evaluator(spec.evaluate)
+    assert evaluate_batch is not None
+    cases = [{"case_id": f"c{i}", "new_date": "2024-05-10"} for i in range(len(OUTPUTS))]
+
+    workdirs = [store.workdir(TASK_ID, c["case_id"], create=False) for c in cases]
+    batched = evaluate_batch(cases, OUTPUTS, workdirs)
+    single = [
+        spec.evaluate(c, o, store.workdir(TASK_ID, f"single_{c['case_id']}", create=False)) for c, o in zip(cases, OUTPUTS)
+    ]
+    assert batched == single
+
+    # El artifact conserva la salida, surrogates incluidos
+    for c, o in zip(cases, OUTPUTS):
+        assert store.get(TASK_ID, c["case_id"], "output.txt").decode("utf-8", errors="surrogatepass") == o
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+from conftest import SUITE, TASK_ID
+
+from tools import catalog as catalog_mod
+from tools import rescore
+from tools.catalog import TaskCatalog
+from tools.rescore import GENERATION_FIELDS
+from tools.run_suite import RunOptions, SuiteRun
+from tools.utils import iter_jsonl
+
+
+OTHER_TASK = "ct_002_copy"
+
+
+@pytest.fixture
+def two_task_catalog(monkeypatch, suites_dir: Path) -> TaskCatalog:
+    """La suite con una segunda tarea (copia de la primera) para poder elegir con `--tasks`."""
+    tasks = suites_dir / SUITE / "tasks"
+    shutil.copytree(tasks / TASK_ID, tasks / OTHER_TASK, ignore=shutil.ignore_patterns("__pycache__"))
+    cfg = tasks / OTHER_TASK / "task.yml"
+    cfg.write_text(cfg.read_text(encoding="utf-8").replace(TASK_ID, OTHER_TASK), encoding="utf-8")
+    catalog = TaskCatalog(cache_dir=None, suites_dir=suites_dir)
+    monkeypatch.setattr(catalog_mod, "_CATALOG", catalog)
+    return catalog
+
+
+def test_rescore_rebuilds_meta_for_selected_tasks(monkeypatch, two_task_catalog: TaskCatalog, tmp_path: Path) -> None:
+    src = tmp_path / "src"
+    opts = RunOptions(
+        model="mock", suite=SUITE, samples=2, cache="read", cache_path=str(tmp_path / "c.sqlite"), out_dir=str(src)
+    )
+    src_meta = SuiteRun(opts, catalog=two_task_catalog).execute()
+    assert [t["id"] for t in src_meta["tasks"]] == [TASK_ID, OTHER_TASK]
+    assert "cache" in src_meta and "samples" in src_meta
+
+    out = tmp_path / "rescored"
+    argv = ["rescore", str(src), "--tasks", OTHER_TASK, "--workers", "1", "--out-dir", str(out)]
+    monkeypatch.setattr(sys, "argv", argv)
+    assert rescore.main() == 0
+
+    meta = json.loads((out / "run_meta.json").read_text(encoding="utf-8"))
+    assert meta["tasks"] == [{"id": OTHER_TASK, "name": src_meta["tasks"][1]["name"], "cases": 12}]
+    assert meta["cases_done"] == 12
+    assert not (set(GENERATION_FIELDS) - {"columns_sidecar"}) & set(meta)
+    assert meta["rescored_from"]["run_id"] == src_meta["run_id"]
+    assert (meta["model"], meta["suite"]) == (src_meta["model"], src_meta["suite"])
+    rows = list(iter_jsonl(str(out / "results.jsonl")))
+    assert {r["task_id"] for r in rows} == {OTHER_TASK}
+    assert all(r["n_samples"] == 2 for r in rows)
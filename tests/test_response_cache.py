@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from conftest import SUITE, TASK_ID
+
+from tools.aggregate import summarize_run
+from tools.catalog import TaskCatalog
+from tools.run_suite import RunOptions, SuiteRun
+from tools.utils import iter_jsonl
+
+
+@pytest.fixture(autouse=True)
+def distinct_prompts(suites_dir: Path) -> None:
+    """Los casos sintéticos repiten el mismo prompt: acá cada uno lleva su propio pedido."""
+    path = suites_dir / SUITE / "tasks" / TASK_ID / "cases.jsonl"
+    cases = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    path.write_text("".join(json.dumps({**c, "order_id": f"OT-{i:05d}"}) + "\n" for i, c in enumerate(cases)), encoding="utf-8")
+
+
+def _run(catalog: TaskCatalog, tmp_path: Path, name: str, **kw) -> dict:
+    opts = RunOptions(
+        model="mock",
+        suite=SUITE,
+        tasks=[TASK_ID],
+        concurrency=2,
+        cache_path=str(tmp_path / "responses.sqlite"),
+        out_dir=str(tmp_path / name),
+        **kw,
+    )
+    return SuiteRun(opts, catalog=catalog).execute()
+
+
+def _outputs(tmp_path: Path, name: str) -> list:
+    return [(r["case_id"], r["raw_output"]) for r in iter_jsonl(str(tmp_path / name / "results.jsonl"))]
+
+
+def test_second_run_is_served_from_cache(catalog: TaskCatalog, tmp_path: Path) -> None:
+    first = _run(catalog, tmp_path, "a", cache="read")
+    assert (first["cache"]["hits"], first["cache"]["misses"], first["cache"]["writes"]) == (0, 12, 12)
+
+    second = _run(catalog, tmp_path, "b", cache="read")
+    assert (second["cache"]["hits"], second["cache"]["misses"], second["cache"]["writes"]) == (12, 0, 0)
+    assert _outputs(tmp_path, "b") == _outputs(tmp_path, "a")
+    # La latencia guardada es la del run "a": las filas del cache quedan fuera de p50/p95
+    rows = list(iter_jsonl(str(tmp_path / "b" / "results.jsonl")))
+    assert all(r["source"] == "cache" and r["latency_ms"] is None for r in rows)
+    summary = summarize_run(tmp_path / "b")
+    assert summary["latency_ms_n"] == 0 and summary["latency_sketch"] == {"zero": 0, "bins": {}}
+    assert summarize_run(tmp_path / "a")["latency_ms_n"] == 12
+
+    # `write` no lee: vuelve a llamar al modelo y refresca las mismas entradas
+    refresh = _run(catalog, tmp_path, "c", cache="write")
+    assert (refresh["cache"]["hits"], refresh["cache"]["writes"]) == (0, 12)
+    assert refresh["cache"]["entries"] == 12
+
+
+def test_cache_keys_are_per_sample(catalog: TaskCatalog, tmp_path: Path) -> None:
+    _run(catalog, tmp_path, "single", cache="read")
+    # La muestra 0 comparte entrada con el run sin --samples; las muestras 1 y 2 son nuevas
+    three = _run(catalog, tmp_path, "three", cache="read", samples=3)
+    assert (three["cache"]["hits"], three["cache"]["misses"]) == (12, 24)
+    # Con alguna muestra nueva el caso sí tiene latencia (la de las muestras generadas)
+    rows = list(iter_jsonl(str(tmp_path / "three" / "results.jsonl")))
+    assert all("source" not in r and r["latency_ms"] is not None for r in rows)
+    assert three["cache"]["entries"] == 36
+
+    # Con menos muestras todo sale del cache
+    two = _run(catalog, tmp_path, "two", cache="read", samples=2)
+    assert (two["cache"]["hits"], two["cache"]["misses"]) == (24, 0)
+    assert all(r["source"] == "cache" for r in iter_jsonl(str(tmp_path / "two" / "results.jsonl")))
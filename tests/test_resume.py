@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from conftest import SUITE, TASK_ID
+
+from tools.catalog import TaskCatalog
+from tools.run_suite import RunCancelled, RunOptions, SuiteRun
+from tools.utils import iter_jsonl
+
+
+def _case_ids(out_dir: Path) -> list:
+    return [r["case_id"] for r in iter_jsonl(str(out_dir / "results.jsonl"))]
+
+
+def _expected(catalog: TaskCatalog) -> list:
+    return [c["case_id"] for c in catalog.load_suite(SUITE, [TASK_ID])[0].cases]
+
+
+def _interrupted_run(catalog: TaskCatalog, out_dir: Path, after: int, **kw) -> None:
+    """Run que se corta justo antes de escribir la fila `after + 1`."""
+
+    def cancel() -> bool:
+        return (out_dir / "results.jsonl").exists() and len(_case_ids(out_dir)) >= after
+
+    opts = RunOptions(model="mock", suite=SUITE, tasks=[TASK_ID], out_dir=str(out_dir), **kw)
+    with pytest.raises(RunCancelled):
+        SuiteRun(opts, catalog=catalog, cancel=cancel).execute()
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_resume_skips_completed_cases(catalog: TaskCatalog, tmp_path: Path, concurrency: int) -> None:
+    out_dir = tmp_path / "run"
+    _interrupted_run(catalog, out_dir, 5, concurrency=concurrency)
+    assert _case_ids(out_dir) == _expected(catalog)[:5]
+    meta = json.loads((out_dir / "run_meta.json").read_text(encoding="utf-8"))
+    assert meta["status"] == "running"
+
+    run = SuiteRun(RunOptions(model="mock", suite=SUITE, resume=str(out_dir)), catalog=catalog)
+    meta = run.execute()
+    assert run.n_new == 7 and len(run.done) == 5
+    # Ningún caso se repite y el archivo queda en el orden de la suite
+    assert _case_ids(out_dir) == _expected(catalog)
+    assert meta["status"] == "completed"
+    assert meta["cases_done"] == 12
+    assert meta["resumes"] == 1
+
+
+def test_resume_drops_a_torn_last_line(catalog: TaskCatalog, tmp_path: Path) -> None:
+    out_dir = tmp_path / "run"
+    _interrupted_run(catalog, out_dir, 4)
+    # Crash a mitad de escribir la quinta fila
+    with open(out_dir / "results.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"suite": "communication_tone", "task_id": "ct_001_formal_email", "case_id": "def')
+
+    run = SuiteRun(RunOptions(model="mock", suite=SUITE, resume=str(out_dir)), catalog=catalog)
+    run.execute()
+    assert len(run.done) == 4 and run.n_new == 8
+    assert _case_ids(out_dir) == _expected(catalog)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from conftest import SUITE, case_jobs, fake_params
+
+pytest.importorskip("openai")
+
+from models.adapters.openai_adapter import OpenAIAdapter
+from tools.artifacts import DirArtifactStore
+from tools.catalog import TaskCatalog
+from tools.fake_openai_server import FakeOpenAIServer
+from tools.run_suite import CaseJob, arun_jobs, run_jobs
+
+
+def _collect(use_async: bool, jobs: List[CaseJob], **kw: Any) -> List[Dict[str, Any]]:
+    if not use_async:
+        return list(run_jobs(jobs, **kw))
+
+    async def main() -> List[Dict[str, Any]]:
+        return [row async for row in arun_jobs(jobs, **kw)]
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("use_async", [True, False], ids=["async", "threads"])
+def test_run_jobs_against_fake_server(
+    use_async: bool, catalog: TaskCatalog, fake_server: FakeOpenAIServer, tmp_path: Path
+) -> None:
+    state = fake_server.state
+    state.delay_ms = 40
+    # Sin reintentos del SDK: cada 429 al azar es el error de su caso
+    state.fail_rate = 0.3
+    random.seed(1)
+    jobs = case_jobs(catalog)
+    adapter = OpenAIAdapter()
+    try:
+        rows = _collect(
+            use_async,
+            jobs,
+            adapter=adapter,
+            system="s",
+            params={**fake_params(fake_server), "sdk_max_retries": 0},
+            suite=SUITE,
+            artifacts=DirArtifactStore(tmp_path / "artifacts"),
+            concurrency=3,
+        )
+    finally:
+        adapter.close()
+
+    # Una fila por caso, en el orden de los jobs aunque terminen en otro orden
+    assert [r["case_id"] for r in rows] == [j.case["case_id"] for j in jobs]
+    assert state.peak_in_flight <= 3
+    assert state.peak_in_flight > 1
+
+    failed = [r for r in rows if r.get("error")]
+    assert 0 < len(failed) == state.rate_limited < len(rows)
+    for r in failed:
+        assert "RateLimitError" in r["error"]
+        assert r["pass_fail"] is False and r["latency_ms"] is None and r["scores"] == {}
+    for r in rows:
+        if not r.get("error"):
+            assert r["raw_output"] and "score_total" in r["scores"]
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+
+from models.adapters.base import BaseAdapter, GenResult
+from tools.response_cache import CachingAdapter, ResponseCache, cache_key
+from tools.sampling import SAMPLE_PARAM, SampledAdapter, pass_at_k
+
+
+def _reference(n: int, c: int, k: int) -> float:
+    # Definición directa: 1 - C(n-c, k) / C(n, k)
+    return 1.0 - math.comb(n - c, k) / math.comb(n, k)
+
+
+@pytest.mark.parametrize(
+    "n, c, k, expected",
+    [
+        (10, 3, 1, 0.3),
+        (10, 3, 5, 1 - 21 / 252),
+        (10, 0, 5, 0.0),
+        (10, 10, 1, 1.0),
+        (5, 3, 3, 1.0),  # n - c < k: cualquier elección de k incluye una correcta
+        (200, 7, 10, _reference(200, 7, 10)),
+    ],
+)
+def test_pass_at_k_known_values(n: int, c: int, k: int, expected: float) -> None:
+    got = pass_at_k(np.array([n]), np.array([c]), k)
+    assert got[0] == pytest.approx(expected, rel=1e-12, abs=1e-12)
+
+
+def test_pass_at_k_per_case_and_nan_below_k() -> None:
+    n = np.array([10, 10, 3, 10])
+    c = np.array([3, 0, 3, 3])
+    got = pass_at_k(n, c, 5)
+    assert got[0] == pytest.approx(_reference(10, 3, 5))
+    assert got[1] == 0.0
+    assert math.isnan(got[2])
+    # Mismo (n, c) que el primero: mismo valor
+    assert got[3] == got[0]
+
+
+class CountingAdapter(BaseAdapter):
+    """Responde con el `sample_index` recibido y cuenta las llamadas."""
+
+    def __init__(self) -> None:
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        with self._lock:
+            self.calls.append(dict(params))
+            n = len(self.calls)
+        return GenResult(text=f"muestra {params.get(SAMPLE_PARAM, 0)} llamada {n}", usage={"output_tokens": 1})
+
+
+def test_sample_index_is_part_of_the_cache_key() -> None:
+    base = dict(provider="openai", system="s", input_hash="h")
+    keys = {cache_key(params={"model": "m", **extra}, **base) for extra in ({}, {SAMPLE_PARAM: 1}, {SAMPLE_PARAM: 2})}
+    assert len(keys) == 3
+
+
+def test_sampled_adapter_caches_each_sample(tmp_path) -> None:
+    inner = CountingAdapter()
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), "read")
+    cached = CachingAdapter(inner, cache, provider="openai")
+    sampled = SampledAdapter(cached, 3, max_workers=2)
+    params = {"model": "m"}
+    try:
+        first = sampled.generate(system="s", user="u", params=params)
+        assert len(inner.calls) == 3
+        assert sorted(c.get(SAMPLE_PARAM, 0) for c in inner.calls) == [0, 1, 2]
+        # La muestra 0 va sin `sample_index`: comparte entrada con un run sin --samples
+        assert [c for c in inner.calls if SAMPLE_PARAM not in c] == [params]
+        assert [t.split(" llamada")[0] for t in first.texts] == ["muestra 0", "muestra 1", "muestra 2"]
+        assert first.usage == {"output_tokens": 3}
+
+        again = sampled.generate(system="s", user="u", params=params)
+        assert len(inner.calls) == 3
+        assert again.texts == first.texts
+
+        single = cached.generate(system="s", user="u", params=params)
+        assert len(inner.calls) == 3
+        assert single.text == first.texts[0]
+        assert cache.stats()["entries"] == 3
+    finally:
+        sampled.close()
+        cache.close()
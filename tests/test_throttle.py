@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import pytest
+from conftest import fake_params
+
+pytest.importorskip("openai")
+
+from models.adapters.base import BaseAdapter, GenResult
+from models.adapters.openai_adapter import OpenAIAdapter
+from tools.fake_openai_server import FakeOpenAIServer
+from tools.throttle import RateLimitedAdapter, RateLimitScheduler
+
+
+def _params(server: FakeOpenAIServer) -> dict:
+    return {**fake_params(server), "max_tokens": 50}
+
+
+def test_scheduler_retries_429_and_backs_off_concurrency(fake_server: FakeOpenAIServer) -> None:
+    fake_server.state.delay_ms = 30
+    fake_server.state.max_concurrent = 2
+    sched = RateLimitScheduler(
+        {"initial_concurrency": 8, "max_concurrency": 8, "max_retries": 20, "backoff_base_s": 0.01, "backoff_max_s": 0.05}
+    )
+    adapter = RateLimitedAdapter(OpenAIAdapter(), sched)
+    params = _params(fake_server)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            gens = list(pool.map(lambda i: adapter.generate(system="s", user=f"caso {i}", params=params), range(24)))
+    finally:
+        adapter.close()
+
+    assert all(g.text for g in gens)
+    stats = sched.stats()
+    assert fake_server.state.rate_limited > 0
+    # Cada 429 del server lo vio el scheduler (el SDK no reintentó por su cuenta) y se reintentó
+    assert stats["rate_limited"] == fake_server.state.rate_limited
+    assert stats["retries"] == stats["rate_limited"]
+    assert stats["failed"] == 0
+    assert stats["requests"] == 24 + stats["retries"]
+    # AIMD: la mitad ante cada 429, así termina por debajo de lo que arrancó
+    assert stats["concurrency_limit"] < 8
+
+
+def test_scheduler_gives_up_after_max_retries(fake_server: FakeOpenAIServer) -> None:
+    fake_server.state.fail_rate = 1.0
+    sched = RateLimitScheduler({"max_retries": 3, "backoff_base_s": 0.01, "backoff_max_s": 0.02})
+    adapter = RateLimitedAdapter(OpenAIAdapter(), sched)
+    try:
+        with pytest.raises(Exception) as exc:
+            adapter.generate(system="s", user="u", params=_params(fake_server))
+    finally:
+        adapter.close()
+
+    assert getattr(exc.value, "status_code", None) == 429
+    stats = sched.stats()
+    assert stats["requests"] == 4
+    assert stats["retries"] == 3
+    assert stats["rate_limited"] == 4
+    assert stats["failed"] == 1
+    assert fake_server.state.requests == 4
+
+
+class RecordingAdapter(BaseAdapter):
+    """Registra cuántos slots de concurrencia estaban ocupados en cada llamada."""
+
+    def __init__(self, sched: RateLimitScheduler) -> None:
+        self.sched = sched
+        self.in_flight: List[int] = []
+
+    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        self.in_flight.append(self.sched.concurrency.in_flight)
+        return GenResult(text="ok", usage={})
+
+    async def agenerate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        return self.generate(system=system, user=user, params=params)
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_budget_wait_does_not_hold_a_concurrency_slot(use_async: bool) -> None:
+    sched = RateLimitScheduler({"tpm": 60000, "max_concurrency": 1, "initial_concurrency": 1})
+    inner = RecordingAdapter(sched)
+    adapter = RateLimitedAdapter(inner, sched)
+    # Bucket vacío: el request necesita 500 tokens, a 1000 tokens/s espera medio segundo
+    sched.tpm.reserve(60000)
+    params = {"max_tokens": 500}
+
+    def call() -> None:
+        if use_async:
+            asyncio.run(adapter.agenerate(system="", user="", params=params))
+        else:
+            adapter.generate(system="", user="", params=params)
+
+    t0 = time.monotonic()
+    worker = threading.Thread(target=call)
+    worker.start()
+    time.sleep(0.15)
+    # Esperando presupuesto, sin ocupar el único slot
+    assert sched.concurrency.in_flight == 0
+    assert inner.in_flight == []
+    worker.join()
+    assert time.monotonic() - t0 >= 0.45
+    assert inner.in_flight == [1]
+    assert sched.stats()["throttle_wait_s"] > 0.4
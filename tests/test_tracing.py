@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import pstats
+
+import pytest
+
+from tools.run_suite import RunOptions, SuiteRun
+
+from conftest import SUITE
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_profile_with_concurrency(tmp_path, catalog, use_async: bool) -> None:
+    # En 3.12+ un segundo cProfile activo lanza ValueError: el run usa un solo perfilador de proceso
+    out_dir = tmp_path / "run"
+    opts = RunOptions(model="mock", suite=SUITE, concurrency=2, use_async=use_async, profile=True, out_dir=str(out_dir))
+    meta = SuiteRun(opts, catalog=catalog).execute()
+
+    assert meta["status"] == "completed"
+    assert meta["cases_done"] == 12
+    assert meta["profile"] == "profile.pstats"
+    stats = pstats.Stats(str(out_dir / "profile.pstats"))
+    assert stats.total_calls > 0
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from tools.utils import iter_jsonl, row_score
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+ADAPTIVE_SCOPES = ("task", "suite")
+# Clave de las estadísticas con scope "suite": todas las tareas juntas
+SUITE_KEY = "*"
+
+
+@dataclass
+class RunningStats:
+    """Pass rate y `score_total` acumulados de un conjunto de casos (sumas, sin guardar filas)."""
+
+    n: int = 0
+    pass_n: int = 0
+    # Casos con pass_fail definido (True/False); las tareas sin pass/fail solo tienen score
+    judged_n: int = 0
+    score_sum: float = 0.0
+    score_sq: float = 0.0
+    score_abs_max: float = 0.0
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self.n += 1
+        pf = row.get("pass_fail")
+        if pf is not None:
+            self.judged_n += 1
+            self.pass_n += 1 if pf is True else 0
+        s = row_score(row)
+        self.score_sum += s
+        self.score_sq += s * s
+        self.score_abs_max = max(self.score_abs_max, abs(s))
+
+    @property
+    def pass_rate(self) -> Optional[float]:
+        return self.pass_n / self.judged_n if self.judged_n else None
+
+    @property
+    def score_mean(self) -> Optional[float]:
+        return self.score_sum / self.n if self.n else None
+
+    def score_var(self) -> Optional[float]:
+        if self.n < 2:
+            return None
+        return max(0.0, (self.score_sq - self.score_sum * self.score_sum / self.n) / (self.n - 1))
+
+    def pass_ci(self, z: float) -> Optional[Tuple[float, float]]:
+        """Intervalo de Wilson: no colapsa a ancho 0 con 0 o todos aprobados, a diferencia del de Wald."""
+        n = self.judged_n
+        if not n:
+            return None
+        p = self.pass_n / n
+        den = 1 + z * z / n
+        center = (p + z * z / (2 * n)) / den
+        half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / den
+        return max(0.0, center - half), min(1.0, center + half)
+
+    def score_ci(self, z: float) -> Optional[Tuple[float, float]]:
+        var = self.score_var()
+        if var is None:
+            return None
+        mean = self.score_sum / self.n
+        half = z * math.sqrt(var / self.n)
+        return mean - half, mean + half
+
+
+def _width(ci: Optional[Tuple[float, float]], scale: float = 1.0) -> Optional[float]:
+    if ci is None:
+        return None
+    return (ci[1] - ci[0]) / scale if scale > 0 else 0.0
+
+
+def compare(own: RunningStats, ref: RunningStats) -> Optional[Tuple[str, float, float]]:
+    """(métrica, diferencia, error estándar) de `own` contra `ref`.
+
+    Con pass/fail en ambos compara pass rates (corrección de Agresti-Caffo: +1 aprobado y +1
+    reprobado a cada lado, así el error estándar no es 0 con 0% o 100%); si no, `score_total`
+    (diferencia de medias de Welch).
+    """
+    if own.judged_n and ref.judged_n:
+        p1 = (own.pass_n + 1) / (own.judged_n + 2)
+        p2 = (ref.pass_n + 1) / (ref.judged_n + 2)
+        se = math.sqrt(p1 * (1 - p1) / (own.judged_n + 2) + p2 * (1 - p2) / (ref.judged_n + 2))
+        return "pass_rate", p1 - p2, se
+    v1, v2 = own.score_var(), ref.score_var()
+    if v1 is None or v2 is None:
+        return None
+    diff = (own.score_mean or 0.0) - (ref.score_mean or 0.0)
+    return "score_total", diff, math.sqrt(v1 / own.n + v2 / ref.n)
+
+
+def stats_by_key(rows: Iterable[Dict[str, Any]], scope: str) -> Dict[str, RunningStats]:
+    out: Dict[str, RunningStats] = {}
+    for row in rows:
+        key = SUITE_KEY if scope == "suite" else str(row.get("task_id"))
+        out.setdefault(key, RunningStats()).add(row)
+    return out
+
+
+def find_reference(ref: str, suite: str, runs_dir: Path = REPO_ROOT / "runs") -> Path:
+    """Directorio de run de la referencia: `ref` si es un run, si no el último run completo de
+    ese id de modelo con la suite (sin contar shards de runs distribuidos)."""
+    path = Path(ref)
+    if (path / "results.jsonl").exists():
+        return path
+    candidates = []
+    for meta_path in runs_dir.glob("**/run_meta.json"):
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if (
+            meta.get("model", {}).get("id") == ref
+            and meta.get("suite") == suite
+            and meta.get("status") == "completed"
+            and not meta.get("shard_of")
+        ):
+            candidates.append((meta.get("timestamp_utc") or "", meta_path.parent))
+    if not candidates:
+        raise ValueError(f"--reference: no hay un run ni un run completo del modelo {ref!r} con la suite {suite}")
+    return max(candidates)[1]
+
+
+class AdaptiveStopper:
+    """Decide cuándo dejar de pedir casos de una tarea (o de toda la suite) en modo `--adaptive`.
+
+    Por cada clave (task_id, o todas las tareas juntas con scope "suite") lleva pass rate y
+    `score_total` con su intervalo de confianza. Después de `min_cases` casos la clave se detiene si:
+    - `width`: todos los intervalos son más angostos que `ci_width` (el de `score_total`
+      normalizado por el máximo |score| visto, así una escala 0-2 y una 0-1 se tratan igual), o
+    - `above_reference` / `below_reference`: la diferencia con la referencia es significativa
+      al mismo nivel de confianza.
+
+    `add` y `stopped` se llaman desde el thread que escribe resultados y arma los jobs.
+    """
+
+    def __init__(
+        self,
+        *,
+        ci_width: float = 0.1,
+        confidence: float = 0.95,
+        min_cases: int = 20,
+        scope: str = "task",
+        reference: Optional[Dict[str, RunningStats]] = None,
+    ) -> None:
+        if scope not in ADAPTIVE_SCOPES:
+            raise ValueError(f"Scope adaptativo no soportado: {scope}")
+        if not 0 < confidence < 1:
+            raise ValueError(f"--confidence debe estar entre 0 y 1, no {confidence}")
+        self.ci_width = ci_width
+        self.confidence = confidence
+        self.min_cases = max(1, min_cases)
+        self.scope = scope
+        self.reference = reference
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.stats: Dict[str, RunningStats] = {}
+        self.decisions: Dict[str, Dict[str, Any]] = {}
+
+    def key(self, task_id: str) -> str:
+        return SUITE_KEY if self.scope == "suite" else str(task_id)
+
+    def stopped(self, task_id: str) -> bool:
+        return self.key(task_id) in self.decisions
+
+    def add(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Suma el caso; devuelve la decisión si con él la clave queda detenida."""
+        key = self.key(row["task_id"])
+        st = self.stats.setdefault(key, RunningStats())
+        st.add(row)
+        if key in self.decisions or st.n < self.min_cases:
+            return None
+        reason = self._check(key, st)
+        if reason is None:
+            return None
+        self.decisions[key] = {"reason": reason, "at_case": st.n}
+        return self.decisions[key]
+
+    def _check(self, key: str, st: RunningStats) -> Optional[str]:
+        ref = (self.reference or {}).get(key)
+        if ref is not None:
+            cmp = compare(st, ref)
+            if cmp is not None:
+                _, diff, se = cmp
+                if se > 0 and abs(diff) > self.z * se:
+                    return "above_reference" if diff > 0 else "below_reference"
+        widths = [_width(st.pass_ci(self.z)), _width(st.score_ci(self.z), st.score_abs_max)]
+        widths = [w for w in widths if w is not None]
+        if widths and max(widths) <= self.ci_width:
+            return "width"
+        return None
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Estado final por clave para `run_meta.json`: casos usados, decisión e intervalos."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for key, st in self.stats.items():
+            pass_ci = st.pass_ci(self.z)
+            score_ci = st.score_ci(self.z)
+            decision = self.decisions.get(key)
+            entry: Dict[str, Any] = {
+                "cases_used": st.n,
+                "stopped": decision is not None,
+                "reason": decision["reason"] if decision else "exhausted",
+                "stopped_at_case": decision["at_case"] if decision else None,
+                "pass_rate": st.pass_rate,
+                "pass_ci": [round(x, 4) for x in pass_ci] if pass_ci else None,
+                "score_mean": st.score_mean,
+                "score_ci": [round(x, 4) for x in score_ci] if score_ci else None,
+            }
+            ref = (self.reference or {}).get(key)
+            if ref is not None:
+                entry["reference"] = {"cases": ref.n, "pass_rate": ref.pass_rate, "score_mean": ref.score_mean}
+            out[key] = entry
+        return out
+
+
+def load_reference(ref: str, suite: str, scope: str) -> Tuple[Path, Dict[str, RunningStats]]:
+    run_dir = find_reference(ref, suite)
+    return run_dir, stats_by_key(iter_jsonl(str(run_dir / "results.jsonl")), scope)
@@ -3,24 +3,456 @@ from __future__ import annotations
 import argparse
 import csv
 import json
+import sqlite3
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from tools.utils import read_jsonl
+import numpy as np
+
+from tools.bootstrap import mcnemar, mean_ci, paired_bootstrap
+from tools.columnar import TIMING_COLUMNS, build_columns, read_columns
+from tools.sampling import pass_at_k
+from tools.utils import iter_jsonl
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 
+# Sube este número si cambia lo que se guarda por run: fuerza re-indexar todo
+INDEX_VERSION = 4
+
 
 def iter_results_files(runs_dir: Path) -> List[Path]:
     return sorted(runs_dir.glob("**/results.jsonl"))
 
 
-def safe_float(x: Any) -> float:
-    try:
-        return float(x)
-    except Exception:
-        return 0.0
+# Sketch de cuantiles de latencia: buckets logarítmicos con ~1% de error relativo (estilo DDSketch).
+# Se guarda disperso en el resumen de cada run y se combina sumando conteos.
+SKETCH_GAMMA = 1.02
+_LOG_GAMMA = float(np.log(SKETCH_GAMMA))
+
+LATENCY_QUANTILES = (50, 90, 99)
+
+# pass@k reportados; cada uno solo con los casos que tienen al menos k muestras (`--samples`)
+PASS_AT_K = (1, 2, 5, 10, 20, 50, 100)
+
+
+def latency_sketch(values: np.ndarray) -> Dict[str, Any]:
+    v = values[~np.isnan(values)]
+    pos = v[v > 0]
+    keys, counts = np.unique(np.ceil(np.log(pos) / _LOG_GAMMA).astype(np.int64), return_counts=True)
+    return {"zero": int(len(v) - len(pos)), "bins": {str(k): int(c) for k, c in zip(keys, counts)}}
+
+
+def merge_sketches(sketches: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    zero = 0
+    bins: Dict[str, int] = {}
+    for sk in sketches:
+        zero += sk.get("zero", 0)
+        for k, c in sk.get("bins", {}).items():
+            bins[k] = bins.get(k, 0) + c
+    return {"zero": zero, "bins": bins}
+
+
+def sketch_quantiles(sketch: Dict[str, Any], qs: Iterable[float]) -> Dict[float, Optional[float]]:
+    keys = np.array(sorted(int(k) for k in sketch["bins"]), dtype=np.int64)
+    counts = np.array([sketch["bins"][str(k)] for k in keys], dtype=np.int64)
+    # Valor representativo del bucket (gamma^(k-1), gamma^k]: punto medio en error relativo
+    values = np.concatenate([[0.0], 2.0 * SKETCH_GAMMA ** keys.astype(np.float64) / (SKETCH_GAMMA + 1.0)])
+    cum = np.cumsum(np.concatenate([[sketch["zero"]], counts]))
+    n = int(cum[-1]) if len(cum) else 0
+    out: Dict[float, Optional[float]] = {}
+    for q in qs:
+        if n == 0:
+            out[q] = None
+            continue
+        idx = int(np.searchsorted(cum, q / 100.0 * (n - 1), side="right"))
+        out[q] = float(values[min(idx, len(values) - 1)])
+    return out
+
+
+def row_costs(cols: Dict[str, np.ndarray], pricing: Optional[Dict[str, Any]]) -> np.ndarray:
+    """USD por fila: `usage.usd_estimate` si el adapter lo reporta; si no, tokens × `pricing` del registry."""
+    usd = cols["usd_estimate"].astype(np.float64)
+    if pricing:
+        estimated = (
+            cols["input_tokens"] * float(pricing.get("input_per_mtok", 0.0))
+            + cols["output_tokens"] * float(pricing.get("output_per_mtok", 0.0))
+        ) / 1e6
+        usd = np.where(np.isnan(usd), estimated, usd)
+    return usd
+
+
+def _sum_n(values: np.ndarray) -> Tuple[float, int]:
+    valid = ~np.isnan(values)
+    return float(values[valid].sum()), int(valid.sum())
+
+
+def summarize_columns(cols: Dict[str, np.ndarray], pricing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Resumen de un run a partir de sus columnas: lo único que el leaderboard necesita.
+
+    Las métricas se guardan como suma y cantidad (`<m>_sum`, `<m>_n`) y la latencia como sketch,
+    para poder combinarlas entre varios runs del mismo modelo y suite.
+    """
+    score = cols["score_total"]
+    passed = cols["pass_fail"] == 1
+    out: Dict[str, Any] = {
+        "cases": int(len(score)),
+        "score_sum": float(score.sum()),
+        "pass_n": int(passed.sum()),
+        "latency_sketch": latency_sketch(cols["latency_ms"].astype(np.float64)),
+    }
+    # pass@k insesgado por caso; una fila sin `--samples` es una muestra que pasa o no
+    n_samples = np.where(np.isnan(cols["n_samples"]), 1, cols["n_samples"])
+    n_pass = np.where(np.isnan(cols["n_pass"]), passed, cols["n_pass"])
+    for k in PASS_AT_K:
+        total, n = _sum_n(pass_at_k(n_samples, n_pass, k))
+        if n:
+            out[f"pass_at_{k}_sum"], out[f"pass_at_{k}_n"] = total, n
+    usd = row_costs(cols, pricing)
+    metrics = {
+        "latency_ms": cols["latency_ms"],
+        "input_tokens": cols["input_tokens"],
+        "output_tokens": cols["output_tokens"],
+        "usd": usd,
+        **{m: cols[m] for m in TIMING_COLUMNS},
+    }
+    for m, values in metrics.items():
+        out[f"{m}_sum"], out[f"{m}_n"] = _sum_n(values.astype(np.float64))
+    return out
+
+
+SUMMARY_COLUMNS = ["score_total", "pass_fail", "n_samples", "n_pass", "latency_ms", "input_tokens", "output_tokens", "usd_estimate", *TIMING_COLUMNS]
+
+
+def summarize_rows(rows: Iterable[Dict[str, Any]], pricing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return summarize_columns(build_columns(rows), pricing)
+
+
+def summarize_run(run_dir: Path, pricing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Con sidecar columnar solo se leen las columnas numéricas (sin parsear prompts ni outputs)
+    cols = read_columns(run_dir, SUMMARY_COLUMNS)
+    if cols is not None:
+        return summarize_columns(cols, pricing)
+    return summarize_rows(iter_jsonl(str(run_dir / "results.jsonl")), pricing)
+
+
+def _ratio(num: float, den: float) -> Optional[float]:
+    return num / den if den else None
+
+
+def merge_summaries(summaries: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combina los resúmenes de varios runs (mismo modelo y suite) en una fila del leaderboard."""
+    acc: Dict[str, float] = {}
+    sketches = []
+    for sm in summaries:
+        for k, v in sm.items():
+            if k == "latency_sketch":
+                sketches.append(v)
+            else:
+                acc[k] = acc.get(k, 0) + v
+    cases = int(acc.get("cases", 0))
+    avg_score = acc.get("score_sum", 0.0) / max(1, cases)
+    out: Dict[str, Any] = {
+        "cases": cases,
+        "avg_score": avg_score,
+        "pass_rate": acc.get("pass_n", 0) / max(1, cases),
+    }
+    for k in PASS_AT_K:
+        out[f"pass_at_{k}"] = _ratio(acc.get(f"pass_at_{k}_sum", 0.0), acc.get(f"pass_at_{k}_n", 0))
+    quantiles = sketch_quantiles(merge_sketches(sketches), LATENCY_QUANTILES)
+    for q in LATENCY_QUANTILES:
+        out[f"latency_p{q}_ms"] = quantiles[q]
+    out["avg_input_tokens"] = _ratio(acc.get("input_tokens_sum", 0.0), acc.get("input_tokens_n", 0))
+    out["avg_output_tokens"] = _ratio(acc.get("output_tokens_sum", 0.0), acc.get("output_tokens_n", 0))
+    out["usd_per_case"] = _ratio(acc.get("usd_sum", 0.0), acc.get("usd_n", 0))
+    # Todo lo gastado (casos con costo conocido) dividido por los casos aprobados
+    out["usd_per_pass"] = _ratio(acc.get("usd_sum", 0.0), acc.get("pass_n", 0)) if acc.get("usd_n") else None
+    out["score_per_usd"] = _ratio(avg_score, out["usd_per_case"] or 0.0)
+    avg_latency_ms = _ratio(acc.get("latency_ms_sum", 0.0), acc.get("latency_ms_n", 0))
+    out["score_per_s"] = _ratio(avg_score * 1000.0, avg_latency_ms or 0.0)
+    for m in TIMING_COLUMNS:
+        out[f"avg_{m}"] = _ratio(acc.get(f"{m}_sum", 0.0), acc.get(f"{m}_n", 0))
+    return out
+
+
+class AggregateIndex:
+    """Índice SQLite con un resumen por run, invalidado por (mtime, tamaño) de sus archivos.
+
+    Solo los runs nuevos o modificados se vuelven a parsear; el leaderboard sale del índice.
+    """
+
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != INDEX_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS runs")
+            self.conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+              path TEXT PRIMARY KEY,
+              results_mtime_ns INTEGER NOT NULL,
+              results_size INTEGER NOT NULL,
+              meta_mtime_ns INTEGER NOT NULL,
+              run_id TEXT,
+              model_id TEXT,
+              suite TEXT,
+              rescored_from TEXT,
+              cases INTEGER NOT NULL,
+              score_sum REAL NOT NULL,
+              pass_n INTEGER NOT NULL,
+              summary TEXT NOT NULL
+            )
+            """
+        )
+        self.counters = {"parsed": 0, "unchanged": 0, "removed": 0}
+
+    def _fingerprint(self, rf: Path) -> Optional[Tuple[int, int, int]]:
+        meta_path = rf.parent / "run_meta.json"
+        if not meta_path.exists():
+            return None
+        st = rf.stat()
+        return st.st_mtime_ns, st.st_size, meta_path.stat().st_mtime_ns
+
+    def refresh(self, results_files: List[Path]) -> None:
+        known = {
+            path: (r_mtime, r_size, m_mtime)
+            for path, r_mtime, r_size, m_mtime in self.conn.execute(
+                "SELECT path, results_mtime_ns, results_size, meta_mtime_ns FROM runs"
+            )
+        }
+        seen = set()
+        for rf in results_files:
+            fp = self._fingerprint(rf)
+            if fp is None:
+                continue
+            key = str(rf.parent.resolve())
+            seen.add(key)
+            if known.get(key) == fp:
+                self.counters["unchanged"] += 1
+                continue
+            self._index_run(rf, key, fp)
+            self.counters["parsed"] += 1
+
+        gone = [(p,) for p in known if p not in seen]
+        self.conn.executemany("DELETE FROM runs WHERE path = ?", gone)
+        self.counters["removed"] = len(gone)
+        self.conn.commit()
+
+    def _index_run(self, rf: Path, key: str, fp: Tuple[int, int, int]) -> None:
+        meta = json.loads((rf.parent / "run_meta.json").read_text(encoding="utf-8"))
+        if meta.get("shard_of"):
+            # Parcial de un run distribuido: cuenta solo a través del results.jsonl del merge. Se
+            # registra con 0 casos (fuera del leaderboard) para no volver a leerlo si no cambia
+            summary: Dict[str, Any] = {"cases": 0, "score_sum": 0.0, "pass_n": 0, "shard_of": meta["shard_of"]}
+            rescored = None
+        else:
+            summary = summarize_run(rf.parent, meta.get("model", {}).get("pricing"))
+            rescored = meta.get("rescored_from", {}).get("path")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                *fp,
+                meta.get("run_id"),
+                meta.get("model", {}).get("id"),
+                meta.get("suite"),
+                str(Path(rescored).resolve()) if rescored else None,
+                summary["cases"],
+                summary["score_sum"],
+                summary["pass_n"],
+                json.dumps(summary),
+            ),
+        )
+
+    def _active(self) -> Iterable[Tuple[str, str, str, str]]:
+        # Un run re-evaluado (tools/rescore.py) reemplaza al original
+        return self.conn.execute(
+            """
+            SELECT path, model_id, suite, summary
+            FROM runs
+            WHERE cases > 0
+              AND path NOT IN (SELECT rescored_from FROM runs WHERE rescored_from IS NOT NULL)
+            """
+        )
+
+    def run_dirs(self) -> Dict[Tuple[str, str], List[str]]:
+        """Directorios de los runs que entran al leaderboard, por (modelo, suite)."""
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        for path, model_id, suite, _ in self._active():
+            groups.setdefault((model_id, suite), []).append(path)
+        return groups
+
+    def leaderboard(self) -> List[Dict[str, Any]]:
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for _, model_id, suite, summary in self._active():
+            groups.setdefault((model_id, suite), []).append(json.loads(summary))
+        return [
+            {"model_id": model_id, "suite": suite, **merge_summaries(sms)}
+            for (model_id, suite), sms in groups.items()
+        ]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# --- Intervalos bootstrap y comparaciones pareadas (--bootstrap) ---
+
+CASE_COLUMNS = ["task_id", "input_hash", "score_total", "pass_fail"]
+
+
+def load_case_columns(run_dirs: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Columnas por caso de varios runs, concatenadas (del sidecar si está al día)."""
+    parts = []
+    for d in run_dirs:
+        cols = read_columns(Path(d), CASE_COLUMNS)
+        if cols is None:
+            cols = build_columns(iter_jsonl(str(Path(d) / "results.jsonl")))
+        parts.append(cols)
+    return {
+        "task_id": np.concatenate([np.asarray(p["task_id"]).astype(str) for p in parts]),
+        "input_hash": np.concatenate([np.asarray(p["input_hash"]).astype(str) for p in parts]),
+        "score_total": np.concatenate([np.asarray(p["score_total"], dtype=np.float64) for p in parts]),
+        "pass_fail": np.concatenate([np.asarray(p["pass_fail"], dtype=np.int8) for p in parts]),
+    }
+
+
+def task_intervals(
+    groups: Dict[Tuple[str, str], Dict[str, np.ndarray]], *, n_resamples: int, confidence: float, seed: int
+) -> List[Dict[str, Any]]:
+    """IC bootstrap de pass rate y score promedio por (modelo, suite, tarea)."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for (model_id, suite), cols in sorted(groups.items()):
+        for task_id in np.unique(cols["task_id"]):
+            m = cols["task_id"] == task_id
+            pf = cols["pass_fail"][m]
+            # pass rate solo sobre los casos con pass/fail definido (-1 = sin dato)
+            passed = (pf[pf >= 0] == 1).astype(np.float64)
+            pass_rate, pass_lo, pass_hi = mean_ci(passed, n_resamples=n_resamples, confidence=confidence, rng=rng)
+            score, score_lo, score_hi = mean_ci(cols["score_total"][m], n_resamples=n_resamples, confidence=confidence, rng=rng)
+            out.append(
+                {
+                    "suite": suite,
+                    "model_id": model_id,
+                    "task_id": str(task_id),
+                    "cases": int(m.sum()),
+                    "pass_rate": pass_rate,
+                    "pass_lo": pass_lo,
+                    "pass_hi": pass_hi,
+                    "avg_score": score,
+                    "score_lo": score_lo,
+                    "score_hi": score_hi,
+                }
+            )
+    return out
+
+
+def per_input(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Promedios por (task_id, input_hash): varios runs del mismo modelo cuentan como un solo caso.
+
+    `pass` queda en NaN si el caso no tiene pass/fail y puede ser fraccionario si los runs difieren.
+    """
+    keys = np.char.add(np.char.add(cols["task_id"], "\x1f"), cols["input_hash"])
+    uniq, inv = np.unique(keys, return_inverse=True)
+    inv = inv.reshape(-1)
+    counts = np.bincount(inv, minlength=len(uniq))
+    judged = cols["pass_fail"] >= 0
+    judged_n = np.bincount(inv, weights=judged, minlength=len(uniq))
+    pass_n = np.bincount(inv, weights=cols["pass_fail"] == 1, minlength=len(uniq))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        passed = np.where(judged_n > 0, pass_n / judged_n, np.nan)
+    return {
+        "key": uniq,
+        "score": np.bincount(inv, weights=cols["score_total"], minlength=len(uniq)) / counts,
+        "pass": passed,
+    }
+
+
+def paired_comparisons(
+    groups: Dict[Tuple[str, str], Dict[str, np.ndarray]], *, n_resamples: int, confidence: float, seed: int
+) -> List[Dict[str, Any]]:
+    """Cada par de modelos de una suite sobre los casos que ambos evaluaron (mismo input_hash).
+
+    Score: bootstrap pareado de la diferencia media. Pass/fail: McNemar sobre los casos con
+    resultado 0/1 en ambos modelos.
+    """
+    rng = np.random.default_rng(seed)
+    by_suite: Dict[str, Dict[str, Dict[str, np.ndarray]]] = {}
+    for (model_id, suite), cols in groups.items():
+        by_suite.setdefault(suite, {})[model_id] = per_input(cols)
+    out = []
+    for suite, models in sorted(by_suite.items()):
+        ids = sorted(models)
+        for i, a_id in enumerate(ids):
+            for b_id in ids[i + 1 :]:
+                a, b = models[a_id], models[b_id]
+                _, ia, ib = np.intersect1d(a["key"], b["key"], assume_unique=True, return_indices=True)
+                if len(ia) == 0:
+                    continue
+                score = paired_bootstrap(a["score"][ia], b["score"][ib], n_resamples=n_resamples, confidence=confidence, rng=rng)
+                pa, pb = a["pass"][ia], b["pass"][ib]
+                binary = np.isin(pa, (0.0, 1.0)) & np.isin(pb, (0.0, 1.0))
+                mc = mcnemar(pa[binary] == 1.0, pb[binary] == 1.0)
+                out.append(
+                    {
+                        "suite": suite,
+                        "model_a": a_id,
+                        "model_b": b_id,
+                        "pairs": int(len(ia)),
+                        "score_diff": score["diff"],
+                        "score_diff_lo": score["diff_lo"],
+                        "score_diff_hi": score["diff_hi"],
+                        "score_p_value": score["p_value"],
+                        "pass_pairs": int(binary.sum()),
+                        "a_only_pass": mc["a_only"],
+                        "b_only_pass": mc["b_only"],
+                        "mcnemar_p_value": mc["p_value"],
+                    }
+                )
+    return out
+
+
+CI_FIELDS = ["suite", "model_id", "task_id", "cases", "pass_rate", "pass_lo", "pass_hi", "avg_score", "score_lo", "score_hi"]
+PAIRED_FIELDS = [
+    "suite",
+    "model_a",
+    "model_b",
+    "pairs",
+    "score_diff",
+    "score_diff_lo",
+    "score_diff_hi",
+    "score_p_value",
+    "pass_pairs",
+    "a_only_pass",
+    "b_only_pass",
+    "mcnemar_p_value",
+]
+
+
+def _write_csv(path: Path, fields: List[str], rows: Iterable[Dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+
+
+CSV_FIELDS = (
+    ["suite", "model_id", "cases", "avg_score", "pass_rate"]
+    + [f"latency_p{q}_ms" for q in LATENCY_QUANTILES]
+    + ["avg_input_tokens", "avg_output_tokens", "usd_per_case", "usd_per_pass", "score_per_usd", "score_per_s"]
+    + [f"avg_{m}" for m in TIMING_COLUMNS]
+    + [f"pass_at_{k}" for k in PASS_AT_K]
+)
+
+
+def _fmt(v: Optional[float], digits: int) -> str:
+    # Sin dato (p.ej. sin precios o runs sin --stream) la celda queda en "-"
+    return "-" if v is None else f"{v:.{digits}f}"
 
 
 def main() -> int:
@@ -28,82 +460,116 @@ def main() -> int:
     ap.add_argument("--runs-dir", default=str(REPO_ROOT / "runs"), help="Directorio de runs")
     ap.add_argument("--out-csv", default=str(REPO_ROOT / "reports" / "leaderboard.csv"))
     ap.add_argument("--out-md", default=str(REPO_ROOT / "reports" / "leaderboard.md"))
+    ap.add_argument(
+        "--index",
+        default=str(REPO_ROOT / ".cache" / "aggregate_index.sqlite"),
+        help="Índice SQLite con resúmenes por run (solo se re-parsean runs nuevos o modificados)",
+    )
+    ap.add_argument("--rebuild", action="store_true", help="Descarta el índice y re-parsea todos los runs")
+    ap.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Con N > 0: IC bootstrap por tarea y comparaciones pareadas entre modelos (lee las filas de cada run)",
+    )
+    ap.add_argument("--confidence", type=float, default=0.95, help="Nivel de confianza de los intervalos bootstrap")
+    ap.add_argument("--seed", type=int, default=0, help="Semilla del bootstrap")
     args = ap.parse_args()
 
-    runs_dir = Path(args.runs_dir)
-    results_files = iter_results_files(runs_dir)
-
-    # Agregación: promedio de score_total por (model_id, suite)
-    agg: Dict[str, Dict[str, Any]] = {}
+    if args.rebuild and Path(args.index).exists():
+        Path(args.index).unlink()
 
-    for rf in results_files:
-        # Inferir model_id y suite desde la ruta del run
-        run_dir = rf.parent
-        meta_path = run_dir / "run_meta.json"
-        if not meta_path.exists():
-            continue
-        meta = json.loads(meta_path.read_text(encoding="utf-8"))
-        model_id = meta.get("model", {}).get("id")
-        suite = meta.get("suite")
-        key = f"{model_id}::{suite}"
-
-        rows = read_jsonl(str(rf))
-        if not rows:
-            continue
+    runs_dir = Path(args.runs_dir)
+    index = AggregateIndex(args.index)
+    try:
+        index.refresh(iter_results_files(runs_dir))
+        agg = index.leaderboard()
+        run_dirs = index.run_dirs() if args.bootstrap > 0 else {}
+    finally:
+        index.close()
 
-        total = 0.0
-        n = 0
-        pass_n = 0
-        for r in rows:
-            scores = r.get("scores", {})
-            # Convención: si existe score_total úsalo, si no suma scores numéricos
-            if "score_total" in scores:
-                s = safe_float(scores.get("score_total"))
-            else:
-                s = sum(safe_float(v) for v in scores.values())
-            total += s
-            n += 1
-            if r.get("pass_fail") is True:
-                pass_n += 1
-
-        if key not in agg:
-            agg[key] = {
-                "model_id": model_id,
-                "suite": suite,
-                "cases": 0,
-                "avg_score": 0.0,
-                "pass_rate": 0.0,
-            }
-
-        agg[key]["cases"] += n
-        # promedio simple ponderado por casos
-        prev_cases = agg[key]["cases"] - n
-        prev_avg = agg[key]["avg_score"]
-        agg[key]["avg_score"] = ((prev_avg * prev_cases) + total) / max(1, prev_cases + n)
-
-        prev_pr = agg[key]["pass_rate"]
-        agg[key]["pass_rate"] = ((prev_pr * prev_cases) + pass_n) / max(1, prev_cases + n)
-
-    rows_out = sorted(agg.values(), key=lambda x: (x["suite"], -x["avg_score"], -x["pass_rate"]))
+    rows_out = sorted(agg, key=lambda x: (x["suite"], -x["avg_score"], -x["pass_rate"]))
 
     out_csv = Path(args.out_csv)
-    out_csv.parent.mkdir(parents=True, exist_ok=True)
-    with open(out_csv, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["suite", "model_id", "cases", "avg_score", "pass_rate"])
-        w.writeheader()
-        for r in rows_out:
-            w.writerow(r)
+    _write_csv(out_csv, CSV_FIELDS, rows_out)
 
     out_md = Path(args.out_md)
     out_md.parent.mkdir(parents=True, exist_ok=True)
-    md_lines = ["# Leaderboard\n", "| Suite | Model | Cases | Avg score | Pass rate |\n", "|---|---:|---:|---:|---:|\n"]
+    md_lines = [
+        "# Leaderboard\n",
+        "| Suite | Model | Cases | Avg score | Pass rate | USD/case | USD/pass | Score/USD | Score/s |\n",
+        "|---|---:|---:|---:|---:|---:|---:|---:|---:|\n",
+    ]
     for r in rows_out:
         md_lines.append(
-            f"| {r['suite']} | {r['model_id']} | {r['cases']} | {r['avg_score']:.3f} | {r['pass_rate']:.3f} |\n"
+            f"| {r['suite']} | {r['model_id']} | {r['cases']} | {r['avg_score']:.3f} | {r['pass_rate']:.3f} "
+            f"| {_fmt(r['usd_per_case'], 5)} | {_fmt(r['usd_per_pass'], 5)} | {_fmt(r['score_per_usd'], 1)} "
+            f"| {_fmt(r['score_per_s'], 3)} |\n"
         )
+    md_lines += [
+        "\n## Latencia y tokens\n",
+        "| Suite | Model | p50 ms | p90 ms | p99 ms | Tokens in | Tokens out | TTFT ms | ITL p50 ms | ITL p99 ms | Tokens/s |\n",
+        "|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|\n",
+    ]
+    for r in rows_out:
+        md_lines.append(
+            f"| {r['suite']} | {r['model_id']} | {_fmt(r['latency_p50_ms'], 0)} | {_fmt(r['latency_p90_ms'], 0)} "
+            f"| {_fmt(r['latency_p99_ms'], 0)} | {_fmt(r['avg_input_tokens'], 0)} | {_fmt(r['avg_output_tokens'], 0)} "
+            f"| {_fmt(r['avg_ttft_ms'], 1)} | {_fmt(r['avg_itl_p50_ms'], 2)} | {_fmt(r['avg_itl_p99_ms'], 2)} "
+            f"| {_fmt(r['avg_output_tokens_per_s'], 1)} |\n"
+        )
+    # pass@k solo si algún run tiene varias muestras por caso
+    ks = [k for k in PASS_AT_K if k > 1 and any(r[f"pass_at_{k}"] is not None for r in rows_out)]
+    if ks:
+        md_lines += [
+            "\n## pass@k\n",
+            "| Suite | Model | " + " | ".join(f"pass@{k}" for k in [1] + ks) + " |\n",
+            "|---|---:|" + "---:|" * (len(ks) + 1) + "\n",
+        ]
+        for r in rows_out:
+            cells = " | ".join(_fmt(r[f"pass_at_{k}"], 3) for k in [1] + ks)
+            md_lines.append(f"| {r['suite']} | {r['model_id']} | {cells} |\n")
+    ci_rows: List[Dict[str, Any]] = []
+    paired_rows: List[Dict[str, Any]] = []
+    if args.bootstrap > 0:
+        groups = {key: load_case_columns(dirs) for key, dirs in run_dirs.items()}
+        opts = dict(n_resamples=args.bootstrap, confidence=args.confidence, seed=args.seed)
+        ci_rows = task_intervals(groups, **opts)
+        paired_rows = paired_comparisons(groups, **opts)
+        _write_csv(out_csv.with_name(out_csv.stem + "_ci.csv"), CI_FIELDS, ci_rows)
+        _write_csv(out_csv.with_name(out_csv.stem + "_paired.csv"), PAIRED_FIELDS, paired_rows)
+        level = f"{args.confidence:.0%}"
+        md_lines += [
+            f"\n## Intervalos por tarea (bootstrap {level}, {args.bootstrap} remuestras)\n",
+            "| Suite | Model | Task | Cases | Pass rate | IC pass | Avg score | IC score |\n",
+            "|---|---|---|---:|---:|---:|---:|---:|\n",
+        ]
+        for r in ci_rows:
+            md_lines.append(
+                f"| {r['suite']} | {r['model_id']} | {r['task_id']} | {r['cases']} | {_fmt(r['pass_rate'], 3)} "
+                f"| [{_fmt(r['pass_lo'], 3)}, {_fmt(r['pass_hi'], 3)}] | {_fmt(r['avg_score'], 3)} "
+                f"| [{_fmt(r['score_lo'], 3)}, {_fmt(r['score_hi'], 3)}] |\n"
+            )
+        md_lines += [
+            "\n## Comparaciones pareadas (mismo input_hash)\n",
+            "| Suite | A | B | Pares | Score A-B | IC | p (bootstrap) | Solo A pasa | Solo B pasa | p (McNemar) |\n",
+            "|---|---|---|---:|---:|---:|---:|---:|---:|---:|\n",
+        ]
+        for r in paired_rows:
+            md_lines.append(
+                f"| {r['suite']} | {r['model_a']} | {r['model_b']} | {r['pairs']} | {_fmt(r['score_diff'], 3)} "
+                f"| [{_fmt(r['score_diff_lo'], 3)}, {_fmt(r['score_diff_hi'], 3)}] | {_fmt(r['score_p_value'], 4)} "
+                f"| {r['a_only_pass']} | {r['b_only_pass']} | {_fmt(r['mcnemar_p_value'], 4)} |\n"
+            )
     out_md.write_text("".join(md_lines), encoding="utf-8")
 
+    c = index.counters
+    print(f"Runs: {c['parsed']} parseados, {c['unchanged']} sin cambios, {c['removed']} eliminados del índice")
     print(f"CSV: {out_csv}")
+    if args.bootstrap > 0:
+        print(f"IC por tarea: {out_csv.with_name(out_csv.stem + '_ci.csv')} ({len(ci_rows)} filas)")
+        print(f"Pareadas: {out_csv.with_name(out_csv.stem + '_paired.csv')} ({len(paired_rows)} pares)")
     print(f"MD:  {out_md}")
     return 0
 
@@ -0,0 +1,453 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+try:
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover - opcional
+    zstandard = None
+
+
+ARTIFACT_STORES = ("sqlite", "dir")
+DB_NAME = "artifacts.sqlite"
+
+# Blobs más chicos que esto se guardan sin comprimir (el overhead no compensa)
+MIN_COMPRESS_BYTES = 128
+# Los puts se acumulan en memoria y se escriben en una transacción cada N archivos o cada
+# FLUSH_S segundos: evita un commit por archivo y no retiene el lock de escritura entre puts
+FLUSH_EVERY = 256
+FLUSH_S = 1.0
+
+
+def _compress(data: bytes) -> Tuple[str, bytes]:
+    if len(data) < MIN_COMPRESS_BYTES:
+        return "raw", data
+    if zstandard is not None:
+        packed, codec = zstandard.ZstdCompressor(level=6).compress(data), "zstd"
+    else:
+        packed, codec = zlib.compress(data, 6), "zlib"
+    return (codec, packed) if len(packed) < len(data) else ("raw", data)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "raw":
+        return data
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Instala 'zstandard' para leer artifacts comprimidos con zstd")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Codec de artifact desconocido: {codec}")
+
+
+def _as_bytes(data: Union[str, bytes]) -> bytes:
+    # surrogatepass: una salida del modelo con surrogates sueltos se guarda tal cual en vez de
+    # cortar la evaluación (o el lote entero) con UnicodeEncodeError
+    return data.encode("utf-8", errors="surrogatepass") if isinstance(data, str) else data
+
+
+class CaseWorkdir(str):
+    """Workdir de un caso tal como lo recibe `evaluate(case, model_output, workdir)`.
+
+    Es la ruta (str) de siempre, así los evaluadores existentes no cambian. Además da acceso
+    directo al store: un evaluador que declara `NEEDS_WORKDIR = False` recibe la ruta sin crear,
+    guarda con `save_artifact(workdir, nombre, contenido)` sin tocar el disco y, si al final
+    necesita un directorio real, lo pide con `workdir.mkdir()`.
+    """
+
+    store: "ArtifactStore"
+    task_id: str
+    case_id: str
+
+    def __new__(cls, path: Union[str, Path], store: "ArtifactStore", task_id: str, case_id: Any) -> "CaseWorkdir":
+        obj = super().__new__(cls, str(path))
+        obj.store = store
+        obj.task_id = str(task_id)
+        obj.case_id = str(case_id)
+        return obj
+
+    def save(self, name: str, data: Union[str, bytes]) -> None:
+        self.store.put(self.task_id, self.case_id, name, _as_bytes(data))
+
+    def mkdir(self) -> Path:
+        path = Path(self)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+
+def save_artifact(workdir: Union[str, CaseWorkdir], name: str, data: Union[str, bytes]) -> None:
+    """Guarda un artifact del caso: en el store si lo hay, si no como archivo en `workdir`."""
+    if isinstance(workdir, CaseWorkdir):
+        workdir.save(name, data)
+        return
+    path = Path(workdir)
+    path.mkdir(parents=True, exist_ok=True)
+    (path / name).write_bytes(_as_bytes(data))
+
+
+def needs_workdir(evaluate: Callable[..., Any]) -> bool:
+    """False si el módulo del evaluador declara `NEEDS_WORKDIR = False` (solo usa `save_artifact`)."""
+    return bool(getattr(evaluate, "__globals__", {}).get("NEEDS_WORKDIR", True))
+
+
+class ArtifactStore:
+    """Dónde quedan los archivos que escriben los evaluadores de cada caso."""
+
+    kind = ""
+
+    def workdir(self, task_id: str, case_id: Any, *, create: bool = True) -> CaseWorkdir:
+        raise NotImplementedError
+
+    def put(self, task_id: str, case_id: str, name: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def finish_case(self, workdir: CaseWorkdir) -> None:
+        """Se llama después de evaluar: el store recoge lo que quedó en el workdir."""
+
+    def get(self, task_id: str, case_id: Any, name: str) -> bytes:
+        raise NotImplementedError
+
+    def list(self, task_id: Optional[str] = None, case_id: Optional[Any] = None) -> Iterator[Tuple[str, str, str, int]]:
+        """(task_id, case_id, nombre, tamaño) de los artifacts guardados."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"store": self.kind}
+
+    def close(self) -> None:
+        pass
+
+
+class DirArtifactStore(ArtifactStore):
+    """Layout clásico: `<run>/artifacts/<task_id>/<case_id>/` con archivos sueltos."""
+
+    kind = "dir"
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+
+    def workdir(self, task_id: str, case_id: Any, *, create: bool = True) -> CaseWorkdir:
+        wd = CaseWorkdir(self.root / str(task_id) / str(case_id), self, task_id, case_id)
+        if create:
+            wd.mkdir()
+        return wd
+
+    def put(self, task_id: str, case_id: str, name: str, data: bytes) -> None:
+        path = self.root / task_id / case_id / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    def get(self, task_id: str, case_id: Any, name: str) -> bytes:
+        return (self.root / str(task_id) / str(case_id) / name).read_bytes()
+
+    def list(self, task_id: Optional[str] = None, case_id: Optional[Any] = None) -> Iterator[Tuple[str, str, str, int]]:
+        if not self.root.exists():
+            return
+        for task_dir in sorted(self.root.iterdir()):
+            if task_id is not None and task_dir.name != str(task_id):
+                continue
+            for case_dir in sorted(task_dir.iterdir()):
+                if case_id is not None and case_dir.name != str(case_id):
+                    continue
+                for f in sorted(p for p in case_dir.rglob("*") if p.is_file()):
+                    yield task_dir.name, case_dir.name, f.relative_to(case_dir).as_posix(), f.stat().st_size
+
+
+class SqliteArtifactStore(ArtifactStore):
+    """Artifacts de uno o varios runs en un SQLite: blobs por sha256 (deduplicados y comprimidos
+    con zstd, o zlib sin `zstandard`) más un índice (run_id, task_id, case_id, nombre) -> blob.
+
+    Un run entero queda en un solo archivo en vez de un directorio por caso. Apuntar varios runs al
+    mismo `db` (`--artifacts-db`) deduplica también entre runs. Los evaluadores que necesitan un
+    directorio real (p.ej. pytest) reciben uno temporal; al terminar el caso su contenido se guarda
+    en el store y el directorio se borra.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, db_path: Path, run_id: str) -> None:
+        self.db_path = Path(db_path)
+        self.run_id = run_id
+        self.counters = {"files": 0, "bytes": 0, "new_blobs": 0, "stored_bytes": 0, "dedup_hits": 0, "temp_dirs": 0}
+        self._lock = threading.Lock()
+        self._blobs: List[Tuple[str, str, int, bytes]] = []
+        self._files: List[Tuple[str, str, str, str, str, int]] = []
+        self._buffered: Set[str] = set()
+        self._last_flush = time.monotonic()
+        self._scratch: Optional[Path] = None
+        self._n_dirs = 0
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+              sha256 TEXT PRIMARY KEY,
+              codec TEXT NOT NULL,
+              size INTEGER NOT NULL,
+              data BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+              run_id TEXT NOT NULL,
+              task_id TEXT NOT NULL,
+              case_id TEXT NOT NULL,
+              name TEXT NOT NULL,
+              sha256 TEXT NOT NULL,
+              size INTEGER NOT NULL,
+              PRIMARY KEY (run_id, task_id, case_id, name)
+            )
+            """
+        )
+
+    # --- escritura ---
+
+    def workdir(self, task_id: str, case_id: Any, *, create: bool = True) -> CaseWorkdir:
+        with self._lock:
+            if self._scratch is None:
+                self._scratch = Path(tempfile.mkdtemp(prefix="genai_artifacts_"))
+            self._n_dirs += 1
+            path = self._scratch / str(self._n_dirs)
+        wd = CaseWorkdir(path, self, task_id, case_id)
+        if create:
+            wd.mkdir()
+        return wd
+
+    def put(self, task_id: str, case_id: str, name: str, data: bytes) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            known = digest in self._buffered or self._conn.execute(
+                "SELECT 1 FROM blobs WHERE sha256 = ?", (digest,)
+            ).fetchone() is not None
+        # La compresión va fuera del lock: otros threads de evaluación siguen guardando
+        packed = None if known else _compress(data)
+        with self._lock:
+            if packed is not None and digest not in self._buffered:
+                self._blobs.append((digest, packed[0], len(data), packed[1]))
+                self._buffered.add(digest)
+                self.counters["new_blobs"] += 1
+                self.counters["stored_bytes"] += len(packed[1])
+            else:
+                self.counters["dedup_hits"] += 1
+            self._files.append((self.run_id, task_id, case_id, name, digest, len(data)))
+            self.counters["files"] += 1
+            self.counters["bytes"] += len(data)
+            if len(self._files) >= FLUSH_EVERY or time.monotonic() - self._last_flush >= FLUSH_S:
+                self._flush()
+
+    def _flush(self) -> None:
+        # Se llama con el lock tomado
+        self._last_flush = time.monotonic()
+        if not self._files:
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany("INSERT OR IGNORE INTO blobs (sha256, codec, size, data) VALUES (?, ?, ?, ?)", self._blobs)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (run_id, task_id, case_id, name, sha256, size) VALUES (?, ?, ?, ?, ?, ?)",
+                self._files,
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._blobs, self._files = [], []
+        self._buffered.clear()
+
+    def finish_case(self, workdir: CaseWorkdir) -> None:
+        path = Path(workdir)
+        if not path.exists():
+            return
+        with self._lock:
+            self.counters["temp_dirs"] += 1
+        for f in sorted(p for p in path.rglob("*") if p.is_file()):
+            self.put(workdir.task_id, workdir.case_id, f.relative_to(path).as_posix(), f.read_bytes())
+        shutil.rmtree(path, ignore_errors=True)
+
+    def absorb(self, other_db: Path, other_run_id: str) -> int:
+        """Pasa a este run los artifacts de `other_run_id` guardados en `other_db` (p.ej. los shards
+        de un run distribuido). Los blobs ya presentes no se copian. Devuelve cuántos archivos movió."""
+        with self._lock:
+            self._flush()
+            if Path(other_db).resolve() == self.db_path.resolve():
+                cur = self._conn.execute(
+                    "UPDATE OR REPLACE files SET run_id = ? WHERE run_id = ?", (self.run_id, other_run_id)
+                )
+                return cur.rowcount
+            self._conn.execute("ATTACH DATABASE ? AS other", (str(other_db),))
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute(
+                    """
+                    INSERT OR IGNORE INTO blobs
+                    SELECT b.* FROM other.blobs b
+                    WHERE b.sha256 IN (SELECT sha256 FROM other.files WHERE run_id = ?)
+                    """,
+                    (other_run_id,),
+                )
+                cur = self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO files
+                    SELECT ?, task_id, case_id, name, sha256, size FROM other.files WHERE run_id = ?
+                    """,
+                    (self.run_id, other_run_id),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._conn.execute("DETACH DATABASE other")
+            return cur.rowcount
+
+    # --- lectura ---
+
+    def get(self, task_id: str, case_id: Any, name: str) -> bytes:
+        with self._lock:
+            self._flush()
+            row = self._conn.execute(
+                """
+                SELECT b.codec, b.data FROM files f JOIN blobs b ON b.sha256 = f.sha256
+                WHERE f.run_id = ? AND f.task_id = ? AND f.case_id = ? AND f.name = ?
+                """,
+                (self.run_id, str(task_id), str(case_id), name),
+            ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"{task_id}/{case_id}/{name} no está en {self.db_path}")
+        return _decompress(row[0], row[1])
+
+    def list(self, task_id: Optional[str] = None, case_id: Optional[Any] = None) -> Iterator[Tuple[str, str, str, int]]:
+        sql = "SELECT task_id, case_id, name, size FROM files WHERE run_id = ?"
+        args: list = [self.run_id]
+        if task_id is not None:
+            sql += " AND task_id = ?"
+            args.append(str(task_id))
+        if case_id is not None:
+            sql += " AND case_id = ?"
+            args.append(str(case_id))
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(sql + " ORDER BY task_id, case_id, name", args).fetchall()
+        yield from rows
+
+    def stats(self) -> Dict[str, Any]:
+        return {"store": self.kind, **self.counters}
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._conn.close()
+            if self._scratch is not None:
+                shutil.rmtree(self._scratch, ignore_errors=True)
+                self._scratch = None
+
+
+class MemoryArtifactStore(ArtifactStore):
+    """Junta en memoria los artifacts de los casos para que otro proceso los guarde (workers de
+    rescore); los workdir que hagan falta son temporales."""
+
+    kind = "memory"
+
+    def __init__(self) -> None:
+        self.files: List[Tuple[str, str, str, bytes]] = []
+
+    def workdir(self, task_id: str, case_id: Any, *, create: bool = True) -> CaseWorkdir:
+        wd = CaseWorkdir(tempfile.mkdtemp(prefix="genai_artifacts_"), self, task_id, case_id)
+        if not create:
+            Path(wd).rmdir()
+        return wd
+
+    def put(self, task_id: str, case_id: str, name: str, data: bytes) -> None:
+        self.files.append((task_id, case_id, name, data))
+
+    def finish_case(self, workdir: CaseWorkdir) -> None:
+        path = Path(workdir)
+        if path.exists():
+            for f in sorted(p for p in path.rglob("*") if p.is_file()):
+                self.put(workdir.task_id, workdir.case_id, f.relative_to(path).as_posix(), f.read_bytes())
+            shutil.rmtree(path, ignore_errors=True)
+
+    def drain(self) -> List[Tuple[str, str, str, bytes]]:
+        files, self.files = self.files, []
+        return files
+
+
+def store_config(kind: str, run_id: str, db: Optional[str] = None) -> Dict[str, Any]:
+    """Config del store tal como queda en `run_meta.json` (`db` relativo al run si es el default)."""
+    if kind not in ARTIFACT_STORES:
+        raise ValueError(f"Store de artifacts no soportado: {kind}")
+    if db and kind != "sqlite":
+        raise ValueError("--artifacts-db requiere --artifacts sqlite")
+    cfg: Dict[str, Any] = {"store": kind}
+    if kind == "sqlite":
+        cfg["db"] = str(Path(db).resolve()) if db else DB_NAME
+        cfg["run_id"] = run_id
+    return cfg
+
+
+def open_store(run_dir: Path, cfg: Dict[str, Any]) -> ArtifactStore:
+    kind = cfg.get("store", "dir")
+    if kind == "dir":
+        return DirArtifactStore(Path(run_dir) / "artifacts")
+    if kind == "sqlite":
+        return SqliteArtifactStore(Path(run_dir) / cfg.get("db", DB_NAME), cfg["run_id"])
+    raise ValueError(f"Store de artifacts no soportado: {kind}")
+
+
+def store_for_run(run_dir: Path) -> ArtifactStore:
+    """Store de un run existente según su run_meta.json (runs anteriores al store: directorios)."""
+    meta = json.loads((Path(run_dir) / "run_meta.json").read_text(encoding="utf-8"))
+    return open_store(Path(run_dir), meta.get("artifacts") or {"store": "dir"})
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Lista, muestra o exporta los artifacts de un run")
+    ap.add_argument("run_dir", help="Directorio del run")
+    ap.add_argument("--task", default=None, help="Filtra por task_id")
+    ap.add_argument("--case", default=None, help="Filtra por case_id")
+    ap.add_argument("--cat", default=None, metavar="NOMBRE", help="Imprime el artifact NOMBRE (requiere --task y --case)")
+    ap.add_argument("--export", default=None, metavar="DIR", help="Escribe los artifacts como archivos en DIR/<task>/<case>/")
+    args = ap.parse_args()
+
+    store = store_for_run(Path(args.run_dir))
+    try:
+        if args.cat:
+            if args.task is None or args.case is None:
+                ap.error("--cat requiere --task y --case")
+            sys.stdout.buffer.write(store.get(args.task, args.case, args.cat))
+            return 0
+        n = 0
+        for task_id, case_id, name, size in store.list(args.task, args.case):
+            if args.export:
+                dest = Path(args.export) / task_id / case_id / name
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                dest.write_bytes(store.get(task_id, case_id, name))
+            else:
+                print(f"{task_id}/{case_id}/{name}\t{size}")
+            n += 1
+        if args.export:
+            print(f"{n} artifacts exportados a {args.export}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+from models.adapters.base import BaseAdapter, GenResult
+
+
+# Límite de requests por batch de la API de OpenAI; suites más grandes se parten en varios
+MAX_BATCH_REQUESTS = 50000
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+STATE_NAME = "batch.json"
+
+
+def custom_id(task_id: str, case_id: Any) -> str:
+    return f"{task_id}/{case_id}"
+
+
+def _load_state(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _save_state(path: Path, state: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def run_batch(
+    adapter: BaseAdapter,
+    jobs: Sequence[Any],
+    *,
+    system: str,
+    params: Dict[str, Any],
+    out_dir: Path,
+    poll_s: float = 30.0,
+    log: Callable[[str], None] = print,
+) -> Dict[str, GenResult]:
+    """Genera `jobs` vía la batch API del adapter y devuelve los resultados por `custom_id`.
+
+    El estado (ids de batch y su status) se guarda en `<out_dir>/batch.json` después de cada paso,
+    así un run reanudado con `--resume` no vuelve a enviar nada: sigue consultando los mismos batches.
+    Los casos que el batch no resolvió simplemente no aparecen en el resultado.
+    """
+    if not adapter.supports_batch:
+        raise RuntimeError(f"El adapter {type(adapter).__name__} no soporta --batch")
+
+    state_path = out_dir / STATE_NAME
+    state = _load_state(state_path)
+    if not state:
+        chunks = [jobs[i : i + MAX_BATCH_REQUESTS] for i in range(0, len(jobs), MAX_BATCH_REQUESTS)]
+        state = {"requests": len(jobs), "poll_s": poll_s, "batches": []}
+        for i, chunk in enumerate(chunks):
+            input_path = out_dir / f"batch_input_{i:03d}.jsonl"
+            with open(input_path, "w", encoding="utf-8") as f:
+                for job in chunk:
+                    line = adapter.batch_request(
+                        custom_id(job.task_id, job.case.get("case_id")),
+                        system=system,
+                        user=job.user_prompt,
+                        params=params,
+                    )
+                    f.write(json.dumps(line, ensure_ascii=False) + "\n")
+            state["batches"].append({"input_file": input_path.name, "requests": len(chunk)})
+        _save_state(state_path, state)
+
+    # Envío: solo los que todavía no tienen id (p.ej. si el proceso murió a mitad del envío)
+    for b in state["batches"]:
+        if not b.get("id"):
+            b["id"] = adapter.submit_batch(str(out_dir / b["input_file"]), params)
+            b["status"] = "submitted"
+            b["submitted_at"] = time.time()
+            _save_state(state_path, state)
+            log(f"Batch enviado: {b['id']} ({b['requests']} requests)")
+
+    # Polling hasta que todos los batches terminen
+    while True:
+        for b in state["batches"]:
+            if b.get("status") in TERMINAL_STATUSES:
+                continue
+            info = adapter.poll_batch(b["id"], params)
+            b.update(info)
+        _save_state(state_path, state)
+        pending = [b for b in state["batches"] if b.get("status") not in TERMINAL_STATUSES]
+        if not pending:
+            break
+        counts = [b.get("request_counts") or {} for b in state["batches"]]
+        done = sum(int(c.get("completed") or 0) for c in counts)
+        log(f"Batch en curso: {done}/{state['requests']} completados; próximo chequeo en {poll_s:g}s")
+        time.sleep(poll_s)
+
+    results: Dict[str, GenResult] = {}
+    for b in state["batches"]:
+        if b["status"] != "completed":
+            log(f"Batch {b['id']} terminó con status {b['status']}; se usa la salida parcial si existe")
+        results.update(adapter.fetch_batch(b, params))
+    state["results"] = len(results)
+    _save_state(state_path, state)
+    return results
+
+
+class BatchResultsAdapter(BaseAdapter):
+    """Sirve las respuestas ya obtenidas por batch; lo que falte lo genera `inner` en forma interactiva.
+
+    Las claves son los prompts de usuario (mismo system y params para todo el run), así el
+    pipeline normal de evaluación (`run_jobs`) se reutiliza sin cambios.
+    """
+
+    def __init__(self, inner: BaseAdapter, by_prompt: Dict[str, GenResult]) -> None:
+        self.inner = inner
+        self.by_prompt = by_prompt
+        self.served = 0
+        self.fallback = 0
+
+    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        gen = self.by_prompt.get(user)
+        if gen is not None:
+            self.served += 1
+            # Sin latencia interactiva: el batch se procesó offline
+            return replace(gen, source="batch")
+        self.fallback += 1
+        return self.inner.generate(system=system, user=user, params=params)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.inner.stats()
+
+    def close(self) -> None:
+        self.inner.close()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def results_by_prompt(jobs: List[Any], results: Dict[str, GenResult]) -> Dict[str, GenResult]:
+    """Mapea los resultados del batch (por `custom_id` = task_id/case_id) a los prompts de cada caso."""
+    out: Dict[str, GenResult] = {}
+    for job in jobs:
+        gen = results.get(custom_id(job.task_id, job.case.get("case_id")))
+        if gen is not None:
+            out[job.user_prompt] = gen
+    return out
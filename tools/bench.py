@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from tools.catalog import SUITES_DIR, TaskCatalog
+from tools.run_suite import RunOptions, SuiteRun, git_commit
+
+
+# Sube este número si cambia el significado de alguna métrica: no se comparan versiones distintas
+BENCH_VERSION = 3
+
+
+def make_bench_suites(root: Path, suites: List[str], n_cases: int) -> None:
+    """Copia las suites a `root` con `n_cases` casos sintéticos por tarea.
+
+    Los casos sintéticos repiten en ciclo los casos reales con un `case_id` nuevo, así los prompts,
+    evaluadores y fixtures son los de verdad y el mock sigue respondiendo bien.
+    """
+    for suite in suites:
+        src = SUITES_DIR / suite
+        if not (src / "tasks").is_dir():
+            raise ValueError(f"Suite no encontrada: {suite}")
+        dst = root / suite
+        shutil.copytree(src, dst, ignore=shutil.ignore_patterns("__pycache__"))
+        for task_dir in (dst / "tasks").iterdir():
+            cases_path = task_dir / "cases.jsonl"
+            base = [json.loads(line) for line in cases_path.read_text(encoding="utf-8").splitlines() if line.strip()]
+            with open(cases_path, "w", encoding="utf-8") as f:
+                for i in range(n_cases):
+                    case = dict(base[i % len(base)])
+                    case["case_id"] = f"{case.get('case_id')}_{i:06d}"
+                    f.write(json.dumps(case, ensure_ascii=False) + "\n")
+
+
+def _cpu_s() -> float:
+    # Propio + hijos (el sandbox de los evaluadores de código corre en procesos aparte)
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def bench_suite(
+    suite: str,
+    *,
+    suites_dir: Path,
+    runs_dir: Path,
+    latency_ms: int,
+    concurrency: int,
+    eval_workers: Optional[int],
+) -> Dict[str, Any]:
+    """Corre una suite completa con el modelo mock y devuelve throughput y tiempos por etapa.
+
+    Las etapas son las de `--stage-times` de run_suite (ver `tools/tracing.py`).
+    """
+    cpu0 = _cpu_s()
+    t0 = time.perf_counter()
+    catalog = TaskCatalog(cache_dir=runs_dir / ".catalog", suites_dir=suites_dir)
+    run = SuiteRun(
+        RunOptions(
+            model="mock",
+            suite=suite,
+            concurrency=concurrency,
+            eval_workers=eval_workers,
+            stage_times=True,
+            out_dir=str(runs_dir / suite),
+        ),
+        catalog=catalog,
+    )
+    startup_s = time.perf_counter() - t0
+    run.model_cfg["params"]["mock_delay_ms"] = latency_ms
+
+    t_run = time.perf_counter()
+    meta = run.execute()
+    wall_s = time.perf_counter() - t_run
+    cpu_s = _cpu_s() - cpu0
+
+    n = max(1, run.n_new)
+    stages = {stage: s["total_s"] for stage, s in meta["stages"].items()}
+    if concurrency <= 1:
+        # Secuencial: lo que no cae en ninguna etapa (lectura de casos, armado de filas, cierre del run)
+        stages["other"] = max(0.0, wall_s - sum(stages.values()))
+    return {
+        "suite": suite,
+        "cases": run.n_new,
+        "startup_s": round(startup_s, 4),
+        "wall_s": round(wall_s, 4),
+        "cases_per_s": round(run.n_new / wall_s, 2) if wall_s > 0 else None,
+        "cpu_s": round(cpu_s, 4),
+        "cpu_ms_per_case": round(cpu_s * 1000 / n, 4),
+        "stages": {
+            stage: {"total_s": round(total, 4), "per_case_ms": round(total * 1000 / n, 4)}
+            for stage, total in stages.items()
+        },
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Regresiones de `current` contra `baseline` (misma suite y config) mayores a `max_regression`."""
+    if baseline.get("bench_version") != current["bench_version"]:
+        return [f"bench_version distinta ({baseline.get('bench_version')} vs {current['bench_version']}): no comparable"]
+    if baseline.get("config") != current["config"]:
+        print("[WARN] La config del baseline es distinta; la comparación es orientativa", file=sys.stderr)
+    problems: List[str] = []
+    base_by_suite = {r["suite"]: r for r in baseline.get("results", [])}
+    for r in current["results"]:
+        b = base_by_suite.get(r["suite"])
+        if not b:
+            continue
+        # Throughput: más es mejor. CPU por caso (costo propio del harness): menos es mejor
+        for metric, higher_is_better in (("cases_per_s", True), ("cpu_ms_per_case", False)):
+            old, new = b.get(metric), r.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            print(f"{r['suite']:<22} {metric:<16} {old:>12.3f} -> {new:>12.3f} ({change:+.1%})", file=sys.stderr)
+            worse = -change if higher_is_better else change
+            if worse > max_regression:
+                problems.append(f"{r['suite']}: {metric} empeoró {worse:.1%} (tope {max_regression:.0%})")
+    return problems
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark del harness: corre suites con el modelo mock y casos sintéticos")
+    ap.add_argument("--suites", nargs="*", default=None, help="Suites a medir (por defecto todas)")
+    ap.add_argument("--cases", type=int, default=1000, help="Casos sintéticos por tarea")
+    ap.add_argument("--latency-ms", type=int, default=0, help="Latencia inyectada en cada generación del mock")
+    ap.add_argument("--concurrency", type=int, default=1, help="Generaciones en vuelo simultáneas")
+    ap.add_argument("--eval-workers", type=int, default=None, help="Threads de evaluación")
+    ap.add_argument("--repeat", type=int, default=3, help="Repeticiones por suite; se reporta la más rápida")
+    ap.add_argument("--out", default=None, help="Guarda el resultado JSON en este archivo")
+    ap.add_argument("--baseline", default=None, help="JSON de un bench anterior para comparar")
+    ap.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.10,
+        help="Con --baseline: sale con código 1 si alguna métrica empeora más que esta fracción",
+    )
+    ap.add_argument("--keep", action="store_true", help="No borra el directorio temporal con suites y runs")
+    args = ap.parse_args()
+
+    suites = args.suites or sorted(p.name for p in SUITES_DIR.iterdir() if (p / "tasks").is_dir())
+    work = Path(tempfile.mkdtemp(prefix="genai_bench_"))
+    try:
+        make_bench_suites(work / "suites", suites, args.cases)
+        results = []
+        for suite in suites:
+            # La mejor de N repeticiones: filtra el ruido de otros procesos de la máquina
+            tries = [
+                bench_suite(
+                    suite,
+                    suites_dir=work / "suites",
+                    runs_dir=work / "runs" / f"r{k}",
+                    latency_ms=args.latency_ms,
+                    concurrency=args.concurrency,
+                    eval_workers=args.eval_workers,
+                )
+                for k in range(max(1, args.repeat))
+            ]
+            best = min(tries, key=lambda r: r["wall_s"])
+            best["wall_s_all"] = [r["wall_s"] for r in tries]
+            results.append(best)
+    finally:
+        if args.keep:
+            print(f"Directorio de trabajo: {work}", file=sys.stderr)
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        "bench_version": BENCH_VERSION,
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "suites": suites,
+            "cases_per_task": args.cases,
+            "latency_ms": args.latency_ms,
+            "concurrency": args.concurrency,
+            "eval_workers": args.eval_workers,
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        problems = compare(report, baseline, args.max_regression)
+        for p in problems:
+            print(f"[REGRESIÓN] {p}", file=sys.stderr)
+        if problems:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+# Con hasta tantos valores distintos el bootstrap de la media se muestrea con una multinomial
+# (O(resamples × valores distintos)); pass/fail y los scores 0-2 de las tareas caen siempre acá
+MAX_DISTINCT = 64
+# Elementos por bloque de la matriz de índices (resamples × filas) en el caso general: ~32 MB en int32
+CHUNK_ELEMS = 8_000_000
+
+
+def bootstrap_means(values: np.ndarray, n_resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """Medias de `n_resamples` remuestras bootstrap de `values` (con reemplazo, mismo tamaño).
+
+    Todo con operaciones matriciales. Si los valores distintos son pocos, contar cuántas veces sale
+    cada uno es una multinomial y la media sale de un producto `conteos @ valores`, exacto y sin
+    materializar índices. Si no, índices `resamples × filas` por bloques de memoria acotada.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return np.full(n_resamples, np.nan)
+    uniq, counts = np.unique(values, return_counts=True)
+    if len(uniq) <= MAX_DISTINCT:
+        draws = rng.multinomial(n, counts / n, size=n_resamples)
+        return draws @ uniq / n
+    out = np.empty(n_resamples)
+    step = max(1, CHUNK_ELEMS // n)
+    for start in range(0, n_resamples, step):
+        stop = min(n_resamples, start + step)
+        idx = rng.integers(0, n, size=(stop - start, n), dtype=np.int32 if n < 2**31 else np.int64)
+        out[start:stop] = values[idx].mean(axis=1)
+    return out
+
+
+def percentile_ci(boot: np.ndarray, confidence: float) -> Tuple[float, float]:
+    alpha = (1.0 - confidence) / 2.0
+    lo, hi = np.quantile(boot, [alpha, 1.0 - alpha])
+    return float(lo), float(hi)
+
+
+def mean_ci(
+    values: np.ndarray, *, n_resamples: int, confidence: float, rng: np.random.Generator
+) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """(media, límite inferior, límite superior) con intervalo bootstrap percentil."""
+    if len(values) == 0:
+        return None, None, None
+    lo, hi = percentile_ci(bootstrap_means(values, n_resamples, rng), confidence)
+    return float(np.mean(values)), lo, hi
+
+
+def paired_bootstrap(
+    a: np.ndarray, b: np.ndarray, *, n_resamples: int, confidence: float, rng: np.random.Generator
+) -> Dict[str, Optional[float]]:
+    """Diferencia media pareada `a - b` (mismos casos, alineados) con IC y p-valor bootstrap.
+
+    El p-valor es bilateral con la distribución bootstrap centrada en 0 (hipótesis nula sin
+    diferencia): fracción de remuestras con |media - observada| >= |observada|.
+    """
+    diff = np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)
+    if len(diff) == 0:
+        return {"diff": None, "diff_lo": None, "diff_hi": None, "p_value": None}
+    observed = float(diff.mean())
+    boot = bootstrap_means(diff, n_resamples, rng)
+    lo, hi = percentile_ci(boot, confidence)
+    # +1 en numerador y denominador: el p-valor bootstrap nunca es exactamente 0
+    extreme = int(np.count_nonzero(np.abs(boot - observed) >= abs(observed) - 1e-12))
+    return {"diff": observed, "diff_lo": lo, "diff_hi": hi, "p_value": (extreme + 1) / (n_resamples + 1)}
+
+
+# Hasta este número de pares discordantes McNemar usa la binomial exacta; arriba, chi-cuadrado
+MCNEMAR_EXACT_MAX = 1000
+
+
+def mcnemar(a_pass: np.ndarray, b_pass: np.ndarray) -> Dict[str, Optional[float]]:
+    """Test de McNemar sobre pass/fail pareado: solo importan los pares discordantes.
+
+    `a_only`: casos que pasa A y no B; `b_only`: al revés. p-valor bilateral exacto (binomial con
+    p = 0.5) hasta `MCNEMAR_EXACT_MAX` discordantes; con más, chi-cuadrado con corrección de continuidad.
+    """
+    a_pass = np.asarray(a_pass, dtype=bool)
+    b_pass = np.asarray(b_pass, dtype=bool)
+    a_only = int(np.count_nonzero(a_pass & ~b_pass))
+    b_only = int(np.count_nonzero(~a_pass & b_pass))
+    n = a_only + b_only
+    if n == 0:
+        p = 1.0
+    elif n <= MCNEMAR_EXACT_MAX:
+        k = min(a_only, b_only)
+        log_terms = [math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1) - n * math.log(2) for i in range(k + 1)]
+        p = min(1.0, 2.0 * float(np.exp(log_terms).sum()))
+    else:
+        chi2 = (abs(a_only - b_only) - 1) ** 2 / n
+        p = math.erfc(math.sqrt(chi2 / 2))
+    return {"a_only": a_only, "b_only": b_only, "p_value": p}
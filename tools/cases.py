@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import time
+from array import array
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CASE_INDEX_DIR = REPO_ROOT / ".cache" / "case_index"
+# Índices sin usar por más de esto se borran al construir otro (archivos borrados o que ya no se muestrean)
+INDEX_MAX_AGE_S = 30 * 86400
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """`"2/8"` -> `(2, 8)`; el índice va de 0 a n-1."""
+    i, sep, n = value.partition("/")
+    if not sep or not i.isdigit() or not n.isdigit() or int(n) < 1 or int(i) >= int(n):
+        raise ValueError(f"--shard espera i/n con 0 <= i < n, no {value!r}")
+    return int(i), int(n)
+
+
+def open_binary(path: Path) -> IO[bytes]:
+    """Abre un archivo de casos en binario, descomprimiendo `.gz` y `.zst` al vuelo."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".zst":
+        try:
+            import zstandard  # type: ignore
+        except Exception as e:
+            raise RuntimeError("Instala 'zstandard' para leer casos .zst") from e
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    return open(path, "rb")
+
+
+class CaseSource:
+    """Casos de una tarea leídos en streaming desde su `cases.jsonl` (opcionalmente `.gz`/`.zst`).
+
+    Nada se materializa: iterar lee línea a línea y `select` corta apenas junta lo pedido.
+    El índice de offsets (un int64 por caso) se construye solo cuando hace falta muestrear o
+    barajar, y se guarda en `.cache/case_index/` invalidado por (mtime, tamaño) del archivo;
+    en archivos sin comprimir da acceso aleatorio O(1) con `seek`.
+
+    `check(offset, caso)` (opcional) se llama con cada caso a medida que se lee, con el offset de
+    su línea; puede lanzar una excepción para cortar la lectura de un caso inválido.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        index_dir: Optional[Path] = CASE_INDEX_DIR,
+        check: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.index_dir = index_dir
+        self.check = check
+        self._offsets: Optional[np.ndarray] = None
+
+    @property
+    def compressed(self) -> bool:
+        return self.path.suffix in (".gz", ".zst")
+
+    def _iter_raw(self) -> Iterator[Tuple[int, bytes]]:
+        """(offset, línea) de las líneas no vacías; offsets sobre el contenido descomprimido."""
+        pos = 0
+        with open_binary(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield pos, line
+                pos += len(line)
+
+    def _parse(self, offset: int, line: bytes) -> Dict[str, Any]:
+        case = json.loads(line)
+        if self.check is not None:
+            self.check(offset, case)
+        return case
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for offset, line in self._iter_raw():
+            yield self._parse(offset, line)
+
+    # --- índice de offsets ---
+
+    def _index_path(self) -> Optional[Path]:
+        if self.index_dir is None:
+            return None
+        st = self.path.stat()
+        digest = hashlib.sha256(str(self.path.resolve()).encode("utf-8")).hexdigest()[:16]
+        return self.index_dir / f"{digest}_{st.st_mtime_ns}_{st.st_size}.npy"
+
+    def offsets(self) -> np.ndarray:
+        if self._offsets is not None:
+            return self._offsets
+        idx_path = self._index_path()
+        if idx_path is not None and idx_path.exists():
+            self._offsets = np.load(idx_path, mmap_mode="r")
+            # El mtime del índice marca su último uso (ver `_prune_indexes`)
+            os.utime(idx_path)
+            return self._offsets
+        offs = array("q", (pos for pos, _ in self._iter_raw()))
+        self._offsets = np.frombuffer(offs, dtype=np.int64) if offs else np.zeros(0, dtype=np.int64)
+        if idx_path is not None:
+            idx_path.parent.mkdir(parents=True, exist_ok=True)
+            _prune_indexes(idx_path)
+            tmp = idx_path.with_name(idx_path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, self._offsets)
+            tmp.replace(idx_path)
+        return self._offsets
+
+    def __len__(self) -> int:
+        return int(len(self.offsets()))
+
+    def known_count(self) -> Optional[int]:
+        """Cantidad de casos si ya se conoce sin leer el archivo (índice en memoria o en disco)."""
+        if self._offsets is not None:
+            return int(len(self._offsets))
+        idx_path = self._index_path()
+        if idx_path is not None and idx_path.exists():
+            return len(self)
+        return None
+
+    def get(self, i: int) -> Dict[str, Any]:
+        """Caso en la posición `i` (O(1) sin compresión; comprimido descomprime hasta ahí)."""
+        offset = int(self.offsets()[i])
+        if self.compressed:
+            for pos, line in self._iter_raw():
+                if pos == offset:
+                    return self._parse(offset, line)
+        with open_binary(self.path) as f:
+            f.seek(offset)
+            return self._parse(offset, f.readline())
+
+    # --- selección ---
+
+    def positions(
+        self,
+        *,
+        max_cases: Optional[int] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        sample: Optional[int] = None,
+        seed: int = 0,
+    ) -> Optional[np.ndarray]:
+        """Posiciones elegidas (ordenadas) o None si no hay muestra y alcanza con filtrar en streaming.
+
+        Primero la muestra de `sample` casos sobre todo el archivo (sin reemplazo, con `seed`), luego
+        el corte en `max_cases` y al final el shard `i/n`, que se queda con las posiciones `p % n == i`.
+        Así la unión de los n shards es exactamente la selección sin shard. Mismo archivo + mismos
+        argumentos -> mismos casos, en cualquier máquina.
+        """
+        if sample is None:
+            return None
+        pop = np.arange(len(self), dtype=np.int64)
+        if sample < len(pop):
+            rng = np.random.default_rng(seed)
+            pop = np.sort(rng.choice(pop, size=sample, replace=False))
+        if max_cases is not None:
+            pop = pop[: max(0, max_cases)]
+        if shard is not None:
+            i, n = shard
+            pop = pop[pop % n == i]
+        return pop
+
+    def count(
+        self,
+        n_cases: Optional[int],
+        *,
+        max_cases: Optional[int] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        sample: Optional[int] = None,
+        seed: int = 0,
+    ) -> Optional[int]:
+        """Cuántos casos devuelve `select` con estos argumentos, sin leer el archivo salvo con muestra.
+
+        Con `n_cases` desconocido (None) y sin muestra devuelve None: contar obligaría a recorrer el
+        archivo entero, y sin muestra `select` lo lee solo hasta donde haga falta.
+        """
+        if max_cases is not None and max_cases <= 0:
+            return 0
+        if sample is not None and shard is not None:
+            return int(len(self.positions(max_cases=max_cases, shard=shard, sample=sample, seed=seed)))  # type: ignore[arg-type]
+        if n_cases is None:
+            if sample is None:
+                return None
+            # La muestra necesita el índice de todas formas
+            n_cases = len(self)
+        k = n_cases
+        if sample is not None:
+            k = min(k, sample)
+        if max_cases is not None:
+            k = min(k, max(0, max_cases))
+        if shard is not None:
+            k = len(range(shard[0], k, shard[1]))
+        return k
+
+    def shuffled(
+        self,
+        *,
+        max_cases: Optional[int] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        sample: Optional[int] = None,
+        seed: int = 0,
+    ) -> Iterator[Dict[str, Any]]:
+        """Los mismos casos que `select`, en orden aleatorio (reproducible con `seed`).
+
+        Para `--adaptive`: cualquier prefijo del orden es una muestra aleatoria de la selección.
+        Sin compresión lee cada caso con un `seek`; comprimido junta las líneas elegidas en una pasada.
+        """
+        chosen = self.positions(max_cases=max_cases, shard=shard, sample=sample, seed=seed)
+        if chosen is None:
+            chosen = np.arange(len(self), dtype=np.int64)
+            if max_cases is not None:
+                chosen = chosen[: max(0, max_cases)]
+            if shard is not None:
+                chosen = chosen[chosen % shard[1] == shard[0]]
+        # Flujo aleatorio distinto del de `sample`: el orden no depende de cómo se eligió la muestra
+        order: List[int] = np.random.default_rng([seed, 1]).permutation(chosen).tolist()
+
+        if not self.compressed:
+            offsets = self.offsets()
+            with open_binary(self.path) as f:
+                for p in order:
+                    f.seek(int(offsets[p]))
+                    yield self._parse(int(offsets[p]), f.readline())
+            return
+
+        wanted = set(order)
+        lines: Dict[int, Tuple[int, bytes]] = {}
+        for pos, raw in enumerate(self._iter_raw()):
+            if pos in wanted:
+                lines[pos] = raw
+        for p in order:
+            yield self._parse(*lines.pop(p))
+
+    def select(
+        self,
+        *,
+        max_cases: Optional[int] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        sample: Optional[int] = None,
+        seed: int = 0,
+    ) -> Iterator[Dict[str, Any]]:
+        """Itera los casos elegidos (ver `positions`) en orden de archivo; sin muestra corta la lectura
+        apenas pasa la posición `max_cases`."""
+        if max_cases is not None and max_cases <= 0:
+            return
+        chosen = self.positions(max_cases=max_cases, shard=shard, sample=sample, seed=seed)
+
+        if chosen is not None and not self.compressed:
+            # Acceso aleatorio: un seek por caso elegido
+            offsets = self.offsets()
+            with open_binary(self.path) as f:
+                for p in chosen:
+                    f.seek(int(offsets[p]))
+                    yield self._parse(int(offsets[p]), f.readline())
+            return
+
+        i, n = shard or (0, 1)
+        targets = iter(chosen.tolist()) if chosen is not None else None
+        want = next(targets, None) if targets is not None else None
+        for pos, (offset, line) in enumerate(self._iter_raw()):
+            if targets is not None:
+                if want is None:
+                    return
+                if pos != want:
+                    continue
+                want = next(targets, None)
+            else:
+                if max_cases is not None and pos >= max_cases:
+                    return
+                if pos % n != i:
+                    continue
+            yield self._parse(offset, line)
+
+
+def _prune_indexes(idx_path: Path) -> None:
+    """Antes de escribir `idx_path`: borra las versiones anteriores del mismo archivo y los índices
+    que nadie usó en `INDEX_MAX_AGE_S` (de archivos borrados o que ya no se muestrean)."""
+    prefix = idx_path.name.split("_", 1)[0] + "_"
+    cutoff = time.time() - INDEX_MAX_AGE_S
+    for old in idx_path.parent.glob("*.npy"):
+        try:
+            if old.name.startswith(prefix) or old.stat().st_mtime < cutoff:
+                old.unlink()
+        except FileNotFoundError:
+            # Otro proceso lo borró antes
+            continue
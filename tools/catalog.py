@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib.util
+import os
+import pickle
+import string
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Collection, Dict, FrozenSet, List, Optional, Tuple
+
+import yaml
+
+from tools.cases import CaseSource
+from tools.utils import read_text
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SUITES_DIR = REPO_ROOT / "suites"
+CATALOG_CACHE_DIR = REPO_ROOT / ".cache" / "catalog"
+
+# Sube este número si cambia el formato persistido
+CATALOG_VERSION = 3
+
+
+def iter_tasks_for_suite(suite: str, suites_dir: Path = SUITES_DIR) -> List[Path]:
+    tasks_dir = suites_dir / suite / "tasks"
+    if not tasks_dir.exists():
+        raise ValueError(f"Suite no encontrada: {suite}")
+    return sorted([p for p in tasks_dir.iterdir() if p.is_dir()])
+
+
+def load_task_config(task_dir: Path) -> Dict[str, Any]:
+    cfg_path = task_dir / "task.yml"
+    with open(cfg_path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def import_evaluator(task_dir: Path):
+    ev_path = task_dir / "evaluator.py"
+    spec = importlib.util.spec_from_file_location(f"evaluator_{task_dir.name}", ev_path)
+    if not spec or not spec.loader:
+        raise RuntimeError(f"No se pudo cargar evaluator: {ev_path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore
+    if not hasattr(module, "evaluate"):
+        raise RuntimeError("evaluator.py debe exponer una función evaluate(case, model_output, workdir)")
+    return module.evaluate
+
+
+def batch_evaluator(evaluate: Callable[..., Any]) -> Optional[Callable[..., List[Dict[str, Any]]]]:
+    """`evaluate_batch(cases, outputs, workdirs)` del módulo del evaluador, si lo expone.
+
+    Opcional: evalúa un lote de salidas de una tarea en una sola llamada (una salida por
+    posición, con su caso y su workdir) y devuelve un resultado por salida, en el mismo orden.
+    """
+    fn = getattr(evaluate, "__globals__", {}).get("evaluate_batch")
+    return fn if callable(fn) else None
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _stat_key(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+# Evaluadores memoizados por (ruta, mtime, tamaño): un import por proceso
+_EVALUATORS: Dict[Tuple[str, int, int], Callable[..., Dict[str, Any]]] = {}
+_EVALUATORS_LOCK = threading.Lock()
+
+
+def get_evaluator(task_dir: Path) -> Callable[..., Dict[str, Any]]:
+    ev_path = (task_dir / "evaluator.py").resolve()
+    key = (str(ev_path), *_stat_key(ev_path))
+    with _EVALUATORS_LOCK:
+        fn = _EVALUATORS.get(key)
+        if fn is None:
+            fn = import_evaluator(task_dir)
+            _EVALUATORS[key] = fn
+        return fn
+
+
+@dataclass
+class TaskSpec:
+    """Tarea cargada y validada: config, template de prompt ya parseado y fuente de casos.
+
+    `cases` se lee en streaming (ver `tools/cases.py`) y cada caso se valida al leerlo (ver
+    `CaseCheck`). `known_cases` es la cantidad de casos si ya se conoce sin leer el archivo (catálogo
+    persistido o índice de offsets); `n_cases` la calcula si hace falta, recorriendo el archivo.
+    """
+
+    id: str
+    name: Optional[str]
+    dir: Path
+    prompt_template: str
+    prompt_fields: Tuple[str, ...]
+    cases: CaseSource
+    known_cases: Optional[int] = None
+    paths: Dict[str, Path] = field(default_factory=dict)
+    files: Dict[str, Tuple[int, int, str]] = field(default_factory=dict)  # nombre -> (mtime, tamaño, sha256)
+
+    @property
+    def n_cases(self) -> int:
+        if self.known_cases is None:
+            self.known_cases = len(self.cases)
+        return self.known_cases
+
+    def render(self, case: Dict[str, Any]) -> str:
+        return self.prompt_template.format_map(case)
+
+    @property
+    def evaluate(self) -> Callable[..., Dict[str, Any]]:
+        return get_evaluator(self.dir)
+
+
+def _template_fields(template: str) -> Tuple[str, ...]:
+    fields: List[str] = []
+    for _, name, _, _ in string.Formatter().parse(template):
+        if name is None:
+            continue
+        root = name.split(".", 1)[0].split("[", 1)[0]
+        if root and root not in fields:
+            fields.append(root)
+    return tuple(fields)
+
+
+def validate_task(task_id: str, paths: Dict[str, Path]) -> List[str]:
+    """Errores de la tarea en sí (vacío si está OK): archivos que faltan. No lee los casos: cada
+    caso se valida cuando se lee (ver `CaseCheck`) y `validate_cases` los recorre todos."""
+    return [f"{task_id}: falta {p.name}" for p in paths.values() if not p.exists()]
+
+
+class CaseCheck:
+    """Valida cada caso de una tarea a medida que se lee (el `check` de su `CaseSource`).
+
+    Un caso sin `case_id`, con un `case_id` ya visto en otra línea o sin alguna variable del prompt
+    corta la lectura con ValueError. Los `case_id` vistos se recuerdan por offset: releer la misma
+    línea (otro run, `--resume`) no cuenta como duplicado.
+    """
+
+    def __init__(self, task_id: str, prompt_fields: Tuple[str, ...]) -> None:
+        self.task_id = task_id
+        self.prompt_fields = prompt_fields
+        self._seen: Dict[Any, int] = {}
+
+    def errors(self, offset: int, case: Dict[str, Any]) -> List[str]:
+        errors: List[str] = []
+        cid = case.get("case_id")
+        if cid is None:
+            errors.append(f"{self.task_id}: caso sin case_id (offset {offset})")
+        elif self._seen.setdefault(cid, offset) != offset:
+            errors.append(f"{self.task_id}: case_id duplicado {cid!r}")
+        missing = [f for f in self.prompt_fields if f not in case]
+        if missing:
+            errors.append(f"{self.task_id}: caso {cid!r} sin variables del prompt {missing}")
+        return errors
+
+    def __call__(self, offset: int, case: Dict[str, Any]) -> None:
+        errors = self.errors(offset, case)
+        if errors:
+            raise ValueError("Caso inválido:\n- " + "\n- ".join(errors))
+
+
+def validate_cases(spec: TaskSpec) -> List[str]:
+    """Errores de todos los casos de una tarea (vacío si están OK), en una pasada en streaming.
+    De paso deja en `spec.known_cases` la cantidad de casos."""
+    check = CaseCheck(spec.id, spec.prompt_fields)
+    errors: List[str] = []
+    n = 0
+    for n, case in enumerate(CaseSource(spec.cases.path, index_dir=None), start=1):
+        errors.extend(check.errors(n - 1, case))
+    spec.known_cases = n
+    return errors
+
+
+class TaskCatalog:
+    """Carga suites una vez, las valida y persiste lo parseado en `.cache/catalog/`.
+
+    Cada archivo de la tarea (task.yml, prompt, cases, evaluator.py) se identifica por su sha256;
+    si (mtime, tamaño) no cambió ni siquiera se vuelve a hashear. Solo se cargan y validan las
+    tareas pedidas; de cada una se valida la config al cargarla y los casos a medida que se leen.
+    Los casos no se persisten ni se cargan en memoria: solo su cantidad. En memoria, las suites y
+    los evaluadores quedan memoizados para corridas repetidas y de matriz en el mismo proceso.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = CATALOG_CACHE_DIR, suites_dir: Path = SUITES_DIR) -> None:
+        self.cache_dir = cache_dir
+        self.suites_dir = suites_dir
+        self._suites: Dict[Tuple[str, Optional[FrozenSet[str]]], List[TaskSpec]] = {}
+        self._lock = threading.Lock()
+        self.counters = {"tasks_from_cache": 0, "tasks_parsed": 0}
+
+    # --- persistencia ---
+
+    def _cache_path(self, suite: str) -> Optional[Path]:
+        return self.cache_dir / f"{suite}.pkl" if self.cache_dir else None
+
+    def _read_persisted(self, suite: str) -> Dict[str, Any]:
+        path = self._cache_path(suite)
+        if not path or not path.exists():
+            return {}
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except Exception:
+            return {}
+        if data.get("version") != CATALOG_VERSION:
+            return {}
+        return data.get("tasks", {})
+
+    def _write_persisted(self, suite: str, tasks: Dict[str, Any]) -> None:
+        path = self._cache_path(suite)
+        if not path:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".pkl.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": CATALOG_VERSION, "tasks": tasks}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    # --- carga ---
+
+    def _load_task(
+        self, tdir: Path, prev: Dict[str, Any], selected: Optional[FrozenSet[str]]
+    ) -> Optional[Tuple[Optional[TaskSpec], Dict[str, Any], bool, List[str]]]:
+        """(spec, entrada persistida, si cambió, errores) de la tarea; None si no está en `selected`."""
+        prev_files = prev.get("files", {})
+        cfg_path = tdir / "task.yml"
+        try:
+            cfg_fp = _fingerprint(cfg_path, prev_files.get("task.yml"))
+            same_cfg = "cfg" in prev and _digest(prev_files.get("task.yml")) == cfg_fp[2]
+            cfg = prev["cfg"] if same_cfg else (load_task_config(tdir) or {})
+        except Exception:
+            # Una tarea sin task.yml legible no puede ser una de las pedidas
+            if selected is not None:
+                return None
+            raise
+        if selected is not None and cfg.get("id") not in selected:
+            return None
+        for key in ("id", "prompt", "cases"):
+            if not cfg.get(key):
+                raise ValueError(f"{cfg_path}: falta el campo '{key}'")
+
+        paths = {
+            "task.yml": cfg_path,
+            "prompt": tdir / cfg["prompt"],
+            "cases": tdir / cfg["cases"],
+            "evaluator.py": tdir / "evaluator.py",
+        }
+        errors = validate_task(cfg["id"], paths)
+        if errors:
+            return None, prev, False, errors
+        files = {name: _fingerprint(p, prev_files.get(name)) for name, p in paths.items()}
+        unchanged = "prompt" in prev and all(_digest(prev_files.get(k)) == v[2] for k, v in files.items())
+
+        prompt = prev["prompt"] if unchanged else read_text(str(paths["prompt"]))
+        prompt_fields = _template_fields(prompt)
+        # La cantidad de casos persistida vale mientras el archivo de casos sea el mismo
+        same_cases = _digest(prev_files.get("cases")) == files["cases"][2]
+        spec = TaskSpec(
+            id=cfg["id"],
+            name=cfg.get("name"),
+            dir=tdir,
+            prompt_template=prompt,
+            prompt_fields=prompt_fields,
+            cases=CaseSource(paths["cases"], check=CaseCheck(cfg["id"], prompt_fields)),
+            known_cases=prev.get("n_cases") if same_cases else None,
+            paths=paths,
+            files=files,
+        )
+        if spec.known_cases is None:
+            spec.known_cases = spec.cases.known_count()
+        self.counters["tasks_from_cache" if unchanged else "tasks_parsed"] += 1
+
+        entry: Dict[str, Any] = {"cfg": cfg, "prompt": prompt, "files": files, "n_cases": spec.known_cases}
+        dirty = (
+            not unchanged
+            or files != {k: tuple(v) for k, v in prev_files.items()}
+            or prev.get("n_cases") != spec.known_cases
+        )
+        return spec, entry, dirty, errors
+
+    def remember_cases(self, spec: TaskSpec, n: Optional[int] = None) -> None:
+        """Persiste la cantidad de casos de `spec` (`n`, o la que ya conoce) una vez que se sabe,
+        p.ej. al terminar un run que recorrió el archivo entero."""
+        if n is not None:
+            spec.known_cases = n
+        if spec.known_cases is None:
+            return
+        suite = spec.dir.parent.parent.name
+        with self._lock:
+            tasks = self._read_persisted(suite)
+            entry = tasks.get(spec.dir.name)
+            # Solo si la entrada es de esta misma versión de la tarea
+            if not entry or entry.get("files") != spec.files or entry.get("n_cases") == spec.known_cases:
+                return
+            entry["n_cases"] = spec.known_cases
+            self._write_persisted(suite, tasks)
+
+    def load_suite(self, suite: str, tasks: Optional[Collection[str]] = None) -> List[TaskSpec]:
+        """Tareas de la suite (solo las de `tasks`, si se pasa) en orden de directorio.
+
+        Las tareas que no se pidieron no se validan: una tarea rota fuera de la selección no
+        impide correr las demás.
+        """
+        selected = frozenset(tasks) if tasks else None
+        with self._lock:
+            cached = self._suites.get((suite, selected))
+            if cached is not None and all(_fresh(t) for t in cached):
+                return cached
+
+            prev_tasks = self._read_persisted(suite)
+            specs: List[TaskSpec] = []
+            # Las tareas no cargadas conservan su entrada persistida
+            entries: Dict[str, Any] = {}
+            errors: List[str] = []
+            dirty = False
+            for tdir in iter_tasks_for_suite(suite, self.suites_dir):
+                prev = prev_tasks.get(tdir.name, {})
+                loaded = self._load_task(tdir, prev, selected)
+                if loaded is None:
+                    if prev:
+                        entries[tdir.name] = prev
+                    continue
+                spec, entry, changed, task_errors = loaded
+                errors.extend(task_errors)
+                if spec is not None:
+                    specs.append(spec)
+                entries[tdir.name] = entry
+                dirty = dirty or changed
+            if errors:
+                raise ValueError("Suite inválida:\n- " + "\n- ".join(errors))
+            if dirty or set(entries) != set(prev_tasks):
+                self._write_persisted(suite, entries)
+            self._suites[(suite, selected)] = specs
+            return specs
+
+
+def _digest(fp: Optional[Tuple[int, int, str]]) -> Optional[str]:
+    return fp[2] if fp else None
+
+
+def _fingerprint(path: Path, prev: Optional[Tuple[int, int, str]]) -> Tuple[int, int, str]:
+    """(mtime, tamaño, sha256); si (mtime, tamaño) no cambió se reutiliza el hash previo."""
+    mtime, size = _stat_key(path)
+    if prev and prev[0] == mtime and prev[1] == size:
+        return tuple(prev)  # type: ignore[return-value]
+    return mtime, size, _sha256_file(path)
+
+
+def _fresh(spec: TaskSpec) -> bool:
+    # Revalidación en memoria: ningún archivo de la tarea cambió de mtime/tamaño
+    try:
+        return all(_stat_key(p) == spec.files[name][:2] for name, p in spec.paths.items())
+    except OSError:
+        return False
+
+
+_CATALOG: Optional[TaskCatalog] = None
+
+
+def get_catalog() -> TaskCatalog:
+    global _CATALOG
+    if _CATALOG is None:
+        _CATALOG = TaskCatalog()
+    return _CATALOG
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Valida suites y mide el tiempo de carga del catálogo de tareas")
+    ap.add_argument("suites", nargs="*", help="Suites a validar (por defecto todas)")
+    ap.add_argument("--no-cache", action="store_true", help="Ignora el catálogo persistido en .cache/catalog/")
+    args = ap.parse_args()
+
+    suites = args.suites or sorted(p.name for p in SUITES_DIR.iterdir() if (p / "tasks").is_dir())
+    catalog = TaskCatalog(cache_dir=None if args.no_cache else CATALOG_CACHE_DIR)
+    rc = 0
+    for suite in suites:
+        t0 = time.perf_counter()
+        try:
+            specs = catalog.load_suite(suite)
+            errors = [e for spec in specs for e in validate_cases(spec)]
+            if errors:
+                raise ValueError("Suite inválida:\n- " + "\n- ".join(errors))
+            for spec in specs:
+                catalog.remember_cases(spec)
+            for spec in specs:
+                spec.evaluate
+        except Exception as e:
+            print(f"[ERROR] {suite}: {e}")
+            rc = 1
+            continue
+        ms = (time.perf_counter() - t0) * 1000
+        n_cases = sum(s.n_cases for s in specs)
+        print(f"[OK] {suite}: {len(specs)} tareas, {n_cases} casos, carga {ms:.1f} ms")
+    c = catalog.counters
+    print(f"Tareas desde cache: {c['tasks_from_cache']}, parseadas: {c['tasks_parsed']}")
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import argparse
+import math
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from tools.utils import iter_jsonl, row_score, safe_float
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+PARQUET_NAME = "results.columns.parquet"
+NPZ_NAME = "results.columns.npz"
+
+KEY_COLUMNS = ("task_id", "case_id", "input_hash")
+# Métricas de streaming (campo `timing` de la fila); NaN en filas generadas sin stream
+TIMING_COLUMNS = ("ttft_ms", "itl_p50_ms", "itl_p90_ms", "itl_p99_ms", "output_tokens_per_s")
+NUMERIC_COLUMNS = (
+    "latency_ms",
+    "input_tokens",
+    "output_tokens",
+    "usd_estimate",
+    "score_total",
+    "pass_fail",
+    "n_samples",
+    "n_pass",
+) + TIMING_COLUMNS
+SCORE_PREFIX = "score__"
+
+
+def _pyarrow():
+    """Devuelve (pyarrow, pyarrow.parquet) o None si no está instalado."""
+    try:
+        import pyarrow as pa  # type: ignore
+        import pyarrow.parquet as pq  # type: ignore
+    except Exception:
+        return None
+    return pa, pq
+
+
+def _num(x: Any) -> float:
+    if x is None or isinstance(x, bool):
+        return math.nan
+    return safe_float(x)
+
+
+def build_columns(rows: Iterable[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Columnas compactas de un results.jsonl: claves, métricas numéricas y scores.
+
+    `prompt`, `raw_output` y `notes` quedan fuera (siguen en results.jsonl).
+    `pass_fail` se codifica como int8: 1 / 0 / -1 (sin dato).
+    """
+    keys: Dict[str, List[str]] = {k: [] for k in KEY_COLUMNS}
+    nums: Dict[str, List[float]] = {k: [] for k in NUMERIC_COLUMNS}
+    scores: Dict[str, List[float]] = {}
+    n = 0
+    for r in rows:
+        for k in KEY_COLUMNS:
+            keys[k].append(str(r.get(k)))
+        usage = r.get("usage") or {}
+        nums["latency_ms"].append(_num(r.get("latency_ms")))
+        nums["input_tokens"].append(_num(usage.get("input_tokens")))
+        nums["output_tokens"].append(_num(usage.get("output_tokens")))
+        nums["usd_estimate"].append(_num(usage.get("usd_estimate")))
+        nums["score_total"].append(row_score(r))
+        pf = r.get("pass_fail")
+        nums["pass_fail"].append(1 if pf is True else (0 if pf is False else -1))
+        # Con `--samples`: muestras y aprobadas del caso; NaN en filas de una sola muestra
+        nums["n_samples"].append(_num(r.get("n_samples")))
+        nums["n_pass"].append(_num(r.get("n_pass")))
+        timing = r.get("timing") or {}
+        for k in TIMING_COLUMNS:
+            nums[k].append(_num(timing.get(k)))
+        for name, v in (r.get("scores") or {}).items():
+            col = scores.setdefault(SCORE_PREFIX + name, [math.nan] * n)
+            col.append(_num(v))
+        n += 1
+        for col in scores.values():
+            if len(col) < n:
+                col.append(math.nan)
+
+    out: Dict[str, np.ndarray] = {k: np.array(v, dtype=str) for k, v in keys.items()}
+    for k, v in nums.items():
+        out[k] = np.array(v, dtype=np.int8 if k == "pass_fail" else np.float64)
+    for k, v in scores.items():
+        out[k] = np.array(v, dtype=np.float64)
+    return out
+
+
+def export_run(run_dir: Path, fmt: str = "auto") -> Path:
+    """Escribe el sidecar columnar de un run (Parquet si hay pyarrow, si no .npz)."""
+    cols = build_columns(iter_jsonl(str(run_dir / "results.jsonl")))
+    pa_mods = _pyarrow() if fmt in ("auto", "parquet") else None
+    if fmt == "parquet" and pa_mods is None:
+        raise RuntimeError("Instala 'pyarrow' para exportar en Parquet")
+
+    if pa_mods is not None:
+        pa, pq = pa_mods
+        path = run_dir / PARQUET_NAME
+        pq.write_table(pa.table({k: pa.array(v) for k, v in cols.items()}), str(path), compression="zstd")
+        stale = run_dir / NPZ_NAME
+    else:
+        path = run_dir / NPZ_NAME
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **cols)
+        stale = run_dir / PARQUET_NAME
+    if stale.exists():
+        stale.unlink()
+    return path
+
+
+def sidecar_path(run_dir: Path) -> Optional[Path]:
+    """Sidecar vigente (no más antiguo que results.jsonl), o None."""
+    results = run_dir / "results.jsonl"
+    for name in (PARQUET_NAME, NPZ_NAME):
+        p = run_dir / name
+        if p.exists() and results.exists() and p.stat().st_mtime_ns >= results.stat().st_mtime_ns:
+            return p
+    return None
+
+
+def read_columns(run_dir: Path, columns: Sequence[str]) -> Optional[Dict[str, np.ndarray]]:
+    """Lee solo `columns` del sidecar del run; None si no hay sidecar vigente o le faltan columnas
+    (sidecars escritos por versiones anteriores)."""
+    path = sidecar_path(run_dir)
+    if path is None:
+        return None
+    if path.suffix == ".parquet":
+        pa_mods = _pyarrow()
+        if pa_mods is None:
+            return None
+        _, pq = pa_mods
+        if not set(columns) <= set(pq.read_schema(str(path)).names):
+            return None
+        table = pq.read_table(str(path), columns=list(columns))
+        return {c: table.column(c).to_numpy() for c in columns}
+    # .npz carga cada columna de forma perezosa
+    with np.load(path) as z:
+        if not set(columns) <= set(z.files):
+            return None
+        return {c: z[c] for c in columns}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Exporta el sidecar columnar (scores/latencia/uso) de uno o más runs")
+    ap.add_argument("run_dirs", nargs="*", help="Directorios de run (por defecto: todos los de --runs-dir)")
+    ap.add_argument("--runs-dir", default=str(REPO_ROOT / "runs"), help="Directorio de runs")
+    ap.add_argument("--format", choices=["auto", "parquet", "npz"], default="auto")
+    ap.add_argument("--force", action="store_true", help="Re-exporta aunque el sidecar esté al día")
+    args = ap.parse_args()
+
+    if args.run_dirs:
+        run_dirs = [Path(d) for d in args.run_dirs]
+    else:
+        run_dirs = sorted(p.parent for p in Path(args.runs_dir).glob("**/results.jsonl"))
+
+    n = 0
+    for d in run_dirs:
+        if not args.force and sidecar_path(d) is not None:
+            continue
+        export_run(d, args.format)
+        n += 1
+    print(f"Sidecars exportados: {n} (de {len(run_dirs)} runs)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,550 @@
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import itertools
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from tools.artifacts import DB_NAME, SqliteArtifactStore, open_store, store_config
+from tools.catalog import get_catalog
+from tools.columnar import export_run
+from tools.run_suite import RunCancelled, RunOptions, SuiteRun, add_run_args, ensure_dir, git_commit, resolve_model, write_meta
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+QUEUE_NAME = "queue.sqlite"
+
+# Opciones que dependen de cada shard y no del run distribuido
+_PER_SHARD_OPTIONS = ("shard", "resume", "out_dir", "extra_meta")
+# Opciones de ejecución que cada worker puede ajustar a su máquina
+WORKER_OVERRIDES = ("concurrency", "eval_workers", "use_async")
+
+
+class WorkQueue:
+    """Cola de shards en SQLite (`queue.sqlite` dentro del run distribuido).
+
+    Cada shard pasa por pending -> running -> done/failed. Tomar un shard es una transacción
+    `BEGIN IMMEDIATE`, así dos workers nunca toman el mismo. Un worker vivo renueva su `heartbeat`;
+    si deja de hacerlo por más de `lease_s` (proceso o máquina caída) el shard vuelve a estar
+    disponible y el siguiente worker lo reanuda. Con varias máquinas, el filesystem compartido
+    tiene que soportar locks de SQLite (NFS moderno con locks POSIX; no sirve un sync tipo Dropbox).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+
+    @classmethod
+    def create(cls, path: Path, n_shards: int) -> "WorkQueue":
+        q = cls(path)
+        q.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS shards (
+              idx INTEGER PRIMARY KEY,
+              status TEXT NOT NULL,
+              worker TEXT,
+              attempts INTEGER NOT NULL DEFAULT 0,
+              claimed_at REAL,
+              heartbeat REAL,
+              finished_at REAL,
+              cases INTEGER,
+              error TEXT
+            )
+            """
+        )
+        q.conn.executemany("INSERT OR IGNORE INTO shards (idx, status) VALUES (?, 'pending')", [(i,) for i in range(n_shards)])
+        return q
+
+    def claim(self, worker: str, *, lease_s: float, max_attempts: int) -> Optional[int]:
+        """Toma el próximo shard disponible (pendiente, con lease vencido o fallido con reintentos)."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                """
+                SELECT idx FROM shards
+                WHERE status = 'pending'
+                   OR (status = 'running' AND heartbeat < ?)
+                   OR (status = 'failed' AND attempts < ?)
+                ORDER BY attempts, idx
+                LIMIT 1
+                """,
+                (now - lease_s, max_attempts),
+            ).fetchone()
+            if row is not None:
+                self.conn.execute(
+                    """
+                    UPDATE shards SET status = 'running', worker = ?, attempts = attempts + 1,
+                      claimed_at = ?, heartbeat = ?, error = NULL
+                    WHERE idx = ?
+                    """,
+                    (worker, now, now, row[0]),
+                )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return int(row[0]) if row is not None else None
+
+    def heartbeat(self, idx: int, worker: str) -> bool:
+        """Renueva el lease; False si el shard ya no es de este worker."""
+        cur = self.conn.execute(
+            "UPDATE shards SET heartbeat = ? WHERE idx = ? AND worker = ? AND status = 'running'",
+            (time.time(), idx, worker),
+        )
+        return cur.rowcount == 1
+
+    def finish(self, idx: int, worker: str, *, cases: Optional[int] = None, error: Optional[str] = None) -> None:
+        self.conn.execute(
+            """
+            UPDATE shards SET status = ?, finished_at = ?, cases = ?, error = ?
+            WHERE idx = ? AND worker = ?
+            """,
+            ("failed" if error else "done", time.time(), cases, error, idx, worker),
+        )
+
+    def running(self) -> int:
+        return int(self.conn.execute("SELECT COUNT(*) FROM shards WHERE status = 'running'").fetchone()[0])
+
+    def shards(self) -> List[Dict[str, Any]]:
+        cur = self.conn.execute(
+            "SELECT idx, status, worker, attempts, claimed_at, heartbeat, finished_at, cases, error FROM shards ORDER BY idx"
+        )
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, row)) for row in cur]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def shard_dir(run_dir: Path, idx: int) -> Path:
+    return run_dir / "shards" / f"shard_{idx:04d}"
+
+
+def _read_meta(run_dir: Path) -> Dict[str, Any]:
+    meta_path = run_dir / "run_meta.json"
+    if not meta_path.exists():
+        raise ValueError(f"No existe {meta_path}")
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    if "distributed" not in meta:
+        raise ValueError(f"{run_dir} no es un run distribuido (crearlo con `tools.distributed init`)")
+    return meta
+
+
+# --- coordinador ---
+
+
+def init_run(opts: RunOptions, n_shards: int) -> Path:
+    """Crea el directorio del run distribuido, su run_meta.json y la cola con `n_shards` shards."""
+    if n_shards < 1:
+        raise ValueError("--shards debe ser >= 1")
+    if opts.shard is not None or opts.resume:
+        raise ValueError("Un run distribuido reparte los shards solo: no uses --shard ni --resume")
+    if opts.adaptive:
+        # El merge necesita todos los casos de cada shard; cada shard se detendría por su cuenta
+        raise ValueError("--adaptive no se puede combinar con un run distribuido")
+    model_cfg = resolve_model(opts.model)
+    specs = get_catalog().load_suite(opts.suite, opts.tasks)
+    selected = set(opts.tasks) if opts.tasks else None
+    selection = dict(max_cases=opts.max_cases, shard=None, sample=opts.sample, seed=opts.seed)
+
+    now = dt.datetime.utcnow()
+    run_id = now.strftime("%H%M%S") + f"_{opts.model}_{opts.suite}_dist"
+    run_dir = Path(opts.out_dir) if opts.out_dir else REPO_ROOT / "runs" / now.strftime("%Y-%m-%d") / run_id
+    if (run_dir / "run_meta.json").exists():
+        raise ValueError(f"Ya existe un run en {run_dir}")
+    ensure_dir(run_dir)
+
+    options = {k: v for k, v in asdict(opts).items() if k not in _PER_SHARD_OPTIONS}
+    meta: Dict[str, Any] = {
+        "run_id": run_dir.name,
+        "timestamp_utc": now.isoformat() + "Z",
+        "git_commit": git_commit(),
+        "model": {
+            "id": model_cfg["id"],
+            "provider": model_cfg["provider"],
+            "params": model_cfg["params"],
+            "pricing": model_cfg["pricing"],
+        },
+        "suite": opts.suite,
+        "tasks": [
+            {"id": spec.id, "name": spec.name, "cases": spec.cases.count(spec.known_cases, **selection)}
+            for spec in specs
+            if selected is None or spec.id in selected
+        ],
+        "aggregates": {},
+        "selection": selection,
+        "artifacts": store_config(opts.artifacts, run_dir.name, opts.artifacts_db),
+        "distributed": {"shards": n_shards, "options": options},
+        "status": "distributed",
+    }
+    WorkQueue.create(run_dir / QUEUE_NAME, n_shards).close()
+    write_meta(run_dir, meta)
+    return run_dir
+
+
+# --- worker ---
+
+
+class Lease:
+    """El lease de un shard visto desde su worker.
+
+    Se da por perdido si otro worker ya tomó el shard o si la última renovación tiene más de
+    `lease_s / 2`: así el worker deja de escribir antes de que el shard pueda volver a la cola
+    (eso pasa recién a los `lease_s`), aunque la renovación falle o el proceso haya estado pausado.
+    """
+
+    def __init__(self, lease_s: float) -> None:
+        self.lease_s = lease_s
+        self.lost = threading.Event()
+        self._renewed = time.monotonic()
+
+    def renewed(self, at: float) -> None:
+        self._renewed = at
+
+    def expired(self) -> bool:
+        return self.lost.is_set() or time.monotonic() - self._renewed > self.lease_s / 2
+
+
+def _heartbeat_loop(queue_path: Path, idx: int, worker: str, lease: Lease, stop: threading.Event) -> None:
+    # Conexión propia: sqlite3 no comparte conexiones entre threads
+    q = WorkQueue(queue_path)
+    try:
+        while not stop.wait(lease.lease_s / 4):
+            # Hora tomada antes del UPDATE: el lease local nunca dura más que el de la cola
+            at = time.monotonic()
+            try:
+                ok = q.heartbeat(idx, worker)
+            except sqlite3.OperationalError:
+                # Cola bloqueada u ocupada: se reintenta en el próximo latido (el lease local sigue corriendo)
+                continue
+            if not ok:
+                lease.lost.set()
+                return
+            lease.renewed(at)
+    finally:
+        q.close()
+
+
+def run_shard(
+    run_dir: Path,
+    meta: Dict[str, Any],
+    idx: int,
+    overrides: Dict[str, Any],
+    cancel: Optional[Callable[[], bool]] = None,
+) -> Dict[str, Any]:
+    """Ejecuta (o reanuda, si un worker anterior murió) un shard como un run normal en `shards/`.
+
+    `cancel` se consulta entre casos (ver `SuiteRun`): si el worker pierde el lease el shard
+    termina con `RunCancelled` y las filas en vuelo se descartan sin escribirse.
+    """
+    dist = meta["distributed"]
+    out_dir = shard_dir(run_dir, idx)
+    values = {**dist["options"], **overrides}
+    if (out_dir / "run_meta.json").exists():
+        opts = RunOptions(**values, resume=str(out_dir))
+    else:
+        opts = RunOptions(
+            **values,
+            shard=(idx, int(dist["shards"])),
+            out_dir=str(out_dir),
+            # run_id único: identifica los artifacts del shard aunque el SQLite se comparta entre runs
+            extra_meta={"shard_of": meta["run_id"], "run_id": f"{meta['run_id']}/shard_{idx:04d}"},
+        )
+    return SuiteRun(opts, cancel=cancel).execute()
+
+
+def work(
+    run_dir: Path,
+    *,
+    worker: str,
+    lease_s: float = 120.0,
+    max_attempts: int = 3,
+    max_shards: Optional[int] = None,
+    overrides: Optional[Dict[str, Any]] = None,
+) -> int:
+    """Toma shards de la cola hasta que no quede ninguno por hacer. Devuelve cuántos ejecutó.
+
+    Mientras otros workers tengan shards en curso se queda esperando: si alguno muere, su shard
+    vuelve a la cola al vencer el lease y lo reanuda este.
+    """
+    meta = _read_meta(run_dir)
+    queue_path = run_dir / QUEUE_NAME
+    q = WorkQueue(queue_path)
+    n_done = 0
+    try:
+        while max_shards is None or n_done < max_shards:
+            idx = q.claim(worker, lease_s=lease_s, max_attempts=max_attempts)
+            if idx is None:
+                if q.running() == 0:
+                    break
+                time.sleep(min(5.0, lease_s / 4))
+                continue
+            print(f"[{worker}] shard {idx}/{meta['distributed']['shards']}")
+            stop = threading.Event()
+            lease = Lease(lease_s)
+            beat = threading.Thread(target=_heartbeat_loop, args=(queue_path, idx, worker, lease, stop), daemon=True)
+            beat.start()
+            try:
+                shard_meta = run_shard(run_dir, meta, idx, overrides or {}, cancel=lease.expired)
+            except RunCancelled:
+                # El shard ya no es de este worker (o lo será pronto de otro): lo escrito hasta acá
+                # quedó dentro del lease y quien lo tome lo reanuda; no se marca en la cola
+                print(f"[{worker}] Perdí el lease del shard {idx}; descarto los casos en vuelo", file=sys.stderr)
+                continue
+            except Exception as e:
+                q.finish(idx, worker, error=f"{type(e).__name__}: {e}")
+                print(f"[{worker}] shard {idx} falló: {e}", file=sys.stderr)
+                continue
+            finally:
+                stop.set()
+                beat.join()
+            q.finish(idx, worker, cases=int(shard_meta.get("cases_done") or 0))
+            n_done += 1
+    finally:
+        q.close()
+    return n_done
+
+
+# --- merge ---
+
+
+def _shard_rows(path: Path) -> Iterator[Tuple[str, str, str]]:
+    """(task_id, case_id, línea) de un results.jsonl de shard, en orden de escritura."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            yield str(row.get("task_id")), str(row.get("case_id")), line if line.endswith("\n") else line + "\n"
+
+
+def _sum_stats(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Suma los contadores numéricos (de primer nivel) de adapter_stats de cada shard
+    out: Dict[str, Any] = {}
+    for d in items:
+        for k, v in (d or {}).items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                out[k] = out.get(k, 0) + v
+    return out
+
+
+def merge_artifacts(run_dir: Path, meta: Dict[str, Any], shard_metas: List[Dict[str, Any]]) -> None:
+    """Pasa los artifacts de cada shard al run: directorios se mueven, SQLite se absorbe en el del run."""
+    store = open_store(run_dir, meta["artifacts"])
+    try:
+        for i, sm in enumerate(shard_metas):
+            src = shard_dir(run_dir, i)
+            cfg = sm.get("artifacts") or {"store": "dir"}
+            if cfg["store"] == "sqlite" and isinstance(store, SqliteArtifactStore):
+                store.absorb(src / cfg["db"], cfg["run_id"])
+                if cfg["db"] == DB_NAME:
+                    # El SQLite propio del shard ya no hace falta (los artifacts viven en el del run)
+                    for suffix in ("", "-wal", "-shm"):
+                        (src / (DB_NAME + suffix)).unlink(missing_ok=True)
+                continue
+            src_root = src / "artifacts"
+            if not src_root.exists():
+                continue
+            for task_dir in src_root.iterdir():
+                for case_dir in task_dir.iterdir():
+                    if meta["artifacts"]["store"] == "dir":
+                        dst = run_dir / "artifacts" / task_dir.name / case_dir.name
+                        ensure_dir(dst.parent)
+                        if dst.exists():
+                            shutil.rmtree(dst)
+                        os.replace(case_dir, dst)
+                    else:
+                        for f in sorted(p for p in case_dir.rglob("*") if p.is_file()):
+                            store.put(task_dir.name, case_dir.name, f.relative_to(case_dir).as_posix(), f.read_bytes())
+                        shutil.rmtree(case_dir)
+    finally:
+        store.close()
+
+
+def merge_run(run_dir: Path) -> Dict[str, Any]:
+    """Une los shards en un único `results.jsonl` canónico (orden tarea/caso del run sin shards),
+    mueve sus artifacts al run y completa `run_meta.json`."""
+    meta = _read_meta(run_dir)
+    n_shards = int(meta["distributed"]["shards"])
+    q = WorkQueue(run_dir / QUEUE_NAME)
+    shards = q.shards()
+    q.close()
+    missing = [s["idx"] for s in shards if s["status"] != "done"]
+    if missing:
+        raise RuntimeError(f"Faltan shards por terminar: {missing}")
+
+    readers = {i: _shard_rows(shard_dir(run_dir, i) / "results.jsonl") for i in range(n_shards)}
+    catalog = get_catalog()
+    specs = {spec.id: spec for spec in catalog.load_suite(meta["suite"], [t["id"] for t in meta["tasks"]])}
+    sel = meta["selection"]
+    selection = dict(max_cases=sel.get("max_cases"), sample=sel.get("sample"), seed=sel.get("seed", 0))
+
+    # Un shard tiene las posiciones p con p % n == i, escritas en orden: alcanza con recorrer la
+    # selección completa y tomar la fila siguiente del shard que corresponde a cada posición
+    tmp = run_dir / "results.jsonl.tmp"
+    n_rows = 0
+    with open(tmp, "w", encoding="utf-8") as out:
+        for t in meta["tasks"]:
+            spec = specs[t["id"]]
+            positions = spec.cases.positions(**selection)
+            pos_iter = iter(positions.tolist()) if positions is not None else itertools.count()
+            task_rows = 0
+            for pos, case in zip(pos_iter, spec.cases.select(**selection)):
+                cid = str(case.get("case_id"))
+                got = next(readers[pos % n_shards], None)
+                if got is None or got[:2] != (spec.id, cid):
+                    raise RuntimeError(
+                        f"shard {pos % n_shards}: se esperaba {spec.id}/{cid} (posición {pos}) y hay {got[:2] if got else 'fin de archivo'}"
+                    )
+                out.write(got[2])
+                task_rows += 1
+            # `init` no recorre el archivo para contar: la cantidad se sabe recién acá
+            t["cases"] = task_rows
+            if selection["max_cases"] is None and selection["sample"] is None:
+                catalog.remember_cases(spec, task_rows)
+            n_rows += task_rows
+    os.replace(tmp, run_dir / "results.jsonl")
+
+    shard_metas = [json.loads((shard_dir(run_dir, i) / "run_meta.json").read_text(encoding="utf-8")) for i in range(n_shards)]
+    merge_artifacts(run_dir, meta, shard_metas)
+
+    claimed = [s["claimed_at"] for s in shards if s["claimed_at"]]
+    finished = [s["finished_at"] for s in shards if s["finished_at"]]
+    meta["distributed"]["shard_runs"] = [
+        {
+            "shard": s["idx"],
+            "worker": s["worker"],
+            "attempts": s["attempts"],
+            "cases": s["cases"],
+            "wall_time_s": sm.get("wall_time_s"),
+            "resumes": sm.get("resumes", 0),
+        }
+        for s, sm in zip(shards, shard_metas)
+    ]
+    meta["distributed"]["workers"] = sorted({s["worker"] for s in shards if s["worker"]})
+    meta["distributed"]["sum_shard_wall_time_s"] = round(sum(sm.get("wall_time_s") or 0.0 for sm in shard_metas), 3)
+    meta["wall_time_s"] = round(max(finished) - min(claimed), 3) if claimed and finished else None
+    meta["adapter_stats"] = _sum_stats([sm.get("adapter_stats") for sm in shard_metas])
+    meta["status"] = "completed"
+    meta["cases_done"] = n_rows
+    meta["columns_sidecar"] = export_run(run_dir).name
+    write_meta(run_dir, meta)
+    return meta
+
+
+# --- CLI ---
+
+
+def _worker_overrides(args: argparse.Namespace) -> Dict[str, Any]:
+    return {k: getattr(args, k) for k in WORKER_OVERRIDES if getattr(args, k, None) is not None}
+
+
+def _add_worker_args(ap: argparse.ArgumentParser, *, execution: bool = True) -> None:
+    ap.add_argument("--lease-s", type=float, default=120.0, help="Segundos sin heartbeat para dar un shard por perdido")
+    ap.add_argument("--max-attempts", type=int, default=3, help="Intentos por shard antes de dejarlo como fallido")
+    if execution:
+        ap.add_argument("--concurrency", type=int, default=None, help="Reemplaza --concurrency del run en este worker")
+        ap.add_argument("--eval-workers", type=int, default=None, help="Reemplaza --eval-workers del run en este worker")
+        ap.add_argument("--async", dest="use_async", action="store_true", default=None, help="Usa el runner async en este worker")
+
+
+def _print_status(run_dir: Path) -> None:
+    q = WorkQueue(run_dir / QUEUE_NAME)
+    for s in q.shards():
+        extra = f" error={s['error']}" if s["error"] else ""
+        print(f"shard {s['idx']:>4}: {s['status']:<8} worker={s['worker'] or '-'} intentos={s['attempts']} casos={s['cases'] if s['cases'] is not None else '-'}{extra}")
+    q.close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Ejecución distribuida por shards: coordinador, workers y merge")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_init = sub.add_parser("init", help="Crea el run distribuido y su cola de shards")
+    p_run = sub.add_parser("run", help="init + N workers locales + merge, en un solo comando")
+    for p in (p_init, p_run):
+        p.add_argument("--model", required=True, help="Id del modelo en models/registry.yml")
+        p.add_argument("--suite", required=True, help="Nombre de suite (carpeta en suites/)")
+        p.add_argument("--shards", type=int, required=True, help="Cantidad de shards en los que se parte cada tarea")
+        p.add_argument("--out-dir", default=None, help="Directorio del run (por defecto runs/<fecha>/...)")
+        add_run_args(p)
+    p_run.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos worker locales")
+    _add_worker_args(p_run, execution=False)
+
+    p_worker = sub.add_parser("worker", help="Toma shards de la cola y los ejecuta hasta vaciarla")
+    p_worker.add_argument("run_dir", help="Directorio creado por init (compartido entre máquinas)")
+    p_worker.add_argument("--worker-id", default=None, help="Nombre del worker (por defecto host:pid)")
+    p_worker.add_argument("--max-shards", type=int, default=None, help="Sale después de N shards")
+    _add_worker_args(p_worker)
+
+    p_merge = sub.add_parser("merge", help="Une los shards terminados en results.jsonl y run_meta.json")
+    p_merge.add_argument("run_dir")
+    p_status = sub.add_parser("status", help="Estado de cada shard")
+    p_status.add_argument("run_dir")
+
+    args = ap.parse_args()
+
+    if args.cmd in ("init", "run"):
+        try:
+            run_dir = init_run(RunOptions.from_args(args), args.shards)
+        except ValueError as e:
+            ap.error(str(e))
+        print(f"Run distribuido: {run_dir}")
+        if args.cmd == "init":
+            print(f"Workers: python -m tools.distributed worker {run_dir}")
+            return 0
+        cmd = [sys.executable, "-m", "tools.distributed", "worker", str(run_dir)]
+        cmd += ["--lease-s", str(args.lease_s), "--max-attempts", str(args.max_attempts)]
+        procs = [
+            subprocess.Popen(cmd + ["--worker-id", f"{socket.gethostname()}:local{k}"], cwd=str(REPO_ROOT))
+            for k in range(max(1, args.workers))
+        ]
+        rcs = [p.wait() for p in procs]
+        if any(rcs):
+            print(f"Algún worker terminó con error (códigos {rcs})", file=sys.stderr)
+    else:
+        run_dir = Path(args.run_dir)
+
+    if args.cmd == "worker":
+        worker = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        n = work(
+            run_dir,
+            worker=worker,
+            lease_s=args.lease_s,
+            max_attempts=args.max_attempts,
+            max_shards=args.max_shards,
+            overrides=_worker_overrides(args),
+        )
+        print(f"[{worker}] {n} shards ejecutados")
+        return 0
+
+    if args.cmd == "status":
+        _print_status(run_dir)
+        return 0
+
+    try:
+        meta = merge_run(run_dir)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        _print_status(run_dir)
+        return 1
+    print(f"Run guardado en: {run_dir}")
+    print(f"Resultados: {meta['cases_done']} casos de {meta['distributed']['shards']} shards")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional
+
+from models.adapters.mock_adapter import MockAdapter
+
+
+class FakeOpenAIState:
+    """Estado compartido del servidor: configuración y contadores para /stats."""
+
+    def __init__(
+        self,
+        delay_ms: int = 0,
+        fail_rate: float = 0.0,
+        max_concurrent: int = 0,
+        rpm: int = 0,
+        batch_delay_s: float = 2.0,
+        token_delay_ms: float = 0.0,
+    ) -> None:
+        self.delay_ms = delay_ms
+        self.token_delay_ms = token_delay_ms
+        self.fail_rate = fail_rate
+        self.max_concurrent = max_concurrent
+        self.rpm = rpm
+        self.batch_delay_s = batch_delay_s
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self.mock = MockAdapter()
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._recent: Deque[float] = deque()
+
+    def bump(self, field: str) -> None:
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def admit(self) -> bool:
+        """Decide si el request entra o recibe 429 (fallo aleatorio, concurrencia o rpm)."""
+        with self.lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 60.0:
+                self._recent.popleft()
+            limited = (
+                (self.fail_rate > 0 and random.random() < self.fail_rate)
+                or (self.max_concurrent > 0 and self.in_flight >= self.max_concurrent)
+                or (self.rpm > 0 and len(self._recent) >= self.rpm)
+            )
+            if limited:
+                self.rate_limited += 1
+                return False
+            self._recent.append(now)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+
+    def done(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "connections": self.connections,
+                "requests": self.requests,
+                "rate_limited": self.rate_limited,
+                "peak_in_flight": self.peak_in_flight,
+                "batches": len(self.batches),
+            }
+
+    def chat_completion(self, req: Dict[str, Any], *, delay: bool = True) -> Dict[str, Any]:
+        if delay and self.delay_ms > 0:
+            time.sleep(self.delay_ms / 1000.0)
+
+        messages = req.get("messages") or []
+        user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        text = self.mock._route(user)
+        prompt_tokens = sum(len(str(m.get("content") or "").split()) for m in messages)
+        n = max(1, int(req.get("n") or 1))
+        completion_tokens = len(text.split()) * n
+        return {
+            "id": f"chatcmpl-fake-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "fake"),
+            "choices": [
+                {"index": i, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"} for i in range(n)
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    # --- Batch API: /files + /batches, procesados en un thread tras `batch_delay_s` ---
+
+    def add_file(self, filename: str, purpose: str, content: bytes) -> Dict[str, Any]:
+        meta = {
+            "id": f"file-fake-{next(self._ids)}",
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[meta["id"]] = {"meta": meta, "content": content}
+        return meta
+
+    def create_batch(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        if req.get("input_file_id") not in self.files:
+            raise KeyError(req.get("input_file_id"))
+        batch = {
+            "id": f"batch_fake_{next(self._ids)}",
+            "object": "batch",
+            "endpoint": req.get("endpoint", "/v1/chat/completions"),
+            "errors": None,
+            "input_file_id": req["input_file_id"],
+            "completion_window": req.get("completion_window", "24h"),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self.lock:
+            self.batches[batch["id"]] = batch
+        threading.Thread(target=self._process_batch, args=(batch["id"],), daemon=True).start()
+        return dict(batch)
+
+    def _process_batch(self, batch_id: str) -> None:
+        batch = self.batches[batch_id]
+        lines = [json.loads(x) for x in self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines() if x.strip()]
+        with self.lock:
+            batch["status"] = "in_progress"
+            batch["request_counts"]["total"] = len(lines)
+        t_end = time.monotonic() + self.batch_delay_s
+        out: List[str] = []
+        for i, item in enumerate(lines):
+            if self.fail_rate > 0 and random.random() < self.fail_rate:
+                response = {"status_code": 500, "request_id": f"req_{i}", "body": {"error": {"message": "fake error"}}}
+                field = "failed"
+            else:
+                response = {"status_code": 200, "request_id": f"req_{i}", "body": self.chat_completion(item["body"], delay=False)}
+                field = "completed"
+            out.append(json.dumps({"id": f"batch_req_{i}", "custom_id": item["custom_id"], "response": response, "error": None}))
+            with self.lock:
+                batch["request_counts"][field] += 1
+        time.sleep(max(0.0, t_end - time.monotonic()))
+        meta = self.add_file("batch_output.jsonl", "batch_output", ("\n".join(out) + "\n").encode("utf-8"))
+        with self.lock:
+            batch["output_file_id"] = meta["id"]
+            batch["status"] = "completed"
+            batch["completed_at"] = int(time.time())
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Responde `POST /v1/chat/completions` con el formato de la API de OpenAI.
+
+    El contenido sale de las rutas de `MockAdapter`, así que las suites de ejemplo pasan.
+    Con `--fail-rate`, `--max-concurrent` o `--rpm` responde 429 (con `Retry-After`) como un
+    provider saturado, para probar el scheduler de `tools/throttle.py`.
+    Con `"stream": true` responde por SSE, para medir TTFT y tokens/s (`--token-delay-ms`).
+    También implementa lo mínimo de la batch API (`/files`, `/batches`) para probar `--batch`;
+    con `--fail-rate` algunas líneas del batch salen con error.
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, como un provider real
+    server: "FakeOpenAIServer"
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.state.bump("connections")
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n) if n else b"{}"
+        return json.loads(raw.decode("utf-8") or "{}")
+
+    def _read_multipart(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n)
+        head = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8")
+        msg = BytesParser(policy=email_policy).parsebytes(head + raw)
+        fields: Dict[str, Any] = {}
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            data = part.get_payload(decode=True) or b""
+            fields[name] = (part.get_filename(), data) if part.get_filename() else data.decode("utf-8")
+        return fields
+
+    def _not_found(self) -> None:
+        self._send_json(404, {"error": {"message": f"Ruta no soportada: {self.path}"}})
+
+    def do_GET(self) -> None:
+        state = self.server.state
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path.endswith("/stats"):
+            self._send_json(200, state.stats())
+            return
+        m = re.search(r"/files/([^/]+)/content$", path)
+        if m and m.group(1) in state.files:
+            body = state.files[m.group(1)]["content"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        m = re.search(r"/batches/([^/]+)$", path)
+        if m and m.group(1) in state.batches:
+            with state.lock:
+                self._send_json(200, json.loads(json.dumps(state.batches[m.group(1)])))
+            return
+        self._not_found()
+
+    def do_POST(self) -> None:
+        state = self.server.state
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path.endswith("/files"):
+            fields = self._read_multipart()
+            filename, content = fields.get("file", ("input.jsonl", b""))
+            self._send_json(200, state.add_file(filename, fields.get("purpose", "batch"), content))
+            return
+        if path.endswith("/batches"):
+            try:
+                self._send_json(200, state.create_batch(self._read_json()))
+            except KeyError as e:
+                self._send_json(404, {"error": {"message": f"Archivo no encontrado: {e}"}})
+            return
+        if not path.endswith("/chat/completions"):
+            self._not_found()
+            return
+
+        req = self._read_json()
+        state.bump("requests")
+        if not state.admit():
+            error = {"message": "Rate limit reached (fake)", "type": "rate_limit_exceeded", "code": "rate_limit_exceeded"}
+            self._send_json(429, {"error": error}, headers={"Retry-After": "0"})
+            return
+        try:
+            if req.get("stream"):
+                self._send_stream(req)
+            else:
+                self._send_json(200, state.chat_completion(req))
+        finally:
+            state.done()
+
+    def _send_stream(self, req: Dict[str, Any]) -> None:
+        """Respuesta SSE (chunked): un chunk por palabra, `--delay-ms` antes del primero y
+        `--token-delay-ms` entre chunks; con `stream_options.include_usage` cierra con el uso."""
+        state = self.server.state
+        full = state.chat_completion(req, delay=False)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def emit(payload: Any) -> None:
+            data = b"data: " + (payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")) + b"\n\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        base = {k: full[k] for k in ("id", "created", "model")}
+        base["object"] = "chat.completion.chunk"
+        if state.delay_ms > 0:
+            time.sleep(state.delay_ms / 1000.0)
+        words = re.findall(r"\S+\s*|\s+", full["choices"][0]["message"]["content"])
+        for i, piece in enumerate(words):
+            if i and state.token_delay_ms > 0:
+                time.sleep(state.token_delay_ms / 1000.0)
+            delta = {"content": piece} if i else {"role": "assistant", "content": piece}
+            emit({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        emit({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (req.get("stream_options") or {}).get("include_usage"):
+            emit({**base, "choices": [], "usage": full["usage"]})
+        emit(b"[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host: str, port: int, state: FakeOpenAIState) -> None:
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.state = state
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Servidor local que imita la API chat de OpenAI (para pruebas sin red)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay-ms", type=int, default=0, help="Latencia artificial por request")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="Probabilidad de responder 429 a un request")
+    ap.add_argument("--max-concurrent", type=int, default=0, help="Responde 429 por encima de N requests en curso")
+    ap.add_argument("--rpm", type=int, default=0, help="Responde 429 por encima de N requests por minuto")
+    ap.add_argument("--token-delay-ms", type=float, default=0.0, help="Con stream: pausa entre chunks")
+    ap.add_argument("--batch-delay-s", type=float, default=2.0, help="Tiempo mínimo que un batch queda en curso")
+    args = ap.parse_args()
+
+    state = FakeOpenAIState(
+        delay_ms=args.delay_ms,
+        fail_rate=args.fail_rate,
+        max_concurrent=args.max_concurrent,
+        rpm=args.rpm,
+        batch_delay_s=args.batch_delay_s,
+        token_delay_ms=args.token_delay_ms,
+    )
+    server = FakeOpenAIServer(args.host, args.port, state)
+    print(f"Fake OpenAI escuchando en http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
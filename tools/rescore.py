@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Tuple
+
+from tools.artifacts import ARTIFACT_STORES, MemoryArtifactStore, open_store, store_config
+from tools.catalog import batch_evaluator, get_catalog, get_evaluator
+from tools.columnar import export_run
+from tools.run_suite import DEFAULT_EVAL_BATCH, REPO_ROOT, ensure_dir, evaluate_many, git_commit, sample_fields, write_meta
+from tools.utils import JsonlAppender, completed_case_keys, iter_jsonl
+
+
+# Campos de run_meta.json que describen la generación (o un run de ella) y no la re-evaluación
+GENERATION_FIELDS = (
+    "adaptive",
+    "samples",
+    "cache",
+    "batch",
+    "rate_limit",
+    "adapter_stats",
+    "async",
+    "concurrency",
+    "distributed",
+    "catalog",
+    "stages",
+    "trace",
+    "profile",
+    "startup_s",
+    "wall_time_s",
+    "resumes",
+    "cases_failed",
+    "columns_sidecar",
+)
+
+# Evaluadores cargados en cada proceso worker (task_id -> evaluate)
+_EVALUATORS: Dict[str, Callable[..., Dict[str, Any]]] = {}
+# Artifacts de cada caso: el worker los devuelve y el proceso principal los guarda en el store del run
+_ARTIFACTS = MemoryArtifactStore()
+
+
+def _init_worker(task_dirs: Dict[str, str]) -> None:
+    for task_id, tdir in task_dirs.items():
+        _EVALUATORS[task_id] = get_evaluator(Path(tdir))
+
+
+Item = Tuple[Dict[str, Any], Dict[str, Any]]
+
+
+def _rescore_rows(items: List[Item]) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str, str, bytes]]]:
+    """Re-evalúa filas consecutivas de una misma tarea (un lote si el evaluador tiene `evaluate_batch`)."""
+    task_id = items[0][0]["task_id"]
+    # Filas con `--samples`: se re-evalúan todas las muestras
+    outputs = [
+        [s.get("raw_output") or "" for s in row["samples"]] if row.get("samples") else [row.get("raw_output") or ""]
+        for row, _ in items
+    ]
+    # Las filas sin generación (`error`) no tienen nada que re-evaluar: pasan tal cual
+    ok = [i for i, (row, _) in enumerate(items) if not row.get("error")]
+    evals_by_item: Dict[int, List[Dict[str, Any]]] = {}
+    if ok:
+        cases = [items[i][1] for i in ok]
+        per_case = evaluate_many(_EVALUATORS[task_id], task_id, cases, [outputs[i] for i in ok], _ARTIFACTS)
+        evals_by_item = dict(zip(ok, per_case))
+    rows = []
+    for i, (row, _) in enumerate(items):
+        out = dict(row)
+        evals = evals_by_item.get(i)
+        if evals is not None:
+            out["scores"] = evals[0]["scores"]
+            out["pass_fail"] = evals[0]["pass_fail"]
+            out["notes"] = evals[0]["notes"]
+            if len(evals) > 1:
+                out.update(sample_fields(evals))
+        rows.append(out)
+    return rows, _ARTIFACTS.drain()
+
+
+def iter_chunks(items: Iterable[Item], sizes: Dict[str, int]) -> Iterator[List[Item]]:
+    """Agrupa filas consecutivas de una misma tarea en tandas de hasta `sizes[task_id]`."""
+    chunk: List[Item] = []
+    for item in items:
+        task_id = item[0]["task_id"]
+        if chunk and chunk[0][0]["task_id"] != task_id:
+            yield chunk
+            chunk = []
+        chunk.append(item)
+        if len(chunk) >= sizes.get(task_id, 1):
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ordered_map(pool: ProcessPoolExecutor, fn: Callable[[Any], Any], items: Iterable[Any], window: int) -> Iterator[Any]:
+    """Como `pool.map`, pero con a lo sumo `window` items pendientes (memoria acotada)."""
+    pending: Deque["Future[Any]"] = deque()
+    it = iter(items)
+    for item in it:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            break
+    while pending:
+        res = pending.popleft().result()
+        nxt = next(it, None)
+        if nxt is not None:
+            pending.append(pool.submit(fn, nxt))
+        yield res
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Re-evalúa un run existente (raw_output) sin llamar al modelo")
+    ap.add_argument("run_dir", help="Directorio del run original (con results.jsonl y run_meta.json)")
+    ap.add_argument("--tasks", nargs="*", default=None, help="Re-evalúa solo estas tareas (por defecto todas)")
+    ap.add_argument("--workers", type=int, default=None, help="Procesos de evaluación (por defecto: CPUs)")
+    ap.add_argument(
+        "--eval-batch",
+        type=int,
+        default=DEFAULT_EVAL_BATCH,
+        metavar="N",
+        help="Filas por llamada a evaluate_batch en las tareas que lo exponen",
+    )
+    ap.add_argument("--out-dir", default=None, help="Directorio del nuevo run (por defecto junto a runs/<fecha>/)")
+    ap.add_argument("--artifacts", choices=ARTIFACT_STORES, default="dir", help="Store de artifacts del nuevo run")
+    ap.add_argument("--artifacts-db", default=None, help="Con --artifacts sqlite: SQLite de artifacts compartido entre runs")
+    args = ap.parse_args()
+
+    src_dir = Path(args.run_dir)
+    src_meta = json.loads((src_dir / "run_meta.json").read_text(encoding="utf-8"))
+    suite = src_meta["suite"]
+    selected = set(args.tasks) if args.tasks else None
+
+    # Casos y evaluadores actuales de la suite; de cada tarea solo se guardan los casos del run
+    needed = completed_case_keys(str(src_dir / "results.jsonl"))
+    task_dirs: Dict[str, str] = {}
+    cases_by_task: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for spec in get_catalog().load_suite(suite, args.tasks):
+        if selected is not None and spec.id not in selected:
+            continue
+        task_dirs[spec.id] = str(spec.dir)
+        cases_by_task[spec.id] = {
+            str(c.get("case_id")): c for c in spec.cases if (spec.id, str(c.get("case_id"))) in needed
+        }
+
+    now = dt.datetime.utcnow()
+    if args.out_dir:
+        out_dir = Path(args.out_dir)
+    else:
+        out_dir = REPO_ROOT / "runs" / now.strftime("%Y-%m-%d") / (now.strftime("%H%M%S") + f"_{src_meta['run_id']}_rescore")
+    ensure_dir(out_dir)
+
+    meta = {k: v for k, v in src_meta.items() if k not in GENERATION_FIELDS}
+    meta.update(
+        {
+            "run_id": out_dir.name,
+            "timestamp_utc": now.isoformat() + "Z",
+            "git_commit": git_commit(),
+            "rescored_from": {
+                "run_id": src_meta.get("run_id"),
+                "path": str(src_dir.resolve()),
+                "git_commit": src_meta.get("git_commit"),
+            },
+            "status": "running",
+            # Solo las tareas re-evaluadas; `cases` se completa al terminar
+            "tasks": [dict(t, cases=None) for t in src_meta.get("tasks", []) if t["id"] in task_dirs],
+            "aggregates": {},
+            "artifacts": store_config(args.artifacts, out_dir.name, args.artifacts_db),
+        }
+    )
+    write_meta(out_dir, meta)
+    store = open_store(out_dir, meta["artifacts"])
+
+    skipped = {"n": 0}
+
+    def iter_items() -> Iterator[Item]:
+        for row in iter_jsonl(str(src_dir / "results.jsonl")):
+            task_id = row.get("task_id")
+            case = cases_by_task.get(task_id, {}).get(str(row.get("case_id")))
+            if case is None:
+                skipped["n"] += 1
+                continue
+            yield row, case
+
+    # Las tareas con evaluate_batch van de a tandas a cada worker; el resto, fila por fila
+    sizes = {
+        task_id: max(1, args.eval_batch) if batch_evaluator(get_evaluator(Path(tdir))) else 1
+        for task_id, tdir in task_dirs.items()
+    }
+    workers = args.workers or os.cpu_count() or 1
+    t0 = time.time()
+    rows_by_task: Counter = Counter()
+    n_failed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(task_dirs,)) as pool:
+        with JsonlAppender(str(out_dir / "results.jsonl")) as writer:
+            for rows, files in ordered_map(pool, _rescore_rows, iter_chunks(iter_items(), sizes), window=workers * 8):
+                for task_id, case_id, name, data in files:
+                    store.put(task_id, case_id, name, data)
+                for row in rows:
+                    writer.write(row)
+                    rows_by_task[row["task_id"]] += 1
+                    n_failed += bool(row.get("error"))
+            n = writer.rows
+    store.close()
+
+    meta["artifacts"]["stats"] = store.stats()
+    meta["status"] = "completed"
+    meta["cases_done"] = n
+    if n_failed:
+        meta["cases_failed"] = n_failed
+    for t in meta["tasks"]:
+        t["cases"] = rows_by_task[t["id"]]
+    meta["columns_sidecar"] = export_run(out_dir).name
+    meta["rescore"] = {"workers": workers, "eval_batch": args.eval_batch, "skipped": skipped["n"], "wall_time_s": round(time.time() - t0, 3)}
+    write_meta(out_dir, meta)
+
+    print(f"Re-evaluación guardada en: {out_dir}")
+    print(f"Resultados: {n} casos ({skipped['n']} omitidos por tarea/caso inexistente)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from models.adapters.base import BaseAdapter, GenResult
+from tools.utils import sha256_text
+
+
+CACHE_MODES = ("read", "write", "off")
+
+# Parámetros que no cambian la respuesta del modelo (transporte/credenciales/simulación)
+NON_SEMANTIC_PARAMS = {"api_key_env", "base_url_env", "pool_size", "mock_delay_ms", "sdk_max_retries", "stream"}
+
+
+def cache_key(*, provider: str, params: Dict[str, Any], system: str, input_hash: str) -> str:
+    semantic = {k: v for k, v in params.items() if k not in NON_SEMANTIC_PARAMS}
+    payload = json.dumps(
+        {"provider": provider, "params": semantic, "system": system, "input_hash": input_hash},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return sha256_text(payload)
+
+
+class ResponseCache:
+    """Cache de respuestas en SQLite direccionado por contenido.
+
+    Modos:
+    - `read`: usa respuestas cacheadas y guarda las que falten.
+    - `write`: siempre llama al modelo y sobrescribe la entrada (refresca el cache).
+    - `off`: no lee ni escribe.
+
+    Eviction: entradas más antiguas que `max_age_s` y, si el total supera `max_bytes`,
+    las de acceso menos reciente.
+
+    Cada entrada guarda también la latencia y, si se generó con streaming, el `timing` de la
+    respuesta original. Un hit vuelve con `source="cache"`: esos valores son de otro run, así que
+    la fila del caso no entra en p50/p95 ni en las métricas de streaming.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "read",
+        *,
+        max_bytes: Optional[int] = None,
+        max_age_s: Optional[float] = None,
+    ) -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Modo de cache no soportado: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+              key TEXT PRIMARY KEY,
+              text TEXT NOT NULL,
+              usage TEXT NOT NULL,
+              latency_ms INTEGER,
+              size_bytes INTEGER NOT NULL,
+              created_at REAL NOT NULL,
+              last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        # Caches creados antes de `--samples` no tienen la columna de las n respuestas
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(responses)")}
+        if "texts" not in columns:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN texts TEXT")
+        # Ni la del timing de streaming (TTFT, ITL); esas entradas dan hits sin `timing`
+        if "timing" not in columns:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN timing TEXT")
+        self.evict()
+
+    def get(self, key: str) -> Optional[GenResult]:
+        if self.mode != "read":
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, usage, latency_ms, texts, timing FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.counters["hits"] += 1
+        text, usage, latency_ms, texts, timing = row
+        return GenResult(
+            text=text,
+            usage=json.loads(usage),
+            latency_ms=latency_ms,
+            timing=json.loads(timing) if timing else None,
+            texts=json.loads(texts) if texts else None,
+            source="cache",
+        )
+
+    def contains(self, key: str) -> bool:
+        """True si `get` devolvería una respuesta (sin tocar contadores ni `last_access`)."""
+        if self.mode != "read":
+            return False
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key: str, gen: GenResult) -> None:
+        if self.mode == "off":
+            return
+        now = time.time()
+        usage = json.dumps(gen.usage or {}, ensure_ascii=False)
+        texts = json.dumps(gen.texts, ensure_ascii=False) if gen.texts else None
+        timing = json.dumps(gen.timing) if gen.timing else None
+        size = len(gen.text.encode("utf-8")) + len(usage) + len((texts or "").encode("utf-8")) + len(timing or "")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, text, usage, latency_ms, size_bytes, created_at, last_access, texts, timing)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, gen.text, usage, gen.latency_ms, size, now, now, texts, timing),
+            )
+            self.counters["writes"] += 1
+
+    def evict(self) -> int:
+        """Aplica las políticas de edad y tamaño; devuelve cuántas entradas se borraron."""
+        removed = 0
+        with self._lock:
+            if self.max_age_s is not None:
+                cur = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_s,))
+                removed += cur.rowcount
+            if self.max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    victims = []
+                    for key, size in self._conn.execute("SELECT key, size_bytes FROM responses ORDER BY last_access"):
+                        if total <= self.max_bytes:
+                            break
+                        victims.append((key,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+                    removed += len(victims)
+            self.counters["evicted"] += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM responses"
+            ).fetchone()
+            out: Dict[str, Any] = {"mode": self.mode, "path": self.path, **self.counters}
+        out["entries"] = entries
+        out["size_bytes"] = size
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachingAdapter(BaseAdapter):
+    """Envuelve un adapter y consulta el `ResponseCache` antes de llamar al modelo."""
+
+    def __init__(self, inner: BaseAdapter, cache: ResponseCache, *, provider: str) -> None:
+        self.inner = inner
+        self.cache = cache
+        self.provider = provider
+
+    def _key(self, system: str, user: str, params: Dict[str, Any]) -> str:
+        return cache_key(provider=self.provider, params=params, system=system, input_hash=sha256_text(user))
+
+    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        key = self._key(system, user, params)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit
+        gen = self.inner.generate(system=system, user=user, params=params)
+        self.cache.put(key, gen)
+        return gen
+
+    async def agenerate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        key = self._key(system, user, params)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit
+        gen = await self.inner.agenerate(system=system, user=user, params=params)
+        self.cache.put(key, gen)
+        return gen
+
+    def stats(self) -> Dict[str, Any]:
+        return self.inner.stats()
+
+    def close(self) -> None:
+        self.inner.close()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
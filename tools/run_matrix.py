@@ -1,10 +1,20 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import datetime as dt
+import json
 import subprocess
 import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
+
+from tools.catalog import get_catalog
+from tools.run_suite import RunOptions, SuiteRun, add_run_args, ensure_dir, git_commit, resolve_model, write_meta
+from tools.throttle import ConcurrencyLimit
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
@@ -16,31 +26,153 @@ def _run(cmd: List[str]) -> int:
     return int(p.returncode)
 
 
+def parse_provider_limits(items: Optional[List[str]]) -> Dict[str, int]:
+    """`["openai=8", "litellm=4"]` -> `{"openai": 8, "litellm": 4}`."""
+    limits: Dict[str, int] = {}
+    for item in items or []:
+        name, sep, value = item.partition("=")
+        if not sep or not value.isdigit():
+            raise ValueError(f"--provider-concurrency espera provider=N, no {item!r}")
+        limits[name] = int(value)
+    return limits
+
+
+def _summary(run: Optional[SuiteRun], model_id: str, error: Optional[str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"model": model_id, "status": "failed" if error else "completed"}
+    if run is not None:
+        out.update(
+            {
+                "run_dir": str(run.out_dir),
+                "provider": run.model_cfg["provider"],
+                "cases": run.n_new,
+                "wall_time_s": run.meta.get("wall_time_s"),
+            }
+        )
+        adaptive = run.meta.get("adaptive") or {}
+        if adaptive.get("tasks"):
+            out["adaptive"] = {k: {"cases_used": v["cases_used"], "reason": v["reason"]} for k, v in adaptive["tasks"].items()}
+    if error:
+        out["error"] = error
+    return out
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Ejecuta una misma suite para multiples modelos")
     ap.add_argument("--suite", required=True, help="Nombre de suite (carpeta en suites/)")
     ap.add_argument("--models", nargs="+", required=True, help="Ids de modelos en models/registry.yml")
-    ap.add_argument("--tasks", nargs="*", default=None, help="Lista de task ids (por defecto todas)")
-    ap.add_argument("--max-cases", type=int, default=None, help="Limita cantidad de casos por tarea")
-    ap.add_argument("--system", default="Eres un asistente util y preciso.", help="System prompt")
+    add_run_args(ap)
+    ap.add_argument(
+        "--provider-concurrency",
+        nargs="*",
+        default=None,
+        metavar="PROVIDER=N",
+        help="Tope de requests simultáneos por provider, compartido entre modelos (p.ej. openai=8)",
+    )
     ap.add_argument("--aggregate", action="store_true", help="Si se activa, corre aggregate al final")
     args = ap.parse_args()
 
-    base = [sys.executable, "tools/run_suite.py", "--suite", args.suite, "--system", args.system]
-    if args.tasks:
-        base += ["--tasks", *args.tasks]
-    if args.max_cases is not None:
-        base += ["--max-cases", str(args.max_cases)]
+    try:
+        provider_limits = parse_provider_limits(args.provider_concurrency)
+    except ValueError as e:
+        ap.error(str(e))
+
+    # Las tareas se cargan una sola vez y se comparten entre todos los modelos
+    catalog = get_catalog()
+    catalog.load_suite(args.suite, args.tasks)
+    limits = {name: ConcurrencyLimit(n) for name, n in provider_limits.items()}
+
+    now = dt.datetime.utcnow()
+    matrix_dir = REPO_ROOT / "runs" / now.strftime("%Y-%m-%d") / (now.strftime("%H%M%S") + f"_matrix_{args.suite}")
+    ensure_dir(matrix_dir)
+    manifest: Dict[str, Any] = {
+        "matrix_id": matrix_dir.name,
+        "timestamp_utc": now.isoformat() + "Z",
+        "git_commit": git_commit(),
+        "suite": args.suite,
+        "models": [],
+        "provider_concurrency": provider_limits,
+        "status": "running",
+    }
+
+    runs: Dict[str, Optional[SuiteRun]] = {}
+    errors: Dict[str, str] = {}
+
+    def build(mid: str, **overrides: Any) -> None:
+        try:
+            provider = resolve_model(mid)["provider"]
+            runs[mid] = SuiteRun(
+                RunOptions.from_args(
+                    args, model=mid, suite=args.suite, extra_meta={"matrix_id": matrix_dir.name}, **overrides
+                ),
+                catalog=catalog,
+                limit=limits.get(provider),
+            )
+        except Exception as e:
+            runs[mid] = None
+            errors[mid] = f"{type(e).__name__}: {e}"
 
-    rc_any = 0
+    def execute(mid: str) -> None:
+        run = runs[mid]
+        if run is None:
+            return
+        try:
+            run.execute()
+        except Exception as e:
+            errors[mid] = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+
+    # Con --adaptive y --reference igual a uno de los modelos, la referencia corre completa primero
+    # y el resto se detiene contra su resultado
+    t0 = time.time()
+    ref_model = args.reference if args.adaptive and args.reference in args.models else None
+    overrides: Dict[str, Any] = {}
+    if ref_model:
+        manifest["reference_model"] = ref_model
+        build(ref_model, adaptive=False, reference=None)
+        execute(ref_model)
+        ref_run = runs[ref_model]
+        if ref_model in errors or ref_run is None:
+            overrides["reference"] = None
+        else:
+            overrides["reference"] = str(ref_run.out_dir)
     for mid in args.models:
-        cmd = base + ["--model", mid]
-        rc = _run(cmd)
-        if rc != 0:
-            rc_any = rc
+        if mid != ref_model:
+            build(mid, **overrides)
+
+    write_meta(matrix_dir, manifest, name="matrix_meta.json")
+
+    async def aexecute_all() -> None:
+        active = [mid for mid, run in runs.items() if run is not None and mid != ref_model]
+        results = await asyncio.gather(*(runs[mid].aexecute() for mid in active), return_exceptions=True)  # type: ignore[union-attr]
+        for mid, res in zip(active, results):
+            if isinstance(res, BaseException):
+                errors[mid] = f"{type(res).__name__}: {res}"
+
+    # Todos los modelos avanzan a la vez: un thread por modelo, o un solo event loop con --async
+    if args.use_async:
+        asyncio.run(aexecute_all())
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, len(runs)), thread_name_prefix="model") as pool:
+            list(pool.map(execute, [mid for mid in runs if mid != ref_model]))
+    wall = time.time() - t0
+
+    manifest["models"] = [_summary(runs[mid], mid, errors.get(mid)) for mid in args.models]
+    per_model = [m.get("wall_time_s") or 0.0 for m in manifest["models"]]
+    manifest["wall_time_s"] = round(wall, 3)
+    manifest["sum_model_wall_time_s"] = round(sum(per_model), 3)
+    manifest["status"] = "failed" if errors else "completed"
+    # El manifest combinado vive en su propio directorio (sin results.jsonl, aggregate lo ignora)
+    write_meta(matrix_dir, manifest, name="matrix_meta.json")
+
+    for m in manifest["models"]:
+        status = m["status"] if m["status"] == "completed" else f"{m['status']}: {m.get('error')}"
+        print(f"- {m['model']}: {status} {m.get('run_dir', '')}")
+    print(f"Matriz: {json.dumps({'wall_time_s': manifest['wall_time_s'], 'sum_model_wall_time_s': manifest['sum_model_wall_time_s']})}")
+    print(f"Manifest: {matrix_dir / 'matrix_meta.json'}")
 
+    rc_any = 1 if errors else 0
     if args.aggregate:
-        rc = _run([sys.executable, "tools/aggregate.py"])
+        rc = _run([sys.executable, "-m", "tools.aggregate"])
         if rc != 0:
             rc_any = rc
 
@@ -1,18 +1,32 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import datetime as dt
-import importlib.util
 import json
 import os
 import sys
 import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import yaml
 
-from tools.utils import read_jsonl, read_text, sha256_text, write_jsonl
+from models.adapters.base import GenResult
+from tools.adaptive import ADAPTIVE_SCOPES, AdaptiveStopper, load_reference
+from tools.artifacts import ARTIFACT_STORES, ArtifactStore, needs_workdir, open_store, store_config
+from tools.batch import STATE_NAME, BatchResultsAdapter, results_by_prompt, run_batch
+from tools.cases import parse_shard
+from tools.catalog import TaskCatalog, batch_evaluator, get_catalog, import_evaluator, iter_tasks_for_suite, load_task_config  # noqa: F401
+from tools.columnar import export_run
+from tools.response_cache import CACHE_MODES, CachingAdapter, ResponseCache, cache_key
+from tools.sampling import SampledAdapter
+from tools.throttle import ConcurrencyLimit, LimitedAdapter, RateLimitedAdapter, get_scheduler
+from tools.tracing import NO_TRACE, Tracer
+from tools.utils import JsonlAppender, completed_case_keys, iter_jsonl, repair_jsonl_tail, sha256_text
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
@@ -24,6 +38,31 @@ def load_registry() -> Dict[str, Any]:
         return yaml.safe_load(f)
 
 
+def _rate_limit_for(reg: Dict[str, Any], m: Dict[str, Any], params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Clave y config del scheduler de rate limit de un modelo.
+
+    La clave agrupa modelos que comparten cuota: `provider:api_key_env` (`openai:default` sin
+    `api_key_env`) o `provider:prefijo` del modelo LiteLLM (`anthropic/...` -> `litellm:anthropic`). La config se
+    combina desde `rate_limits[clave]` y el `rate_limit` del propio modelo; `rate_limits[provider]` solo
+    vale para la credencial por defecto (`provider:default`): la cuota de la cuenta de OpenAI no se
+    aplica a DeepSeek ni a otro endpoint compatible con su propia `api_key_env`.
+    """
+    provider = m.get("provider") or ""
+    own = dict(m.get("rate_limit") or {})
+    if provider == "litellm":
+        scope = str(params.get("model") or "").partition("/")[0] or "default"
+    else:
+        scope = params.get("api_key_env") or "default"
+    key = own.pop("key", None) or f"{provider}:{scope}"
+    limits = reg.get("rate_limits", {}) or {}
+    cfg: Dict[str, Any] = {}
+    if key == f"{provider}:default":
+        cfg.update(limits.get(provider) or {})
+    cfg.update(limits.get(key) or {})
+    cfg.update(own)
+    return key, cfg
+
+
 def resolve_model(model_id: str) -> Dict[str, Any]:
     reg = load_registry()
     presets = reg.get("presets", {})
@@ -33,10 +72,14 @@ def resolve_model(model_id: str) -> Dict[str, Any]:
             preset = presets.get(preset_name, {}) if preset_name else {}
             params = dict(preset)
             params.update(m.get("params", {}) or {})
+            key, rate_limit = _rate_limit_for(reg, m, params)
             return {
                 "id": model_id,
                 "provider": m.get("provider"),
                 "params": params,
+                "rate_limit_key": key,
+                "rate_limit": rate_limit,
+                "pricing": m.get("pricing"),
             }
     raise ValueError(f"Modelo no encontrado en registry.yml: {model_id}")
 
@@ -58,31 +101,6 @@ def build_adapter(provider: str):
     raise ValueError(f"Provider no soportado: {provider}")
 
 
-def iter_tasks_for_suite(suite: str) -> List[Path]:
-    tasks_dir = REPO_ROOT / "suites" / suite / "tasks"
-    if not tasks_dir.exists():
-        raise ValueError(f"Suite no encontrada: {suite}")
-    return sorted([p for p in tasks_dir.iterdir() if p.is_dir()])
-
-
-def load_task_config(task_dir: Path) -> Dict[str, Any]:
-    cfg_path = task_dir / "task.yml"
-    with open(cfg_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
-
-
-def import_evaluator(task_dir: Path):
-    ev_path = task_dir / "evaluator.py"
-    spec = importlib.util.spec_from_file_location(f"evaluator_{task_dir.name}", ev_path)
-    if not spec or not spec.loader:
-        raise RuntimeError(f"No se pudo cargar evaluator: {ev_path}")
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)  # type: ignore
-    if not hasattr(module, "evaluate"):
-        raise RuntimeError("evaluator.py debe exponer una función evaluate(case, model_output, workdir)")
-    return module.evaluate
-
-
 def git_commit() -> Optional[str]:
     head = REPO_ROOT / ".git" / "HEAD"
     if not head.exists():
@@ -101,94 +119,1018 @@ def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
 
-def main() -> int:
-    ap = argparse.ArgumentParser(description="Runner de suites para comparar modelos")
-    ap.add_argument("--model", required=True, help="Id del modelo en models/registry.yml")
-    ap.add_argument("--suite", required=True, help="Nombre de suite (carpeta en suites/)")
-    ap.add_argument("--tasks", nargs="*", default=None, help="Lista de task ids (por defecto todas)")
-    ap.add_argument("--max-cases", type=int, default=None, help="Limita cantidad de casos por tarea")
-    ap.add_argument("--system", default="Eres un asistente útil y preciso.", help="System prompt")
+class RunCancelled(RuntimeError):
+    """El run se detuvo porque su función `cancel` lo pidió (p.ej. un worker que perdió el lease)."""
 
-    args = ap.parse_args()
 
-    model_cfg = resolve_model(args.model)
-    adapter = build_adapter(model_cfg["provider"])
+def write_meta(out_dir: Path, meta: Dict[str, Any], name: str = "run_meta.json") -> None:
+    # Escritura atómica: un crash nunca deja un run_meta.json a medias
+    tmp = out_dir / f"{name}.tmp"
+    tmp.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, out_dir / name)
+
+
+@dataclass
+class CaseJob:
+    """Un caso listo para generar: prompt renderizado + evaluador de su tarea."""
+
+    task_id: str
+    case: Dict[str, Any]
+    user_prompt: str
+    input_hash: str
+    evaluate: Callable[..., Dict[str, Any]]
+
+
+def _failed(exc: Exception) -> GenResult:
+    return GenResult(text="", usage={}, error=f"{type(exc).__name__}: {exc}")
+
+
+def generate_case(
+    adapter, job: CaseJob, system: str, params: Dict[str, Any], tracer: Tracer = NO_TRACE
+) -> Tuple[Any, int]:
+    """Genera un caso. Si el adapter falla (ya agotados sus reintentos) el error queda en
+    `GenResult.error` y el caso se registra como fallido sin cortar el run."""
+    t0 = time.time()
+    with tracer.span("generate", job.task_id, job.case.get("case_id")):
+        try:
+            gen = adapter.generate(system=system, user=job.user_prompt, params=params)
+        except Exception as e:
+            gen = _failed(e)
+    latency_ms = int((time.time() - t0) * 1000)
+    return gen, latency_ms
+
+
+async def agenerate_case(
+    adapter, job: CaseJob, system: str, params: Dict[str, Any], tracer: Tracer = NO_TRACE
+) -> Tuple[Any, int]:
+    t0 = time.time()
+    with tracer.span("generate", job.task_id, job.case.get("case_id"), concurrent=True):
+        try:
+            gen = await adapter.agenerate(system=system, user=job.user_prompt, params=params)
+        except Exception as e:
+            gen = _failed(e)
+    latency_ms = int((time.time() - t0) * 1000)
+    return gen, latency_ms
+
+
+def _sample_key(case_id: Any, i: int) -> Any:
+    return case_id if i == 0 else f"{case_id}#{i}"
+
+
+def _eval_entry(output: str, ev: Dict[str, Any]) -> Dict[str, Any]:
+    return {"raw_output": output, "scores": ev.get("scores", {}), "pass_fail": ev.get("pass_fail"), "notes": ev.get("notes")}
+
 
-    suite = args.suite
-    task_dirs = iter_tasks_for_suite(suite)
+def evaluate_outputs(
+    evaluate: Callable[..., Dict[str, Any]],
+    task_id: str,
+    case: Dict[str, Any],
+    outputs: List[str],
+    artifacts: ArtifactStore,
+    tracer: Tracer = NO_TRACE,
+) -> List[Dict[str, Any]]:
+    """Evalúa cada salida de un caso (una sola sin `--samples`), cada una con su propio workdir.
 
-    selected = set(args.tasks) if args.tasks else None
+    Los artifacts de la muestra i > 0 van a `<case_id>#<i>`.
+    """
+    case_id = case.get("case_id")
+    evals = []
+    for i, output in enumerate(outputs):
+        key = _sample_key(case_id, i)
+        # Directorio real solo si el evaluador lo necesita; si no, guarda directo en el store
+        with tracer.span("artifact_dir", task_id, key):
+            workdir = artifacts.workdir(task_id, key, create=needs_workdir(evaluate))
+        with tracer.span("evaluate", task_id, key):
+            ev = evaluate(case, output, workdir)
+        with tracer.span("artifact_store", task_id, key):
+            artifacts.finish_case(workdir)
+        evals.append(_eval_entry(output, ev))
+    return evals
 
-    now = dt.datetime.utcnow()
-    date_dir = REPO_ROOT / "runs" / now.strftime("%Y-%m-%d")
-    run_id = now.strftime("%H%M%S") + f"_{args.model}_{suite}"
-    out_dir = date_dir / run_id
-    ensure_dir(out_dir)
-    ensure_dir(out_dir / "artifacts")
 
-    meta = {
-        "run_id": run_id,
-        "timestamp_utc": now.isoformat() + "Z",
-        "git_commit": git_commit(),
-        "model": {"id": model_cfg["id"], "provider": model_cfg["provider"], "params": model_cfg["params"]},
+def evaluate_many(
+    evaluate: Callable[..., Dict[str, Any]],
+    task_id: str,
+    cases: List[Dict[str, Any]],
+    outputs: List[List[str]],
+    artifacts: ArtifactStore,
+    tracer: Tracer = NO_TRACE,
+) -> List[List[Dict[str, Any]]]:
+    """Evalúa las salidas de varios casos de una misma tarea; devuelve las evaluaciones de cada caso.
+
+    Si el módulo del evaluador expone `evaluate_batch`, todas las salidas (casos × muestras) van
+    en una sola llamada; si no, caso por caso con `evaluate_outputs`. Los spans del lote llevan
+    como case_id `<primero>..<último>`.
+    """
+    batch = batch_evaluator(evaluate)
+    if batch is None:
+        return [evaluate_outputs(evaluate, task_id, case, outs, artifacts, tracer) for case, outs in zip(cases, outputs)]
+
+    flat_cases: List[Dict[str, Any]] = []
+    flat_outputs: List[str] = []
+    keys: List[Any] = []
+    for case, outs in zip(cases, outputs):
+        for i, output in enumerate(outs):
+            flat_cases.append(case)
+            flat_outputs.append(output)
+            keys.append(_sample_key(case.get("case_id"), i))
+    span_id = keys[0] if len(keys) == 1 else f"{keys[0]}..{keys[-1]}"
+    create = needs_workdir(evaluate)
+    with tracer.span("artifact_dir", task_id, span_id):
+        workdirs = [artifacts.workdir(task_id, key, create=create) for key in keys]
+    with tracer.span("evaluate", task_id, span_id):
+        results = list(batch(flat_cases, flat_outputs, workdirs))
+    if len(results) != len(flat_outputs):
+        raise RuntimeError(
+            f"evaluate_batch de {task_id} devolvió {len(results)} resultados para {len(flat_outputs)} salidas"
+        )
+    with tracer.span("artifact_store", task_id, span_id):
+        for workdir in workdirs:
+            artifacts.finish_case(workdir)
+
+    evals = [_eval_entry(output, ev) for output, ev in zip(flat_outputs, results)]
+    per_case = []
+    pos = 0
+    for outs in outputs:
+        per_case.append(evals[pos : pos + len(outs)])
+        pos += len(outs)
+    return per_case
+
+
+def sample_fields(evals: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Campos de la fila con varias muestras: todas las evaluaciones, cuántas hay y cuántas pasan."""
+    return {
+        "n_samples": len(evals),
+        "n_pass": sum(1 for ev in evals if ev["pass_fail"] is True),
+        "samples": evals,
+    }
+
+
+def _row(job: CaseJob, gen, latency_ms: int, suite: str, evals: List[Dict[str, Any]]) -> Dict[str, Any]:
+    first = evals[0]
+
+    # Los campos de siempre son los de la primera muestra
+    row = {
         "suite": suite,
-        "tasks": [],
-        "aggregates": {},
+        "task_id": job.task_id,
+        "case_id": job.case.get("case_id"),
+        "input_hash": job.input_hash,
+        "prompt": job.user_prompt,
+        "raw_output": first["raw_output"],
+        "usage": gen.usage,
+        "latency_ms": gen.latency_ms if gen.latency_ms is not None else latency_ms,
+        "scores": first["scores"],
+        "pass_fail": first["pass_fail"],
+        "notes": first["notes"],
     }
+    if len(evals) > 1:
+        row.update(sample_fields(evals))
+    if gen.source is not None:
+        # Respuesta del cache o del batch: sin latencia ni timing propios (no entra en p50/p95)
+        row["source"] = gen.source
+        row["latency_ms"] = None
+    elif gen.timing:
+        row["timing"] = gen.timing
+    return row
 
-    all_results: List[Dict[str, Any]] = []
 
-    for tdir in task_dirs:
-        cfg = load_task_config(tdir)
-        task_id = cfg.get("id")
-        if selected is not None and task_id not in selected:
-            continue
+def _error_row(job: CaseJob, gen, suite: str) -> Dict[str, Any]:
+    """Fila de un caso cuya generación falló: no se evalúa, cuenta como no aprobado y queda sin
+    latencia (no entra en p50/p95)."""
+    return {
+        "suite": suite,
+        "task_id": job.task_id,
+        "case_id": job.case.get("case_id"),
+        "input_hash": job.input_hash,
+        "prompt": job.user_prompt,
+        "raw_output": "",
+        "usage": gen.usage,
+        "latency_ms": None,
+        "scores": {},
+        "pass_fail": False,
+        "notes": None,
+        "error": gen.error,
+    }
 
-        prompt_tpl = read_text(str(tdir / cfg.get("prompt")))
-        cases = read_jsonl(str(tdir / cfg.get("cases")))
-        if args.max_cases is not None:
-            cases = cases[: args.max_cases]
 
-        evaluate = import_evaluator(tdir)
+# Un caso generado, listo para evaluar: (job, GenResult, latencia medida en ms)
+Generated = Tuple[CaseJob, Any, int]
 
-        meta["tasks"].append({"id": task_id, "name": cfg.get("name"), "cases": len(cases)})
 
-        for case in cases:
-            case_id = case.get("case_id")
-            # Prompt con variables
-            user_prompt = prompt_tpl.format(**case)
-            input_hash = sha256_text(user_prompt)
+def evaluate_cases(
+    items: List[Generated], suite: str, artifacts: ArtifactStore, tracer: Tracer = NO_TRACE
+) -> List[Dict[str, Any]]:
+    """Filas de varios casos generados de una misma tarea (ver `evaluate_many`), en orden.
+
+    Los casos con `error` de generación no se evalúan (ver `_error_row`).
+    """
+    job = items[0][0]
+    ok = [item for item in items if item[1].error is None]
+    per_case = iter(
+        evaluate_many(
+            job.evaluate,
+            job.task_id,
+            [j.case for j, _, _ in ok],
+            [gen.texts or [gen.text] for _, gen, _ in ok],
+            artifacts,
+            tracer,
+        )
+        if ok
+        else []
+    )
+    return [
+        _error_row(j, gen, suite) if gen.error is not None else _row(j, gen, latency_ms, suite, next(per_case))
+        for j, gen, latency_ms in items
+    ]
+
+
+# Tope de casos por llamada a `evaluate_batch` (los evaluadores sin él siguen caso por caso)
+DEFAULT_EVAL_BATCH = 32
+
+
+def _take_ready(pending: Deque[Any], first: Generated, eval_batch: int) -> List[Generated]:
+    """`first` más los casos siguientes de `pending` que ya terminaron de generarse, de su misma tarea.
+
+    Solo junta casos si el evaluador de la tarea expone `evaluate_batch`, y nunca espera a una
+    generación en curso: el lote es lo que ya está listo (a lo sumo `eval_batch`), así cada fila
+    se evalúa y se escribe apenas es posible.
+    """
+    job = first[0]
+    limit = eval_batch if batch_evaluator(job.evaluate) is not None else 1
+    items = [first]
+    while len(items) < limit and pending:
+        head = pending[0]
+        if not head.done() or head.cancelled() or head.exception() is not None:
+            break
+        if head.result()[0].task_id != job.task_id:
+            break
+        items.append(pending.popleft().result())
+    return items
+
+
+def run_jobs(
+    jobs: Iterable[CaseJob],
+    *,
+    adapter,
+    system: str,
+    params: Dict[str, Any],
+    suite: str,
+    artifacts: ArtifactStore,
+    concurrency: int = 1,
+    eval_workers: Optional[int] = None,
+    eval_batch: int = DEFAULT_EVAL_BATCH,
+    tracer: Tracer = NO_TRACE,
+) -> Iterator[Dict[str, Any]]:
+    """Ejecuta generación + evaluación y entrega las filas en el orden de `jobs`.
+
+    Con `concurrency > 1` mantiene hasta N generaciones en vuelo en un pool de threads
+    y evalúa en un pool separado, de modo que el modelo nunca espera al evaluador.
+    Los casos consecutivos ya generados de una tarea con `evaluate_batch` se evalúan juntos
+    (ver `_take_ready`); cada fila se entrega apenas está evaluada.
+    """
+    if concurrency <= 1:
+        # Secuencial: nunca hay más de un caso generado esperando, se evalúa en el momento
+        for job in jobs:
+            gen, latency_ms = generate_case(adapter, job, system, params, tracer)
+            yield from evaluate_cases([(job, gen, latency_ms)], suite, artifacts, tracer)
+        return
+
+    n_eval = eval_workers or concurrency
+    # Ventana acotada de casos pendientes: memoria estable aunque la suite sea enorme
+    window = concurrency * 4
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gen") as gen_pool, ThreadPoolExecutor(
+        max_workers=n_eval, thread_name_prefix="eval"
+    ) as eval_pool:
+
+        evaluate = tracer.profiled(evaluate_cases)
+
+        @tracer.profiled
+        def generate(job: CaseJob) -> Generated:
+            gen, latency_ms = generate_case(adapter, job, system, params, tracer)
+            return job, gen, latency_ms
+
+        # Generaciones en vuelo y evaluaciones (de a lote) en vuelo, ambas en el orden de `jobs`
+        pending: Deque["Future[Generated]"] = deque()
+        evals: Deque["Future[List[Dict[str, Any]]]"] = deque()
+        it = iter(jobs)
+        # Casos ya generados que esperan evaluación: cuentan en la ventana igual que los que se generan
+        queued = 0
+        try:
+            while True:
+                while len(pending) + queued < window:
+                    nxt = next(it, None)
+                    if nxt is None:
+                        break
+                    pending.append(gen_pool.submit(generate, nxt))
+                if not pending and not evals:
+                    break
+                if evals and (evals[0].done() or not pending):
+                    rows = evals.popleft().result()
+                    queued -= len(rows)
+                    yield from rows
+                    continue
+                if evals and not pending[0].done():
+                    # Lo primero que termine: la próxima generación o la evaluación más vieja
+                    wait([pending[0], evals[0]], return_when=FIRST_COMPLETED)
+                    continue
+                items = _take_ready(pending, pending.popleft().result(), eval_batch)
+                evals.append(eval_pool.submit(evaluate, items, suite, artifacts, tracer))
+                queued += len(items)
+        finally:
+            # Si el consumidor corta antes (error, run cancelado) no se arrancan los casos en cola
+            for f in pending:
+                f.cancel()
+            for f in evals:
+                f.cancel()
+
+
+async def arun_jobs(
+    jobs: Iterable[CaseJob],
+    *,
+    adapter,
+    system: str,
+    params: Dict[str, Any],
+    suite: str,
+    artifacts: ArtifactStore,
+    concurrency: int = 1,
+    eval_workers: Optional[int] = None,
+    eval_batch: int = DEFAULT_EVAL_BATCH,
+    tracer: Tracer = NO_TRACE,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Variante async de `run_jobs`: un solo event loop con hasta N `agenerate` en vuelo.
+
+    Las evaluaciones (bloqueantes) corren en un pool de threads acotado por CPU.
+    """
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(max(1, concurrency))
+    n_eval = eval_workers or min(max(1, concurrency), (os.cpu_count() or 1) + 4)
+    window = max(1, concurrency) * 4
+
+    with ThreadPoolExecutor(max_workers=n_eval, thread_name_prefix="eval") as eval_pool:
+        evaluate = tracer.profiled(evaluate_cases)
 
-            t0 = time.time()
-            gen = adapter.generate(system=args.system, user=user_prompt, params=model_cfg["params"])
-            latency_ms = int((time.time() - t0) * 1000)
+        async def generate(job: CaseJob) -> Generated:
+            async with sem:
+                gen, latency_ms = await agenerate_case(adapter, job, system, params, tracer)
+            return job, gen, latency_ms
 
-            # Evaluación
-            workdir = out_dir / "artifacts" / task_id / str(case_id)
-            ensure_dir(workdir)
-            ev = evaluate(case, gen.text, str(workdir))
+        pending: "Deque[asyncio.Task[Generated]]" = deque()
+        evals: "Deque[asyncio.Future[List[Dict[str, Any]]]]" = deque()
+        it = iter(jobs)
+        queued = 0
+        try:
+            while True:
+                while len(pending) + queued < window:
+                    nxt = next(it, None)
+                    if nxt is None:
+                        break
+                    pending.append(asyncio.ensure_future(generate(nxt)))
+                if not pending and not evals:
+                    break
+                if evals and (evals[0].done() or not pending):
+                    rows = await evals.popleft()
+                    queued -= len(rows)
+                    for row in rows:
+                        yield row
+                    continue
+                if evals and not pending[0].done():
+                    await asyncio.wait([pending[0], evals[0]], return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                items = _take_ready(pending, await pending.popleft(), eval_batch)
+                evals.append(loop.run_in_executor(eval_pool, evaluate, items, suite, artifacts, tracer))
+                queued += len(items)
+        finally:
+            for t in pending:
+                t.cancel()
+            for f in evals:
+                f.cancel()
 
-            row = {
+
+DEFAULT_SYSTEM = "Eres un asistente útil y preciso."
+
+
+@dataclass
+class RunOptions:
+    """Opciones de un run (modelo × suite); mismas que la CLI de run_suite."""
+
+    model: str
+    suite: str
+    tasks: Optional[List[str]] = None
+    max_cases: Optional[int] = None
+    shard: Optional[Tuple[int, int]] = None
+    sample: Optional[int] = None
+    seed: int = 0
+    system: str = DEFAULT_SYSTEM
+    concurrency: int = 1
+    eval_workers: Optional[int] = None
+    # Tope de casos ya generados por llamada a `evaluate_batch` (tareas cuyo evaluador lo expone)
+    eval_batch: int = DEFAULT_EVAL_BATCH
+    use_async: bool = False
+    cache: str = "off"
+    cache_path: str = str(REPO_ROOT / ".cache" / "responses.sqlite")
+    cache_max_mb: Optional[float] = None
+    cache_max_age_days: Optional[float] = None
+    resume: Optional[str] = None
+    batch: bool = False
+    batch_poll_s: float = 30.0
+    stream: bool = False
+    # Muestras por caso (pass@k): `n` del provider si lo soporta, si no requests en paralelo
+    samples: int = 1
+    # Modo adaptativo: casos en orden aleatorio hasta que el intervalo de confianza se asienta
+    adaptive: bool = False
+    ci_width: float = 0.1
+    confidence: float = 0.95
+    min_cases: int = 20
+    adaptive_scope: str = "task"
+    reference: Optional[str] = None
+    # Instrumentación: tiempos por etapa en run_meta.json, trace de Chrome y perfil cProfile
+    stage_times: bool = False
+    trace: Optional[str] = None
+    profile: bool = False
+    # Artifacts de los evaluadores: un directorio por caso o un SQLite por run (o compartido con artifacts_db)
+    artifacts: str = "dir"
+    artifacts_db: Optional[str] = None
+    # Directorio del run (por defecto runs/<fecha>/<hora>_<modelo>_<suite>) y campos extra para su
+    # run_meta.json; los usan run_matrix y tools/distributed
+    out_dir: Optional[str] = None
+    extra_meta: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace, **overrides: Any) -> "RunOptions":
+        values = {f.name: getattr(args, f.name) for f in fields(cls) if hasattr(args, f.name)}
+        values.update(overrides)
+        return cls(**values)
+
+
+def _shard_arg(value: str) -> Tuple[int, int]:
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+
+
+def add_run_args(ap: argparse.ArgumentParser) -> None:
+    """Opciones de ejecución compartidas por run_suite y run_matrix."""
+    ap.add_argument("--tasks", nargs="*", default=None, help="Lista de task ids (por defecto todas)")
+    ap.add_argument("--max-cases", type=int, default=None, help="Limita cantidad de casos por tarea")
+    ap.add_argument("--shard", type=_shard_arg, default=None, metavar="I/N", help="Solo el shard I de N de la selección de cada tarea")
+    ap.add_argument("--sample", type=int, default=None, help="Muestra aleatoria de K casos por tarea (con --seed)")
+    ap.add_argument("--seed", type=int, default=0, help="Semilla de --sample")
+    ap.add_argument("--system", default=DEFAULT_SYSTEM, help="System prompt")
+    ap.add_argument("--concurrency", type=int, default=1, help="Generaciones en vuelo simultáneas (1 = secuencial)")
+    ap.add_argument("--eval-workers", type=int, default=None, help="Threads de evaluación (por defecto = --concurrency)")
+    ap.add_argument(
+        "--eval-batch",
+        type=int,
+        default=DEFAULT_EVAL_BATCH,
+        metavar="N",
+        help="Tope de casos ya generados por llamada a evaluate_batch en las tareas que lo exponen "
+        "(1 = caso por caso; con --adaptive siempre 1)",
+    )
+    ap.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Usa adapter.agenerate desde un solo event loop (permite --concurrency alto sin un thread por request)",
+    )
+    ap.add_argument(
+        "--cache",
+        choices=CACHE_MODES,
+        default="off",
+        help="Cache de respuestas: read (usa y completa), write (refresca), off",
+    )
+    ap.add_argument("--cache-path", default=str(REPO_ROOT / ".cache" / "responses.sqlite"), help="Archivo SQLite del cache")
+    ap.add_argument("--cache-max-mb", type=float, default=None, help="Tamaño máximo del cache (evicta lo menos usado)")
+    ap.add_argument("--cache-max-age-days", type=float, default=None, help="Edad máxima de las entradas del cache")
+    ap.add_argument(
+        "--batch",
+        action="store_true",
+        help="Genera todo con la batch API del provider (más barata, sin latencia interactiva) y luego evalúa",
+    )
+    ap.add_argument(
+        "--stream",
+        action="store_true",
+        help="Genera en streaming y guarda por fila TTFT, latencia entre tokens y tokens/s (campo timing)",
+    )
+    ap.add_argument("--batch-poll-s", type=float, default=30.0, help="Segundos entre consultas de estado del batch")
+    ap.add_argument(
+        "--samples",
+        type=int,
+        default=1,
+        metavar="K",
+        help="Genera y evalúa K muestras por caso (pass@k): un request con n=K si el provider lo soporta",
+    )
+    ap.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Casos en orden aleatorio; deja de pedir casos de una tarea cuando su resultado ya está asentado",
+    )
+    ap.add_argument(
+        "--ci-width",
+        type=float,
+        default=0.1,
+        help="Con --adaptive: ancho de intervalo (pass rate; score_total normalizado) con el que se detiene",
+    )
+    ap.add_argument("--confidence", type=float, default=0.95, help="Con --adaptive: nivel de confianza de los intervalos")
+    ap.add_argument("--min-cases", type=int, default=20, help="Con --adaptive: casos mínimos antes de poder detenerse")
+    ap.add_argument(
+        "--adaptive-scope",
+        choices=ADAPTIVE_SCOPES,
+        default="task",
+        help="Con --adaptive: detiene cada tarea por separado (task) o el modelo entero con todas juntas (suite)",
+    )
+    ap.add_argument(
+        "--reference",
+        default=None,
+        metavar="RUN_DIR|MODEL",
+        help="Con --adaptive: también se detiene si el modelo queda claramente por encima o por debajo de este run "
+        "(o del último run completo de este modelo con la suite)",
+    )
+    ap.add_argument(
+        "--artifacts",
+        choices=ARTIFACT_STORES,
+        default="dir",
+        help="Dónde guardar los artifacts: dir (un directorio por caso, por defecto) o sqlite (un archivo por run, deduplicado y comprimido)",
+    )
+    ap.add_argument(
+        "--artifacts-db",
+        default=None,
+        help="Con --artifacts sqlite: SQLite compartido entre runs (deduplica entre runs); por defecto <run>/artifacts.sqlite",
+    )
+
+
+class SuiteRun:
+    """Un run de una suite con un modelo: prepara adapter, directorio y jobs; ejecuta y cierra.
+
+    `limit` (opcional) es un tope de concurrencia compartido con otros runs, p.ej. por provider
+    cuando run_matrix corre varios modelos a la vez. `cancel` (opcional) se consulta entre casos
+    y antes de escribir cada fila: si devuelve True el run deja de tomar casos, descarta los que
+    estaban en vuelo sin escribirlos y termina con `RunCancelled` (sin marcarse como completado).
+    """
+
+    def __init__(
+        self,
+        opts: RunOptions,
+        *,
+        catalog: Optional[TaskCatalog] = None,
+        limit: Optional[ConcurrencyLimit] = None,
+        cancel: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        t_start = time.perf_counter()
+        self.opts = opts
+        self.cancel = cancel
+        self.model_cfg = resolve_model(opts.model)
+        if opts.stream:
+            self.model_cfg["params"]["stream"] = True
+        adapter = build_adapter(self.model_cfg["provider"])
+        self.base_adapter = adapter
+        # Rate limit + reintentos ante 429, compartido por todos los modelos con la misma cuota
+        self.scheduler = get_scheduler(self.model_cfg["rate_limit_key"], self.model_cfg["rate_limit"])
+        adapter = RateLimitedAdapter(adapter, self.scheduler)
+        if limit is not None:
+            adapter = LimitedAdapter(adapter, limit)
+        self._uncached_adapter = adapter
+
+        self.cache: Optional[ResponseCache] = None
+        if opts.cache != "off":
+            self.cache = ResponseCache(
+                opts.cache_path,
+                opts.cache,
+                max_bytes=int(opts.cache_max_mb * 1024 * 1024) if opts.cache_max_mb is not None else None,
+                max_age_s=opts.cache_max_age_days * 86400 if opts.cache_max_age_days is not None else None,
+            )
+            adapter = CachingAdapter(adapter, self.cache, provider=self.model_cfg["provider"])
+        self.adapter = adapter
+
+        suite = opts.suite
+        catalog = catalog or get_catalog()
+        self.catalog = catalog
+        task_specs = catalog.load_suite(suite, opts.tasks)
+
+        selected = set(opts.tasks) if opts.tasks else None
+
+        if opts.resume:
+            out_dir = Path(opts.resume)
+            meta = json.loads((out_dir / "run_meta.json").read_text(encoding="utf-8"))
+            meta["tasks"] = []
+            meta["resumes"] = int(meta.get("resumes", 0)) + 1
+        else:
+            now = dt.datetime.utcnow()
+            if opts.out_dir:
+                out_dir = Path(opts.out_dir)
+                run_id = out_dir.name
+            else:
+                run_id = now.strftime("%H%M%S") + f"_{opts.model}_{suite}"
+                out_dir = REPO_ROOT / "runs" / now.strftime("%Y-%m-%d") / run_id
+            meta = {
+                "run_id": run_id,
+                "timestamp_utc": now.isoformat() + "Z",
+                "git_commit": git_commit(),
+                "model": {
+                    "id": self.model_cfg["id"],
+                    "provider": self.model_cfg["provider"],
+                    "params": self.model_cfg["params"],
+                    "pricing": self.model_cfg["pricing"],
+                },
                 "suite": suite,
-                "task_id": task_id,
-                "case_id": case_id,
-                "input_hash": input_hash,
-                "prompt": user_prompt,
-                "raw_output": gen.text,
-                "usage": gen.usage,
-                "latency_ms": gen.latency_ms if gen.latency_ms is not None else latency_ms,
-                "scores": ev.get("scores", {}),
-                "pass_fail": ev.get("pass_fail"),
-                "notes": ev.get("notes"),
+                "tasks": [],
+                "aggregates": {},
             }
-            all_results.append(row)
+        meta.update(opts.extra_meta or {})
+        ensure_dir(out_dir)
+        self.out_dir = out_dir
+        self.meta = meta
+        # Un run reanudado sigue con su store; los anteriores al store usan directorios
+        if opts.resume:
+            art = meta.get("artifacts") or {"store": "dir"}
+        else:
+            art = store_config(opts.artifacts, meta["run_id"], opts.artifacts_db)
+        meta["artifacts"] = {k: v for k, v in art.items() if k != "stats"}
+        self.artifacts = open_store(out_dir, meta["artifacts"])
+        self.tracer = Tracer(
+            opts.model,
+            timing=opts.stage_times,
+            trace_path=opts.trace,
+            profile_path=str(out_dir / "profile.pstats") if opts.profile else None,
+        )
+
+        self.results_path = str(out_dir / "results.jsonl")
+        self.done: Set[Tuple[str, str]] = set()
+        if opts.resume:
+            repair_jsonl_tail(self.results_path)
+            self.done = completed_case_keys(self.results_path)
+
+        # Qué casos de cada tarea: un run reanudado repite la selección original
+        if opts.resume and meta.get("selection"):
+            sel = meta["selection"]
+            shard = parse_shard(sel["shard"]) if sel.get("shard") else None
+            self.selection: Dict[str, Any] = dict(
+                max_cases=sel.get("max_cases"), shard=shard, sample=sel.get("sample"), seed=sel.get("seed", 0)
+            )
+        else:
+            self.selection = dict(max_cases=opts.max_cases, shard=opts.shard, sample=opts.sample, seed=opts.seed)
+        shard = self.selection["shard"]
+        meta["selection"] = {**self.selection, "shard": f"{shard[0]}/{shard[1]}" if shard else None}
+
+        # Casos por tarea sin recorrer el archivo: si no se conocen quedan en None y se completan
+        # al terminar con las filas escritas. El modo adaptativo baraja con el índice de offsets de
+        # todas formas, y no llega a escribir toda la selección
+        adaptive_run = bool(opts.adaptive) or bool(opts.resume and meta.get("adaptive"))
+        self.selected_specs = []
+        for spec in task_specs:
+            if selected is not None and spec.id not in selected:
+                continue
+            known = spec.n_cases if adaptive_run else spec.known_cases
+            n = spec.cases.count(known, **self.selection)
+            meta["tasks"].append({"id": spec.id, "name": spec.name, "cases": n})
+            self.selected_specs.append((spec, spec.evaluate))
+
+        meta["concurrency"] = opts.concurrency
+        meta["async"] = bool(opts.use_async)
+        # Un run reanudado que tenía un batch en curso sigue en modo batch
+        self.batch = bool(opts.batch) or (out_dir / STATE_NAME).exists()
+        if self.batch:
+            meta["batch"] = {"poll_s": opts.batch_poll_s}
+
+        # Muestras por caso: un run reanudado repite las del original
+        self.samples = int((meta.get("samples") or {}).get("k", 1)) if opts.resume else max(1, opts.samples)
+        self.native_samples = False
+        if self.samples > 1:
+            # Con streaming cada muestra va en su propio request (el timing es de una sola respuesta);
+            # en batch el streaming no aplica
+            self.native_samples = bool(self.base_adapter.supports_n) and (self.batch or not opts.stream)
+            if self.native_samples:
+                self.model_cfg["params"]["n"] = self.samples
+            else:
+                self.adapter = self._sampled(self.adapter)
+            meta["samples"] = {"k": self.samples, "native": self.native_samples}
+
+        # Modo adaptativo: un run reanudado sigue con la config original y con lo ya evaluado
+        self.stopper: Optional[AdaptiveStopper] = None
+        adaptive = meta.get("adaptive") if opts.resume else None
+        if opts.adaptive and not opts.resume:
+            adaptive = {
+                "ci_width": opts.ci_width,
+                "confidence": opts.confidence,
+                "min_cases": opts.min_cases,
+                "scope": opts.adaptive_scope,
+                "reference": None,
+            }
+            if opts.reference:
+                adaptive["reference"] = str(load_reference(opts.reference, suite, opts.adaptive_scope)[0])
+        if adaptive is not None:
+            if self.batch:
+                raise ValueError("--adaptive no se puede combinar con --batch (el batch genera todos los casos de una vez)")
+            reference = load_reference(adaptive["reference"], suite, adaptive["scope"])[1] if adaptive["reference"] else None
+            self.stopper = AdaptiveStopper(
+                ci_width=adaptive["ci_width"],
+                confidence=adaptive["confidence"],
+                min_cases=adaptive["min_cases"],
+                scope=adaptive["scope"],
+                reference=reference,
+            )
+            if self.done:
+                for row in iter_jsonl(self.results_path):
+                    self.stopper.add(row)
+            meta["adaptive"] = {k: v for k, v in adaptive.items() if k != "tasks"}
+
+        meta["status"] = "running"
+        meta["catalog"] = dict(catalog.counters)
+        meta["startup_s"] = round(time.perf_counter() - t_start, 4)
+        write_meta(out_dir, meta)
+
+        self.n_new = 0
+        # Filas escritas por tarea en este run (las ya hechas están en `self.done`)
+        self.rows_by_task: Counter = Counter()
+        # Casos de este run cuya generación falló (filas con `error`)
+        self.n_errors = 0
+        self._t_run = 0.0
+
+    def _sampled(self, adapter: Any) -> Any:
+        """Envuelve `adapter` para pedir las muestras en requests paralelos (provider sin `n`)."""
+        if self.samples <= 1 or self.native_samples:
+            return adapter
+        return SampledAdapter(adapter, self.samples, max_workers=max(1, self.opts.concurrency) * (self.samples - 1))
+
+    def _job(self, spec: Any, evaluate: Callable[..., Dict[str, Any]], case: Dict[str, Any]) -> Optional[CaseJob]:
+        case_id = case.get("case_id")
+        if (str(spec.id), str(case_id)) in self.done:
+            return None
+        # Prompt con variables
+        with self.tracer.span("render", spec.id, case_id):
+            user_prompt = spec.render(case)
+        with self.tracer.span("hash", spec.id, case_id):
+            input_hash = sha256_text(user_prompt)
+        return CaseJob(task_id=spec.id, case=case, user_prompt=user_prompt, input_hash=input_hash, evaluate=evaluate)
+
+    def iter_jobs(self) -> Iterator[CaseJob]:
+        for job in self._iter_jobs():
+            if self.cancelled():
+                return
+            yield job
+
+    def _iter_jobs(self) -> Iterator[CaseJob]:
+        if self.stopper is not None:
+            yield from self._iter_adaptive_jobs()
+            return
+        # Los prompts se renderizan a demanda: memoria estable aunque la suite sea grande
+        for spec, evaluate in self.selected_specs:
+            for case in spec.cases.select(**self.selection):
+                job = self._job(spec, evaluate, case)
+                if job is not None:
+                    yield job
+
+    def _iter_adaptive_jobs(self) -> Iterator[CaseJob]:
+        """Casos de cada tarea en orden aleatorio, alternando entre tareas (todas avanzan a la par).
+
+        Una tarea detenida por el `AdaptiveStopper` no recibe más casos; los que ya estaban en vuelo
+        se terminan y cuentan.
+        """
+        assert self.stopper is not None
+        streams = deque((spec, evaluate, spec.cases.shuffled(**self.selection)) for spec, evaluate in self.selected_specs)
+        while streams:
+            spec, evaluate, cases = streams.popleft()
+            if self.stopper.stopped(spec.id):
+                continue
+            case = next(cases, None)
+            if case is None:
+                continue
+            streams.append((spec, evaluate, cases))
+            job = self._job(spec, evaluate, case)
+            if job is not None:
+                yield job
+
+    def _run_kwargs(self) -> Dict[str, Any]:
+        return dict(
+            adapter=self.adapter,
+            system=self.opts.system,
+            params=self.model_cfg["params"],
+            suite=self.opts.suite,
+            artifacts=self.artifacts,
+            concurrency=self.opts.concurrency,
+            eval_workers=self.opts.eval_workers,
+            # Con --adaptive cada fila debe llegar al stopper sin esperar a las de su lote
+            eval_batch=1 if self.stopper is not None else self.opts.eval_batch,
+            tracer=self.tracer,
+        )
+
+    def cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel()
+
+    def _check_cancel(self) -> None:
+        if self.cancelled():
+            raise RunCancelled(f"Run cancelado en {self.out_dir}")
+
+    def _write(self, writer: JsonlAppender, row: Dict[str, Any]) -> None:
+        self._check_cancel()
+        with self.tracer.span("serialize", row["task_id"], row["case_id"]):
+            writer.write(row)
+        self.rows_by_task[str(row["task_id"])] += 1
+        if row.get("error"):
+            self.n_errors += 1
+        if self.stopper is not None:
+            self.stopper.add(row)
+
+    def execute(self) -> Dict[str, Any]:
+        """Ejecuta el run (sync o `asyncio.run` según las opciones) y devuelve su meta."""
+        if self.batch:
+            return self.execute_batch()
+        if self.opts.use_async:
+            return asyncio.run(self.aexecute())
+        self._t_run = time.time()
+        # Cada fila se escribe y se hace flush apenas termina su caso
+        try:
+            with self.tracer.profiling(), JsonlAppender(self.results_path) as writer:
+                for row in run_jobs(self.iter_jobs(), **self._run_kwargs()):
+                    self._write(writer, row)
+                self.n_new = writer.rows
+        except RunCancelled:
+            self._abort()
+            raise
+        return self._finish()
+
+    async def aexecute(self) -> Dict[str, Any]:
+        """Ejecuta el run en el event loop actual (permite varios runs en un mismo loop)."""
+        if self.batch:
+            # El polling del batch es bloqueante: va a un thread para no frenar a otros runs del loop
+            return await asyncio.to_thread(self.execute_batch)
+        self._t_run = time.time()
+        try:
+            with self.tracer.profiling(), JsonlAppender(self.results_path) as writer:
+                try:
+                    async for row in arun_jobs(self.iter_jobs(), **self._run_kwargs()):
+                        self._write(writer, row)
+                finally:
+                    await self.adapter.aclose()
+                self.n_new = writer.rows
+        except RunCancelled:
+            self._abort()
+            raise
+        return self._finish()
+
+    def _cached(self, job: CaseJob) -> bool:
+        if self.cache is None:
+            return False
+        key = cache_key(
+            provider=self.model_cfg["provider"],
+            params=self.model_cfg["params"],
+            system=self.opts.system,
+            input_hash=job.input_hash,
+        )
+        return self.cache.contains(key)
+
+    def execute_batch(self) -> Dict[str, Any]:
+        """Genera todos los casos con la batch API del provider y luego evalúa como un run normal.
+
+        Los casos ya presentes en el cache no se envían; los que el batch no resuelva (errores,
+        batch expirado) se generan en forma interactiva con el adapter habitual.
+        """
+        self._t_run = time.time()
+        with self.tracer.profiling():
+            return self._execute_batch()
+
+    def _execute_batch(self) -> Dict[str, Any]:
+        jobs = list(self.iter_jobs())
+        to_send = [job for job in jobs if not self._cached(job)]
+        results = {}
+        if to_send:
+            results = run_batch(
+                self.base_adapter,
+                to_send,
+                system=self.opts.system,
+                params=self.model_cfg["params"],
+                out_dir=self.out_dir,
+                poll_s=self.opts.batch_poll_s,
+            )
+
+        served = BatchResultsAdapter(self._uncached_adapter, results_by_prompt(to_send, results))
+        adapter: Any = served
+        if self.cache is not None:
+            adapter = CachingAdapter(served, self.cache, provider=self.model_cfg["provider"])
+        adapter = self._sampled(adapter)
+        try:
+            with JsonlAppender(self.results_path) as writer:
+                for row in run_jobs(jobs, **{**self._run_kwargs(), "adapter": adapter}):
+                    self._write(writer, row)
+                self.n_new = writer.rows
+        except RunCancelled:
+            self._abort()
+            raise
+        self.meta["batch"].update(
+            {"requests": len(to_send), "from_batch": served.served, "interactive_fallback": served.fallback}
+        )
+        return self._finish()
+
+    def _abort(self) -> None:
+        """Cierra adapter, cache y store de un run cancelado sin tocar su run_meta.json."""
+        self.adapter.close()
+        if self.cache is not None:
+            self.cache.close()
+        self.artifacts.close()
+        self.tracer.close()
+
+    def _record_case_counts(self) -> None:
+        """Completa los `cases` desconocidos de `meta["tasks"]` con las filas del run terminado y
+        guarda en el catálogo la cantidad de casos de las tareas cuya selección fue el archivo entero."""
+        if self.stopper is not None:
+            return
+        rows = Counter(task_id for task_id, _ in self.done) + self.rows_by_task
+        whole_file = all(self.selection[k] is None for k in ("max_cases", "shard", "sample"))
+        for t, (spec, _) in zip(self.meta["tasks"], self.selected_specs):
+            if t["cases"] is None:
+                t["cases"] = rows[str(spec.id)]
+            self.catalog.remember_cases(spec, rows[str(spec.id)] if whole_file else None)
+
+    def _finish(self) -> Dict[str, Any]:
+        meta = self.meta
+        meta["wall_time_s"] = round(time.time() - self._t_run, 3)
+        meta["adapter_stats"] = self.adapter.stats()
+        meta["rate_limit"] = {"key": self.model_cfg["rate_limit_key"], **self.scheduler.stats()}
+        self.adapter.close()
+        if self.cache is not None:
+            self.cache.evict()
+            meta["cache"] = self.cache.stats()
+            self.cache.close()
+
+        self.artifacts.close()
+        meta["artifacts"]["stats"] = self.artifacts.stats()
+        if self.stopper is not None:
+            meta["adaptive"]["tasks"] = self.stopper.summary()
+        self.tracer.close()
+        if self.tracer.enabled:
+            meta["stages"] = self.tracer.summary()
+        if self.opts.trace:
+            meta["trace"] = str(self.opts.trace)
+        if self.opts.profile:
+            meta["profile"] = "profile.pstats"
+
+        # Cancelado justo al final: el run queda "running" (otro proceso puede estar reanudándolo)
+        self._check_cancel()
+        self._record_case_counts()
+        meta["status"] = "completed"
+        meta["cases_done"] = len(self.done) + self.n_new
+        meta["cases_failed"] = meta.get("cases_failed", 0) + self.n_errors
+        meta["columns_sidecar"] = export_run(self.out_dir).name
+        write_meta(self.out_dir, meta)
+        return meta
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Runner de suites para comparar modelos")
+    ap.add_argument("--model", default=None, help="Id del modelo en models/registry.yml")
+    ap.add_argument("--suite", default=None, help="Nombre de suite (carpeta en suites/)")
+    add_run_args(ap)
+    ap.add_argument(
+        "--resume",
+        default=None,
+        metavar="RUN_DIR",
+        help="Continúa un run interrumpido: omite los (task_id, case_id) ya presentes en su results.jsonl",
+    )
+    ap.add_argument(
+        "--stage-times",
+        action="store_true",
+        help="Guarda en run_meta.json el tiempo por etapa (render, hash, generate, artifact_dir, evaluate, artifact_store, serialize)",
+    )
+    ap.add_argument(
+        "--trace",
+        default=None,
+        metavar="OUT_JSON",
+        help="Escribe un trace de Chrome con un span por etapa y caso (abrir en chrome://tracing o ui.perfetto.dev)",
+    )
+    ap.add_argument("--profile", action="store_true", help="Guarda un perfil cProfile del run en <run>/profile.pstats")
+
+    args = ap.parse_args()
+
+    if args.resume:
+        meta_path = Path(args.resume) / "run_meta.json"
+        if not meta_path.exists():
+            ap.error(f"--resume: no existe {meta_path}")
+        resume_meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        for field, value in (("model", resume_meta["model"]["id"]), ("suite", resume_meta["suite"])):
+            given = getattr(args, field)
+            if given is not None and given != value:
+                ap.error(f"--resume: el run es de --{field} {value}, no {given}")
+            setattr(args, field, value)
+    if not args.model or not args.suite:
+        ap.error("--model y --suite son requeridos (salvo con --resume)")
+    if args.artifacts_db and args.artifacts != "sqlite":
+        ap.error("--artifacts-db requiere --artifacts sqlite")
 
-    # Guardar artifacts
-    (out_dir / "run_meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
-    write_jsonl(str(out_dir / "results.jsonl"), all_results)
+    run = SuiteRun(RunOptions.from_args(args))
+    run.execute()
 
-    print(f"Run guardado en: {out_dir}")
-    print(f"Resultados: {len(all_results)} casos")
+    print(f"Run guardado en: {run.out_dir}")
+    if run.opts.trace:
+        print(f"Trace: {run.opts.trace}")
+    if run.opts.profile:
+        print(f"Perfil: python -m pstats {run.out_dir / 'profile.pstats'}")
+    if run.done:
+        print(f"Resultados: {run.n_new} casos nuevos ({len(run.done)} ya existentes)")
+    else:
+        print(f"Resultados: {run.n_new} casos")
+    for key, st in (run.meta.get("adaptive") or {}).get("tasks", {}).items():
+        print(f"Adaptativo {key}: {st['cases_used']} casos, {st['reason']}")
     return 0
 
 
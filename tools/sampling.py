@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+from models.adapters.base import BaseAdapter, GenResult
+
+
+# Parámetro que distingue las muestras de un caso cuando van en requests separados. Ningún adapter
+# lo envía al provider, pero entra en la clave del cache de respuestas (ver SampledAdapter)
+SAMPLE_PARAM = "sample_index"
+
+
+def combine_samples(gens: List[GenResult]) -> GenResult:
+    """Une las respuestas de varios requests de un mismo caso en un GenResult con `texts`.
+
+    El uso se suma (es lo que costó el caso) y la latencia es la del request más lento, que es lo
+    que esperó el caso con los requests en paralelo. Las muestras servidas del cache no cuentan
+    para la latencia; si todas vienen del cache, el resultado también (`source`).
+    """
+    usage: Dict[str, Any] = {}
+    for key in gens[0].usage or {}:
+        values = [g.usage.get(key) for g in gens if g.usage and g.usage.get(key) is not None]
+        usage[key] = sum(values) if values else None
+    live = [g for g in gens if g.source is None]
+    latencies = [g.latency_ms for g in live if g.latency_ms is not None]
+    sources = {g.source for g in gens}
+    texts = [t for g in gens for t in (g.texts or [g.text])]
+    return GenResult(
+        text=texts[0],
+        usage=usage,
+        latency_ms=max(latencies) if latencies else None,
+        timing=live[0].timing if live else gens[0].timing,
+        texts=texts,
+        source=sources.pop() if len(sources) == 1 else None,
+    )
+
+
+class SampledAdapter(BaseAdapter):
+    """`k` muestras por caso con adapters sin `n` nativo: k requests en paralelo, un solo GenResult.
+
+    La muestra i > 0 lleva `params.sample_index = i`, así el cache guarda cada muestra por separado
+    y la muestra 0 comparte entrada con un run sin `--samples`.
+    """
+
+    def __init__(self, inner: BaseAdapter, k: int, *, max_workers: int) -> None:
+        self.inner = inner
+        self.k = k
+        # Las muestras 1..k-1 van al pool; la 0 corre en el thread que llama
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="sample")
+
+    @staticmethod
+    def _params(params: Dict[str, Any], i: int) -> Dict[str, Any]:
+        return params if i == 0 else {**params, SAMPLE_PARAM: i}
+
+    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        futures = [
+            self._pool.submit(self.inner.generate, system=system, user=user, params=self._params(params, i))
+            for i in range(1, self.k)
+        ]
+        first = self.inner.generate(system=system, user=user, params=params)
+        return combine_samples([first] + [f.result() for f in futures])
+
+    async def agenerate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        gens = await asyncio.gather(
+            *(self.inner.agenerate(system=system, user=user, params=self._params(params, i)) for i in range(self.k))
+        )
+        return combine_samples(list(gens))
+
+    def stats(self) -> Dict[str, Any]:
+        return self.inner.stats()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        self.inner.close()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def _pass_at_k(n: int, c: int, k: int) -> float:
+    if n - c < k:
+        return 1.0
+    # 1 - C(n-c, k) / C(n, k) como producto, sin números combinatorios enormes
+    return 1.0 - float(np.prod(1.0 - k / np.arange(n - c + 1, n + 1)))
+
+
+def pass_at_k(n: np.ndarray, c: np.ndarray, k: int) -> np.ndarray:
+    """Estimador insesgado de pass@k por caso (Chen et al., 2021) con `n` muestras y `c` correctas.
+
+    NaN en los casos con menos de `k` muestras. Se calcula una vez por par (n, c) distinto: en un
+    run típico todos los casos tienen el mismo n y c va de 0 a n.
+    """
+    n = np.asarray(n, dtype=np.int64)
+    c = np.asarray(c, dtype=np.int64)
+    out = np.full(len(n), np.nan)
+    ok = n >= k
+    if not ok.any():
+        return out
+    pairs, inverse = np.unique(np.stack([n[ok], c[ok]], axis=1), axis=0, return_inverse=True)
+    values = np.array([_pass_at_k(int(pn), int(pc), k) for pn, pc in pairs])
+    out[ok] = values[inverse.reshape(-1)]
+    return out
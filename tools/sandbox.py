@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+DEFAULT_PYTEST_ARGS = ["-q", "-p", "no:cacheprovider"]
+MAX_OUTPUT_BYTES = 1024 * 1024
+
+
+@dataclass
+class SandboxResult:
+    returncode: int
+    output: str
+    duration_ms: int
+    timed_out: bool = False
+
+    @property
+    def passed(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+# ---------------------------------------------------------------------------
+# Ejecución aislada sin pool (fallback y referencia para el benchmark)
+# ---------------------------------------------------------------------------
+
+
+def run_pytest_subprocess(workdir: str, *, timeout_s: float = 20.0, args: Optional[List[str]] = None) -> SandboxResult:
+    """Un `python -m pytest` nuevo por caso (paga arranque del intérprete y de pytest)."""
+    t0 = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "pytest", *(args or ["-q"])],
+            cwd=workdir,
+            capture_output=True,
+            text=True,
+            timeout=timeout_s,
+        )
+        out = (proc.stdout or "") + "\n" + (proc.stderr or "")
+        return SandboxResult(proc.returncode, out, int((time.perf_counter() - t0) * 1000))
+    except subprocess.TimeoutExpired:
+        return SandboxResult(-1, f"Timeout tras {timeout_s}s", int((time.perf_counter() - t0) * 1000), timed_out=True)
+
+
+# ---------------------------------------------------------------------------
+# Zygote: proceso pre-calentado (pytest importado) que hace fork por caso
+# ---------------------------------------------------------------------------
+
+
+def _apply_limits(req: Dict[str, Any]) -> None:
+    import resource
+
+    memory_mb = req.get("memory_mb")
+    if memory_mb:
+        b = int(memory_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (b, b))
+    cpu_s = req.get("cpu_s")
+    if cpu_s:
+        resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_s), int(cpu_s) + 1))
+    fsize_mb = req.get("fsize_mb")
+    if fsize_mb:
+        b = int(fsize_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_FSIZE, (b, b))
+
+
+def _child(req: Dict[str, Any], out_fd: int, private_fds: Tuple[int, ...]) -> None:
+    """Corre en el hijo del fork: nunca retorna.
+
+    `private_fds` son fds del zygote (el pipe del protocolo) que el código candidato no debe ver.
+    """
+    code = 99
+    try:
+        os.setsid()
+        for fd in private_fds:
+            os.close(fd)
+        # stdin del zygote es el pipe de requests: el caso lee de /dev/null (también lo ya bufferizado)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
+        sys.stdin = open(0, "r", closefd=False)
+        os.dup2(out_fd, 1)
+        os.dup2(out_fd, 2)
+        _apply_limits(req)
+        workdir = req["workdir"]
+        os.chdir(workdir)
+        sys.path.insert(0, workdir)
+
+        import pytest
+
+        code = int(pytest.main(list(req.get("args") or DEFAULT_PYTEST_ARGS)))
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _run_forked(req: Dict[str, Any], private_fds: Tuple[int, ...] = ()) -> Dict[str, Any]:
+    out_fd, out_path = tempfile.mkstemp(prefix="sandbox_", suffix=".txt")
+    t0 = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        _child(req, out_fd, private_fds)
+    os.close(out_fd)
+
+    deadline = t0 + float(req.get("timeout_s") or 20.0)
+    timed_out = False
+    pause = 0.0005
+    while True:
+        wpid, status = os.waitpid(pid, os.WNOHANG)
+        if wpid:
+            break
+        if time.perf_counter() > deadline:
+            timed_out = True
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            _, status = os.waitpid(pid, 0)
+            break
+        time.sleep(pause)
+        pause = min(pause * 2, 0.01)
+    # Limpia procesos que el código candidato haya dejado vivos
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+    with open(out_path, "rb") as f:
+        output = f.read(MAX_OUTPUT_BYTES).decode("utf-8", errors="replace")
+    os.unlink(out_path)
+    if timed_out:
+        output += f"\nTimeout tras {req.get('timeout_s')}s"
+    return {
+        "returncode": os.waitstatus_to_exitcode(status),
+        "output": output,
+        "duration_ms": int((time.perf_counter() - t0) * 1000),
+        "timed_out": timed_out,
+    }
+
+
+def _prewarm() -> None:
+    # Una colección en seco importa pytest y sus plugins; los hijos del fork los heredan
+    import pytest
+
+    with tempfile.TemporaryDirectory(prefix="sandbox_warm_") as d:
+        Path(d, "test_warm.py").write_text("def test_warm():\n    assert True\n", encoding="utf-8")
+        pytest.main(["--collect-only", *DEFAULT_PYTEST_ARGS, d])
+
+
+def _zygote_main() -> int:
+    # stdout queda reservado al protocolo (JSON por línea); todo lo demás va a /dev/null
+    proto = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    sys.dont_write_bytecode = True
+
+    _prewarm()
+    proto.write(json.dumps({"ready": True}) + "\n")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            res = _run_forked(json.loads(line), (proto.fileno(),))
+        except Exception as e:
+            res = {"returncode": -1, "output": f"Sandbox error: {e}", "duration_ms": 0, "timed_out": False}
+        proto.write(json.dumps(res) + "\n")
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Pool (lado del evaluador)
+# ---------------------------------------------------------------------------
+
+
+class _Zygote:
+    def __init__(self) -> None:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (str(REPO_ROOT), env.get("PYTHONPATH")) if p)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "tools.sandbox", "--zygote"],
+            cwd=str(REPO_ROOT),
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        ready = self.proc.stdout.readline() if self.proc.stdout else ""
+        if not ready:
+            raise RuntimeError("No se pudo iniciar el worker del sandbox")
+
+    def request(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        assert self.proc.stdin and self.proc.stdout
+        self.proc.stdin.write(json.dumps(req) + "\n")
+        self.proc.stdin.flush()
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError("El worker del sandbox terminó inesperadamente")
+        return json.loads(line)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self) -> None:
+        if self.alive():
+            try:
+                if self.proc.stdin:
+                    self.proc.stdin.close()
+                self.proc.wait(timeout=5)
+            except Exception:
+                self.proc.kill()
+
+
+class SandboxPool:
+    """Pool de workers pre-calentados para ejecutar tests de código generado.
+
+    Cada worker es un proceso con pytest ya importado que hace `fork` por caso: el hijo
+    importa `solution.py` del workdir, corre los tests con límites de memoria/CPU y muere,
+    así que ningún caso contamina al siguiente. Se ahorra arranque del intérprete,
+    importación de pytest y descubrimiento de plugins en cada caso.
+    """
+
+    def __init__(self, size: Optional[int] = None) -> None:
+        self.size = size or os.cpu_count() or 1
+        self._idle: "queue.Queue[_Zygote]" = queue.Queue()
+        self._all: List[_Zygote] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Zygote:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                z = _Zygote()
+                self._all.append(z)
+                return z
+        return self._idle.get()
+
+    def _release(self, z: _Zygote) -> None:
+        if z.alive():
+            self._idle.put(z)
+            return
+        with self._lock:
+            self._all.remove(z)
+
+    def run_pytest(
+        self,
+        workdir: str,
+        *,
+        timeout_s: float = 20.0,
+        memory_mb: Optional[int] = 1024,
+        cpu_s: Optional[int] = None,
+        args: Optional[List[str]] = None,
+    ) -> SandboxResult:
+        req = {
+            "workdir": str(Path(workdir).resolve()),
+            "timeout_s": timeout_s,
+            "memory_mb": memory_mb,
+            "cpu_s": cpu_s or int(timeout_s) + 1,
+            "fsize_mb": 64,
+            "args": args or DEFAULT_PYTEST_ARGS,
+        }
+        z = self._acquire()
+        try:
+            res = z.request(req)
+        except Exception as e:
+            z.close()
+            res = {"returncode": -1, "output": f"Sandbox error: {e}", "duration_ms": 0, "timed_out": False}
+        finally:
+            self._release(z)
+        return SandboxResult(**res)
+
+    def close(self) -> None:
+        with self._lock:
+            zs, self._all = self._all, []
+        for z in zs:
+            z.close()
+
+
+_POOL: Optional[SandboxPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> SandboxPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SandboxPool()
+            atexit.register(_POOL.close)
+        return _POOL
+
+
+def run_pytest(workdir: str, *, timeout_s: float = 20.0, memory_mb: Optional[int] = 1024) -> SandboxResult:
+    """Corre pytest en `workdir` usando el pool compartido (o un subprocess si no hay fork)."""
+    if not hasattr(os, "fork"):
+        return run_pytest_subprocess(workdir, timeout_s=timeout_s)
+    return get_pool().run_pytest(workdir, timeout_s=timeout_s, memory_mb=memory_mb)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark: pool vs. subprocess por caso
+# ---------------------------------------------------------------------------
+
+_BENCH_SOLUTION = """
+import re
+
+def is_palindrome(s):
+    if s is None:
+        return False
+    cleaned = re.sub(r'[^0-9a-zA-Z]+', '', s).lower()
+    return cleaned == cleaned[::-1]
+"""
+
+_BENCH_TESTS = """
+import pytest
+from solution import is_palindrome
+
+@pytest.mark.parametrize("s, expected", [("Anita lava la tina", True), ("abc", False), (None, False)])
+def test_is_palindrome(s, expected):
+    assert is_palindrome(s) is expected
+"""
+
+
+def _bench(n: int, workers: int) -> Dict[str, Any]:
+    from concurrent.futures import ThreadPoolExecutor
+
+    with tempfile.TemporaryDirectory(prefix="sandbox_bench_") as root:
+        dirs = []
+        for i in range(n):
+            d = Path(root, f"case_{i}")
+            d.mkdir()
+            d.joinpath("solution.py").write_text(_BENCH_SOLUTION, encoding="utf-8")
+            d.joinpath("test_solution.py").write_text(_BENCH_TESTS, encoding="utf-8")
+            dirs.append(str(d))
+
+        out: Dict[str, Any] = {"cases": n, "workers": workers}
+
+        def timed(fn) -> Dict[str, Any]:
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                results = list(ex.map(fn, dirs))
+            dt = time.perf_counter() - t0
+            return {"wall_s": round(dt, 3), "cases_per_s": round(n / dt, 2), "passed": sum(r.passed for r in results)}
+
+        out["subprocess"] = timed(lambda d: run_pytest_subprocess(d))
+        pool = SandboxPool(size=workers)
+        try:
+            # El arranque de los workers se mide aparte (se paga una vez por proceso)
+            t0 = time.perf_counter()
+            warm = [pool._acquire() for _ in range(workers)]
+            for z in warm:
+                pool._release(z)
+            out["pool_startup_s"] = round(time.perf_counter() - t0, 3)
+            out["pool"] = timed(lambda d: pool.run_pytest(d))
+        finally:
+            pool.close()
+        out["speedup"] = round(out["subprocess"]["wall_s"] / max(1e-9, out["pool"]["wall_s"]), 2)
+        return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Sandbox de ejecución de tests (pool pre-calentado)")
+    ap.add_argument("--zygote", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--bench", type=int, default=None, metavar="N", help="Compara pool vs. subprocess con N casos")
+    ap.add_argument("--workers", type=int, default=1, help="Workers/threads para el benchmark")
+    args = ap.parse_args()
+
+    if args.zygote:
+        return _zygote_main()
+    if args.bench:
+        print(json.dumps(_bench(args.bench, args.workers), indent=2))
+        return 0
+    ap.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
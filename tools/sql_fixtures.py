@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.utils import read_text
+
+
+class QueryTimeout(Exception):
+    """La consulta superó su tiempo máximo y fue interrumpida."""
+
+
+class SQLiteFixture:
+    """Base de datos semilla construida una sola vez por proceso a partir de un `schema.sql`.
+
+    - `connect()`: copia aislada en memoria vía backup API (el caso puede modificarla).
+    - `connect_readonly()`: conexión inmutable de solo lectura sobre un archivo temporal (sin copia).
+    """
+
+    def __init__(self, schema_path: str) -> None:
+        self.schema_path = schema_path
+        self._lock = threading.Lock()
+        self._src = sqlite3.connect(":memory:", check_same_thread=False)
+        self._src.executescript(read_text(schema_path))
+        self._src.commit()
+        self._ro_path: Optional[str] = None
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(":memory:")
+        with self._lock:
+            self._src.backup(conn)
+        return conn
+
+    def connect_readonly(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._ro_path is None:
+                fd, path = tempfile.mkstemp(prefix="fixture_", suffix=".sqlite")
+                os.close(fd)
+                dst = sqlite3.connect(path)
+                self._src.backup(dst)
+                dst.close()
+                self._ro_path = path
+        return sqlite3.connect(f"file:{self._ro_path}?mode=ro&immutable=1", uri=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._src.close()
+            if self._ro_path and os.path.exists(self._ro_path):
+                os.unlink(self._ro_path)
+            self._ro_path = None
+
+
+_FIXTURES: Dict[Tuple[str, int, int], SQLiteFixture] = {}
+_FIXTURES_LOCK = threading.Lock()
+
+
+def get_fixture(schema_path: str) -> SQLiteFixture:
+    """Fixture cacheado por proceso; se reconstruye si `schema_path` cambia (mtime/tamaño)."""
+    p = Path(schema_path).resolve()
+    st = p.stat()
+    key = (str(p), st.st_mtime_ns, st.st_size)
+    with _FIXTURES_LOCK:
+        fx = _FIXTURES.get(key)
+        if fx is None:
+            for old in [k for k in _FIXTURES if k[0] == key[0]]:
+                _FIXTURES.pop(old).close()
+            fx = SQLiteFixture(str(p))
+            _FIXTURES[key] = fx
+        return fx
+
+
+def run_query(
+    conn: sqlite3.Connection,
+    sql: str,
+    *,
+    timeout_s: float = 5.0,
+    max_rows: Optional[int] = 100_000,
+    check_every: int = 10_000,
+) -> List[Tuple[Any, ...]]:
+    """Ejecuta `sql` con un tiempo máximo (progress handler de SQLite).
+
+    Evita que una consulta desbocada generada por el modelo (p.ej. un cross join) frene el run.
+    """
+    deadline = time.perf_counter() + timeout_s
+    conn.set_progress_handler(lambda: 1 if time.perf_counter() > deadline else 0, check_every)
+    try:
+        cur = conn.execute(sql)
+        return cur.fetchmany(max_rows) if max_rows is not None else cur.fetchall()
+    except sqlite3.OperationalError as e:
+        if "interrupted" in str(e):
+            raise QueryTimeout(f"La consulta superó {timeout_s}s") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from models.adapters.base import BaseAdapter, GenResult
+
+
+class ConcurrencyLimit:
+    """Tope de requests simultáneos compartido por varios adapters (p.ej. todos los de un provider).
+
+    Sirve tanto para `generate` (threads) como para `agenerate` (un semáforo por event loop).
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, int(limit))
+        self._sem = threading.BoundedSemaphore(self.limit)
+        self._async_sems: Dict[int, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        self._sem.acquire()
+
+    def release(self) -> None:
+        self._sem.release()
+
+    def async_semaphore(self) -> asyncio.Semaphore:
+        key = id(asyncio.get_running_loop())
+        with self._lock:
+            sem = self._async_sems.get(key)
+            if sem is None:
+                sem = asyncio.Semaphore(self.limit)
+                self._async_sems[key] = sem
+            return sem
+
+
+class LimitedAdapter(BaseAdapter):
+    """Envuelve un adapter y respeta un `ConcurrencyLimit` compartido."""
+
+    def __init__(self, inner: BaseAdapter, limit: ConcurrencyLimit) -> None:
+        self.inner = inner
+        self.limit = limit
+
+    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        self.limit.acquire()
+        try:
+            return self.inner.generate(system=system, user=user, params=params)
+        finally:
+            self.limit.release()
+
+    async def agenerate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        async with self.limit.async_semaphore():
+            return await self.inner.agenerate(system=system, user=user, params=params)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.inner.stats()
+
+    def close(self) -> None:
+        self.inner.close()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting por provider: token buckets (rpm/tpm), reintentos y concurrencia adaptativa
+# ---------------------------------------------------------------------------
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Concurrencia inicial sin `initial_concurrency` en la config
+DEFAULT_INITIAL_CONCURRENCY = 8
+# Reintentos propios del SDK del adapter (OpenAI): en 0 bajo el scheduler, que es quien reintenta
+SDK_RETRIES_PARAM = "sdk_max_retries"
+
+
+def _status_code(e: BaseException) -> Optional[int]:
+    for attr in ("status_code", "status"):
+        v = getattr(e, attr, None)
+        if isinstance(v, int):
+            return v
+    resp = getattr(e, "response", None)
+    v = getattr(resp, "status_code", None)
+    return v if isinstance(v, int) else None
+
+
+def is_rate_limit_error(e: BaseException) -> bool:
+    return _status_code(e) == 429 or "RateLimit" in type(e).__name__
+
+
+def is_retryable_error(e: BaseException) -> bool:
+    if is_rate_limit_error(e):
+        return True
+    if _status_code(e) in RETRYABLE_STATUS:
+        return True
+    name = type(e).__name__
+    return any(k in name for k in ("Timeout", "APIConnectionError", "ServiceUnavailable", "InternalServerError"))
+
+
+def retry_after_s(e: BaseException) -> Optional[float]:
+    """Lee `Retry-After` (segundos) de la respuesta HTTP del error, si existe."""
+    resp = getattr(e, "response", None)
+    headers = getattr(resp, "headers", None)
+    if not headers:
+        return None
+    try:
+        v = headers.get("retry-after")
+        return float(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket con "deuda": `reserve` consume de inmediato y devuelve cuánto esperar.
+
+    Así cada caller duerme exactamente lo necesario (sin polling) y el orden de llegada se respeta.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None) -> None:
+        self.rate = float(per_minute) / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self._tokens = self.capacity
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rate)
+        self._t = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class AdaptiveConcurrency:
+    """Límite de concurrencia AIMD: +1 tras `limit` éxitos seguidos, mitad ante un 429.
+
+    Los slots liberados se entregan directamente al siguiente en espera (thread o corutina),
+    sin polling.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1) -> None:
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.limit = float(min(self.maximum, max(self.minimum, int(initial))))
+        self.peak = int(self.limit)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._waiters: Deque[Any] = deque()
+
+    def _admit(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def enter(self) -> None:
+        with self._lock:
+            if not self._waiters and self._admit():
+                return
+            ev = threading.Event()
+            self._waiters.append(ev)
+        ev.wait()
+
+    async def aenter(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._admit():
+                return
+            fut: "asyncio.Future[None]" = loop.create_future()
+            self._waiters.append((loop, fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, fut))
+                except ValueError:
+                    pass
+            raise
+
+    def exit(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_locked()
+
+    def _wake_locked(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            w = self._waiters.popleft()
+            self.in_flight += 1
+            if isinstance(w, threading.Event):
+                w.set()
+            else:
+                loop, fut = w
+                loop.call_soon_threadsafe(self._deliver, fut)
+
+    def _deliver(self, fut: "asyncio.Future[None]") -> None:
+        if fut.cancelled():
+            self.exit()  # el slot ya estaba asignado: se devuelve
+        else:
+            fut.set_result(None)
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.limit < self.maximum:
+                self.limit = min(self.maximum, self.limit + 1.0 / max(1.0, self.limit))
+                self.peak = max(self.peak, int(self.limit))
+                self._wake_locked()
+
+    def on_rate_limit(self) -> None:
+        with self._lock:
+            self.limit = max(float(self.minimum), self.limit / 2.0)
+
+
+class RateLimitScheduler:
+    """Scheduler de un provider/cuenta: rpm/tpm, reintentos con backoff y concurrencia adaptativa.
+
+    Config (sección `rate_limits` o `rate_limit` del modelo en `models/registry.yml`):
+    `rpm`, `tpm`, `max_concurrency`, `initial_concurrency`, `max_retries`, `backoff_base_s`, `backoff_max_s`.
+    """
+
+    def __init__(self, cfg: Dict[str, Any], *, default_concurrency: int = 1000) -> None:
+        self.cfg = dict(cfg)
+        self.rpm = TokenBucket(cfg["rpm"]) if cfg.get("rpm") else None
+        self.tpm = TokenBucket(cfg["tpm"]) if cfg.get("tpm") else None
+        maximum = int(cfg.get("max_concurrency") or default_concurrency)
+        # Arranca bajo y sube de a uno: el primer 429 llega con una ráfaga chica, no con el máximo
+        initial = int(cfg.get("initial_concurrency") or min(maximum, DEFAULT_INITIAL_CONCURRENCY))
+        self.concurrency = AdaptiveConcurrency(initial, maximum)
+        self.max_retries = int(cfg.get("max_retries", 6))
+        self.backoff_base_s = float(cfg.get("backoff_base_s", 0.5))
+        self.backoff_max_s = float(cfg.get("backoff_max_s", 60.0))
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "throttle_wait_s": 0.0,
+            "backoff_wait_s": 0.0,
+        }
+
+    def _bump(self, field: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[field] += amount
+
+    @staticmethod
+    def estimate_tokens(system: str, user: str, params: Dict[str, Any]) -> int:
+        # ~4 caracteres por token + el máximo de salida de cada una de las n respuestas (así cuentan
+        # los providers el tpm)
+        return (len(system) + len(user)) // 4 + int(params.get("max_tokens", 1200)) * int(params.get("n") or 1)
+
+    def budget_wait(self, tokens: int) -> float:
+        wait = 0.0
+        if self.rpm is not None:
+            wait = max(wait, self.rpm.reserve(1))
+        if self.tpm is not None:
+            wait = max(wait, self.tpm.reserve(tokens))
+        if wait > 0:
+            self._bump("throttle_wait_s", wait)
+        return wait
+
+    def settle_tokens(self, reserved: int, gen: GenResult) -> None:
+        """Devuelve al bucket tpm lo reservado de más según el uso real."""
+        if self.tpm is None or not gen.usage:
+            return
+        used = (gen.usage.get("input_tokens") or 0) + (gen.usage.get("output_tokens") or 0)
+        if used and used < reserved:
+            self.tpm.refund(reserved - used)
+
+    def backoff(self, attempt: int, e: BaseException) -> float:
+        """Backoff exponencial con full jitter; respeta Retry-After si el provider lo envía."""
+        ra = retry_after_s(e)
+        cap = min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt))
+        delay = max(ra or 0.0, random.uniform(0, cap))
+        self._bump("backoff_wait_s", delay)
+        return delay
+
+    def on_error(self, e: BaseException, attempt: int) -> bool:
+        """Registra el error; True si corresponde reintentar."""
+        if is_rate_limit_error(e):
+            self._bump("rate_limited")
+            self.concurrency.on_rate_limit()
+        if attempt < self.max_retries and is_retryable_error(e):
+            self._bump("retries")
+            return True
+        self._bump("failed")
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.counters)
+        out["throttle_wait_s"] = round(out["throttle_wait_s"], 3)
+        out["backoff_wait_s"] = round(out["backoff_wait_s"], 3)
+        out["concurrency_limit"] = int(self.concurrency.limit)
+        out["concurrency_peak"] = self.concurrency.peak
+        out["config"] = self.cfg
+        return out
+
+
+_SCHEDULERS: Dict[str, RateLimitScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_scheduler(key: str, cfg: Dict[str, Any], *, default_concurrency: int = 1000) -> RateLimitScheduler:
+    """Scheduler compartido por proceso para `key` (todos los modelos de la misma cuenta/provider)."""
+    with _SCHEDULERS_LOCK:
+        sched = _SCHEDULERS.get(key)
+        if sched is None:
+            sched = RateLimitScheduler(cfg, default_concurrency=default_concurrency)
+            _SCHEDULERS[key] = sched
+        return sched
+
+
+class RateLimitedAdapter(BaseAdapter):
+    """Envuelve un adapter con un `RateLimitScheduler`: espera presupuesto, limita y reintenta.
+
+    Apaga los reintentos propios del SDK (`sdk_max_retries = 0`): si el SDK absorbiera los 429,
+    el backoff y la concurrencia adaptativa nunca verían el throttling real del provider.
+    """
+
+    def __init__(self, inner: BaseAdapter, scheduler: RateLimitScheduler) -> None:
+        self.inner = inner
+        self.scheduler = scheduler
+
+    @staticmethod
+    def _params(params: Dict[str, Any]) -> Dict[str, Any]:
+        return {**params, SDK_RETRIES_PARAM: 0}
+
+    def generate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        sched = self.scheduler
+        tokens = sched.estimate_tokens(system, user, params)
+        attempt = 0
+        while True:
+            # La espera por presupuesto (rpm/tpm), igual que el backoff, fuera del slot de concurrencia:
+            # un request que espera su turno no le quita el lugar a otro que ya puede salir
+            wait = sched.budget_wait(tokens)
+            if wait > 0:
+                time.sleep(wait)
+            sched.concurrency.enter()
+            try:
+                sched._bump("requests")
+                gen = self.inner.generate(system=system, user=user, params=self._params(params))
+            except Exception as e:
+                retry = sched.on_error(e, attempt)
+                if not retry:
+                    raise
+                delay = sched.backoff(attempt, e)
+            else:
+                sched.concurrency.on_success()
+                sched.settle_tokens(tokens, gen)
+                return gen
+            finally:
+                sched.concurrency.exit()
+            # El backoff se duerme fuera del slot de concurrencia
+            time.sleep(delay)
+            attempt += 1
+
+    async def agenerate(self, *, system: str, user: str, params: Dict[str, Any]) -> GenResult:
+        sched = self.scheduler
+        tokens = sched.estimate_tokens(system, user, params)
+        attempt = 0
+        while True:
+            wait = sched.budget_wait(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await sched.concurrency.aenter()
+            try:
+                sched._bump("requests")
+                gen = await self.inner.agenerate(system=system, user=user, params=self._params(params))
+            except Exception as e:
+                retry = sched.on_error(e, attempt)
+                if not retry:
+                    raise
+                delay = sched.backoff(attempt, e)
+            else:
+                sched.concurrency.on_success()
+                sched.settle_tokens(tokens, gen)
+                return gen
+            finally:
+                sched.concurrency.exit()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return self.inner.stats()
+
+    def close(self) -> None:
+        self.inner.close()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, ContextManager, Dict, Iterator, List, Optional, Set
+
+# Etapas por caso instrumentadas en run_suite, en orden
+STAGES = ("render", "hash", "generate", "artifact_dir", "evaluate", "artifact_store", "serialize")
+
+_NULL = contextlib.nullcontext()
+
+# Desde 3.12 cProfile usa sys.monitoring: un solo perfilador activo por proceso, que además ve
+# todos los threads. Ahí se perfila con uno solo (el del thread que abre el run), no uno por thread
+PROCESS_WIDE_PROFILER = sys.version_info >= (3, 12)
+
+
+class Tracer:
+    """Tiempos por etapa de cada caso, con export opcional a trace de Chrome y perfil cProfile.
+
+    - `timing`: acumula conteo y segundos por etapa (van a `run_meta.json` como `stages`).
+    - `trace_path`: escribe cada span como evento del formato Chrome trace (abrir en
+      chrome://tracing o https://ui.perfetto.dev), con task_id/case_id/model en `args`.
+      Los eventos se escriben a medida que ocurren: memoria constante aunque el run sea enorme.
+    - `profile_path`: cProfile de todos los threads del run, combinado en un solo `.pstats`
+      (en 3.12+ un único perfilador de proceso, ver `PROCESS_WIDE_PROFILER`).
+
+    Desactivado (sin ninguna de las tres), `span` devuelve un context manager nulo compartido.
+    """
+
+    def __init__(
+        self,
+        model: str = "",
+        *,
+        timing: bool = False,
+        trace_path: Optional[str] = None,
+        profile_path: Optional[str] = None,
+    ) -> None:
+        self.model = model
+        self.trace_path = trace_path
+        self.profile_path = profile_path
+        self.enabled = bool(timing or trace_path or profile_path)
+        self._lock = threading.Lock()
+        self._totals: Dict[str, List[float]] = {}  # etapa -> [n, segundos]
+        self._t0 = time.perf_counter()
+        self._pid = os.getpid()
+        self._trace: Optional[IO[str]] = None
+        self._named_threads: Set[int] = set()
+        self._local = threading.local()
+        self._profiles: List[cProfile.Profile] = []
+        # Con PROCESS_WIDE_PROFILER: hay un perfilador activo (de cualquier thread)
+        self._wide_active = False
+        if trace_path:
+            Path(trace_path).parent.mkdir(parents=True, exist_ok=True)
+            self._trace = open(trace_path, "w", encoding="utf-8")
+            # Formato "JSON array": un evento por línea; el visor tolera el archivo sin cerrar
+            self._trace.write("[\n")
+            self._emit({"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": f"run {model}"}})
+
+    # --- spans ---
+
+    def span(self, stage: str, task_id: str, case_id: Any, *, concurrent: bool = False) -> ContextManager[None]:
+        """Mide una etapa de un caso. `concurrent=True` para spans que se solapan en un mismo
+        thread (generaciones async en el event loop): se exportan como eventos async del trace."""
+        if not self.enabled:
+            return _NULL
+        return self._span(stage, task_id, case_id, concurrent)
+
+    @contextlib.contextmanager
+    def _span(self, stage: str, task_id: str, case_id: Any, concurrent: bool) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter()
+            with self._lock:
+                acc = self._totals.setdefault(stage, [0, 0.0])
+                acc[0] += 1
+                acc[1] += t1 - t0
+            if self._trace is not None:
+                self._trace_span(stage, task_id, case_id, t0, t1, concurrent)
+
+    def _us(self, t: float) -> float:
+        return round((t - self._t0) * 1e6, 1)
+
+    def _trace_span(self, stage: str, task_id: str, case_id: Any, t0: float, t1: float, concurrent: bool) -> None:
+        tid = threading.get_ident()
+        args = {"task_id": task_id, "case_id": case_id, "model": self.model}
+        base = {"name": stage, "cat": "case", "pid": self._pid, "tid": tid}
+        if concurrent:
+            ident = f"{task_id}/{case_id}"
+            events = [
+                {**base, "ph": "b", "id": ident, "ts": self._us(t0), "args": args},
+                {**base, "ph": "e", "id": ident, "ts": self._us(t1)},
+            ]
+        else:
+            events = [{**base, "ph": "X", "ts": self._us(t0), "dur": round((t1 - t0) * 1e6, 1), "args": args}]
+        with self._lock:
+            if tid not in self._named_threads:
+                self._named_threads.add(tid)
+                name = threading.current_thread().name
+                events.insert(0, {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}})
+            for ev in events:
+                self._emit(ev)
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        assert self._trace is not None
+        self._trace.write(json.dumps(event, ensure_ascii=False) + ",\n")
+
+    # --- cProfile ---
+
+    def _thread_profile(self) -> cProfile.Profile:
+        prof = getattr(self._local, "profile", None)
+        if prof is None:
+            prof = cProfile.Profile()
+            self._local.profile = prof
+            self._local.active = False
+            with self._lock:
+                self._profiles.append(prof)
+        return prof
+
+    @contextlib.contextmanager
+    def profiling(self) -> Iterator[None]:
+        """Perfila el thread actual mientras dura el bloque (no-op sin `profile_path` o si ya está activo).
+
+        En 3.12+ el primer bloque activa un perfilador que ve todos los threads y los demás son
+        no-op; si otro perfilador del proceso ya está activo (p.ej. otro run de la matriz con
+        `--profile`) el bloque corre sin perfilar.
+        """
+        if not self.profile_path or getattr(self._local, "active", False):
+            yield
+            return
+        if PROCESS_WIDE_PROFILER:
+            with self._lock:
+                if self._wide_active:
+                    started = False
+                else:
+                    self._wide_active = started = True
+            if not started:
+                yield
+                return
+        prof = self._thread_profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # "Another profiling tool is already active"
+            enabled = False
+        else:
+            enabled = True
+        self._local.active = enabled
+        try:
+            yield
+        finally:
+            if enabled:
+                prof.disable()
+            self._local.active = False
+            if PROCESS_WIDE_PROFILER:
+                with self._lock:
+                    self._wide_active = False
+
+    def profiled(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Envuelve `fn` para que corra perfilada en el thread que la ejecute (pools de gen/eval)."""
+        if not self.profile_path:
+            return fn
+
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with self.profiling():
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    # --- cierre ---
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            items = {k: tuple(v) for k, v in self._totals.items()}
+        order = [s for s in STAGES if s in items] + sorted(set(items) - set(STAGES))
+        return {
+            s: {"n": int(items[s][0]), "total_s": round(items[s][1], 4), "mean_ms": round(items[s][1] * 1000 / max(1, items[s][0]), 4)}
+            for s in order
+        }
+
+    def close(self) -> None:
+        if self._trace is not None:
+            self._trace.write(json.dumps({"name": "end", "ph": "i", "s": "g", "pid": self._pid, "ts": self._us(time.perf_counter())}) + "\n]\n")
+            self._trace.close()
+            self._trace = None
+        if self.profile_path and self._profiles:
+            profiles = []
+            for prof in self._profiles:
+                try:
+                    profiles.append(pstats.Stats(prof))
+                except TypeError:
+                    # Un perfilador que nunca llegó a activarse no tiene stats
+                    continue
+            if profiles:
+                stats = profiles[0]
+                for other in profiles[1:]:
+                    stats.add(other)
+                stats.dump_stats(self.profile_path)
+            self._profiles = []
+
+
+NO_TRACE = Tracer()
@@ -5,7 +5,7 @@ import json
 import os
 import re
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 
 def read_text(path: str) -> str:
@@ -17,15 +17,17 @@ def sha256_text(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
-def read_jsonl(path: str) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
     with open(path, "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            rows.append(json.loads(line))
-    return rows
+            yield json.loads(line)
+
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    return list(iter_jsonl(path))
 
 
 def write_jsonl(path: str, rows: Iterable[Dict[str, Any]]) -> None:
@@ -35,6 +37,99 @@ def write_jsonl(path: str, rows: Iterable[Dict[str, Any]]) -> None:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
 
+def safe_float(x: Any) -> float:
+    try:
+        return float(x)
+    except Exception:
+        return 0.0
+
+
+def row_score(r: Dict[str, Any]) -> float:
+    scores = r.get("scores", {})
+    # Convención: si existe score_total úsalo, si no suma scores numéricos
+    if "score_total" in scores:
+        return safe_float(scores.get("score_total"))
+    return sum(safe_float(v) for v in scores.values())
+
+
+def repair_jsonl_tail(path: str) -> int:
+    """Trunca una última línea incompleta (p.ej. tras un crash a mitad de escritura).
+
+    Devuelve la cantidad de bytes descartados.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return 0
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return 0
+        # Busca hacia atrás el último salto de línea
+        pos = size - 1
+        chunk = 4096
+        while pos > 0:
+            start = max(0, pos - chunk)
+            f.seek(start)
+            buf = f.read(pos - start)
+            idx = buf.rfind(b"\n")
+            if idx != -1:
+                keep = start + idx + 1
+                break
+            pos = start
+        else:
+            keep = 0
+        f.truncate(keep)
+        return size - keep
+
+
+def completed_case_keys(path: str) -> Set[Tuple[str, str]]:
+    """Pares (task_id, case_id) ya presentes en un results.jsonl."""
+    done: Set[Tuple[str, str]] = set()
+    if not os.path.exists(path):
+        return done
+    for r in iter_jsonl(path):
+        done.add((str(r.get("task_id")), str(r.get("case_id"))))
+    return done
+
+
+class JsonlAppender:
+    """Escribe filas JSONL en modo append, con flush por fila.
+
+    Cada fila queda en disco apenas se escribe, así que un crash solo pierde el caso en curso.
+    `fsync_every` fuerza `os.fsync` cada N filas (y siempre al cerrar).
+    """
+
+    def __init__(self, path: str, fsync_every: int = 100) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.fsync_every = fsync_every
+        self.rows = 0
+        self._f = open(path, "a", encoding="utf-8")
+
+    def write(self, row: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self.rows += 1
+        if self.fsync_every and self.rows % self.fsync_every == 0:
+            os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+
+    def __enter__(self) -> "JsonlAppender":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
 CODE_BLOCK_RE = re.compile(r"```(?:python)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
 
 